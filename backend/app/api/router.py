@@ -1,23 +1,91 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
-from fastapi.responses import HTMLResponse
-from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Header, Response, Request, BackgroundTasks
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+from typing import List, Optional, AsyncIterator
 import os
-from app.utils.markdown_processor import process_markdown, apply_template
+import json
+import base64
+import time
+import asyncio
+import logging
+from app.utils.markdown_processor import apply_template, render_cache_keys, WIKI_LINKS_ENABLED
+from app.core.render_cache import render_cache, etag_matches
+from app.core.render_executor import render_executor, RenderQueueFullError
+from app.core.stream_renderer import stream_renderer
+from app.core.pdf_exporter import pdf_exporter, PdfExportUnavailableError, PdfQueueFullError
+from app.core.batch_renderer import batch_renderer, BatchTooLargeError
+from app.core.incremental_renderer import incremental_renderer, DocumentNotFoundError, VersionConflictError
+from app.core.job_queue import job_queue, JobQueueFullError, JobStoreError
 from app.schemas import (
     MarkdownProcessRequest, 
     MarkdownProcessResponse, 
     TemplateInfo,
+    TemplateCatalogEntry,
     AITemplateRecommendationRequest,
     AITemplateRecommendationResponse,
     AIContentSuggestionRequest,
     AIContentSuggestionResponse,
     AIBeautifyRequest,
-    AIBeautifyResponse
+    AIBeautifyResponse,
+    IncrementalOpenRequest,
+    IncrementalOpenResponse,
+    IncrementalPatchRequest,
+    IncrementalPatchResponse,
+    PdfExportJobResponse,
+    JobResponse,
+    LinkDocumentRequest,
+    LinkBatchRequest,
+    LinkIndexUpdateResponse,
+    LinkDocumentResponse,
+    Backlink,
+    LinkGraphResponse
 )
 from app.core.template_manager import template_manager
 from app.core.ai_service import ai_service
+from app.core.ai_cache import ai_cache
+from app.core.model_router import model_router
+from app.core.template_recommender import template_recommender
+from app.core.compression import template_assets
+from app.core.template_previews import template_previews, PREVIEW_CONTENT
+from app.core.metrics import metrics
+from app.core.link_index import link_index, WikiLinksDisabledError
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# 异步提交参数：sync在请求内完成；async立即返回任务ID；auto对大文档使用async
+MODE_QUERY = Query("sync", pattern="^(auto|sync|async)$", description="sync waits for the result, async returns a job id; auto picks async for large documents")
+OUTPUT_QUERY = Query("page", pattern="^(page|fragment)$", description="page returns the full HTML page, fragment returns the body only plus a cacheable stylesheet URL")
+PRIORITY_QUERY = Query("normal", pattern="^(high|normal|low)$", description="Scheduling priority of async jobs")
+
+def _client_id(request: Request, x_client_id: Optional[str]) -> str:
+    """异步任务公平调度使用的客户端标识：优先取X-Client-ID请求头，否则使用客户端地址"""
+    if x_client_id:
+        return x_client_id[:128]
+    return request.client.host if request.client else "anonymous"
+
+async def _submit_job(kind: str, payload: dict, request: Request, x_client_id: Optional[str], priority: str) -> JSONResponse:
+    """提交异步任务，返回202和任务状态"""
+    try:
+        job = await job_queue.submit(kind, payload, _client_id(request, x_client_id), priority)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except JobStoreError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return JSONResponse(status_code=202, content=await job_queue.describe(job.job_id),
+                        headers={"Location": f"/api/jobs/{job.job_id}"})
+
+async def _render_output(markdown_text: str, template: str, keys: tuple, output: str) -> dict:
+    """按输出方式渲染文档，返回响应中的html_content和stylesheet_url"""
+    if output == "fragment":
+        fragment = await render_executor.render_fragment(markdown_text, keys[0])
+        before, after = template_manager.render_body_parts(template)
+        return {"html_content": f"{before}\n{fragment}\n{after}", "stylesheet_url": template_assets.stylesheet_url(template)}
+    return {"html_content": await render_executor.render(markdown_text, template, keys)}
+
+def _index_document(background_tasks: BackgroundTasks, doc_id: Optional[str], markdown_text: str) -> None:
+    """响应返回后在线程中更新文档的双向链接索引（使用本次渲染时收集的链接）"""
+    if doc_id and WIKI_LINKS_ENABLED:
+        background_tasks.add_task(asyncio.to_thread, link_index.update, doc_id, markdown_text)
 
 @router.get("/")
 async def root():
@@ -25,42 +93,280 @@ async def root():
 
 @router.post("/markdown/process", response_model=MarkdownProcessResponse)
 async def process_markdown_file(
+    response: Response,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    template: Optional[str] = Query("default", description="Template to apply to the processed Markdown")
+    template: Optional[str] = Query("default", description="Template to apply to the processed Markdown"),
+    if_none_match: Optional[str] = Header(None),
+    output: str = OUTPUT_QUERY,
+    mode: str = MODE_QUERY,
+    priority: str = PRIORITY_QUERY,
+    x_client_id: Optional[str] = Header(None),
+    doc_id: Optional[str] = Query(None, description="Update the backlink index for this document id")
 ):
     if not file.filename.endswith('.md'):
         raise HTTPException(status_code=400, detail="Only .md files are allowed")
     
     try:
-        content = await file.read()
-        markdown_text = content.decode('utf-8')
-        processed_html = process_markdown(markdown_text)
-        
-        # 应用模板
-        final_html = apply_template(processed_html, template)
+        with metrics.stage("upload_read"):
+            content = await file.read()
+        with metrics.stage("decode"):
+            markdown_text = content.decode('utf-8')
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    _index_document(background_tasks, doc_id, markdown_text)
+
+    # 提交异步任务在try之外，队列已满时的429不会被下面的通用异常处理变成500
+    if mode == "async" or (mode == "auto" and render_executor.is_large(len(markdown_text))):
+        payload = {"content": markdown_text, "template": template, "filename": file.filename, "output": output}
+        return await _submit_job("render", payload, http_request, x_client_id, priority)
+
+    try:
+        # 内容未变化时直接返回304，无需重新渲染
+        keys = render_cache_keys(markdown_text, template)
+        etag = render_cache.etag(keys[1], file.filename, output)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        # 转换Markdown并应用模板（在渲染执行器中完成，不阻塞事件循环）
+        rendered = await _render_output(markdown_text, template, keys, output)
+        response.headers["ETag"] = etag
         
         return MarkdownProcessResponse(
             filename=file.filename,
-            html_content=final_html,
-            template=template
+            template=template,
+            **rendered
         )
+    except RenderQueueFullError:
+        raise HTTPException(status_code=503, detail="Render queue is full, please retry later", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
+@router.post("/markdown/process/stream", response_class=StreamingResponse)
+async def process_markdown_stream(
+    file: UploadFile = File(...),
+    template: Optional[str] = Query("default", description="Template to apply to the processed Markdown")
+):
+    """流式处理大文件：分块读取、按块转换，并以页头、正文分块、页尾的顺序返回HTML"""
+    if not file.filename.endswith('.md'):
+        raise HTTPException(status_code=400, detail="Only .md files are allowed")
+    if file.size is not None and file.size > stream_renderer.max_upload_bytes:
+        raise HTTPException(status_code=413, detail=f"File exceeds {stream_renderer.max_upload_bytes} bytes")
+
+    return StreamingResponse(stream_renderer.render(file, template), media_type="text/html; charset=utf-8")
+
 @router.post("/markdown/process/raw", response_model=MarkdownProcessResponse)
-async def process_markdown_raw(request: MarkdownProcessRequest):
+async def process_markdown_raw(
+    request: MarkdownProcessRequest,
+    response: Response,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    if_none_match: Optional[str] = Header(None),
+    output: str = OUTPUT_QUERY,
+    mode: str = MODE_QUERY,
+    priority: str = PRIORITY_QUERY,
+    x_client_id: Optional[str] = Header(None)
+):
+    _index_document(background_tasks, request.doc_id, request.content)
+    if mode == "async" or (mode == "auto" and render_executor.is_large(len(request.content))):
+        payload = {"content": request.content, "template": request.template, "filename": "raw_content.md", "output": output}
+        return await _submit_job("render", payload, http_request, x_client_id, priority)
+
     try:
-        processed_html = process_markdown(request.content)
-        final_html = apply_template(processed_html, request.template)
+        keys = render_cache_keys(request.content, request.template)
+        etag = render_cache.etag(keys[1], "raw_content.md", output)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        rendered = await _render_output(request.content, request.template, keys, output)
+        response.headers["ETag"] = etag
         
         return MarkdownProcessResponse(
             filename="raw_content.md",
-            html_content=final_html,
-            template=request.template
+            template=request.template,
+            **rendered
         )
+    except RenderQueueFullError:
+        raise HTTPException(status_code=503, detail="Render queue is full, please retry later", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing content: {str(e)}")
 
+@router.get("/markdown/cache/stats")
+async def render_cache_stats():
+    """返回渲染缓存和代码高亮缓存的命中统计"""
+    from app.utils.highlight_cache import highlight_cache
+    return {**render_cache.stats(), "highlight": highlight_cache.stats(), "executor": render_executor.stats()}
+
+@router.post("/markdown/batch")
+async def process_markdown_batch(
+    files: List[UploadFile] = File(...),
+    template: Optional[str] = Query("default", description="Template to apply to every document"),
+    output: str = Query("ndjson", pattern="^(ndjson|zip)$", description="Result format: ndjson or zip")
+):
+    """批量渲染多个.md文件或zip/tar归档，按完成顺序流式返回结果"""
+    try:
+        documents = await batch_renderer.collect(files)
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error reading batch: {str(e)}")
+
+    if output == "zip":
+        return StreamingResponse(
+            batch_renderer.stream_zip(documents, template),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="bettermd-batch.zip"'}
+        )
+    return StreamingResponse(batch_renderer.stream_ndjson(documents, template), media_type="application/x-ndjson")
+
+@router.post("/markdown/export/pdf")
+async def export_pdf(
+    request: MarkdownProcessRequest,
+    http_request: Request,
+    mode: str = Query("auto", pattern="^(auto|sync|async)$", description="sync returns the PDF, async returns a job id; auto picks async for large documents"),
+    priority: str = PRIORITY_QUERY,
+    x_client_id: Optional[str] = Header(None)
+):
+    """将Markdown导出为PDF"""
+    if mode == "async" or (mode == "auto" and len(request.content) >= pdf_exporter.async_threshold):
+        payload = {"content": request.content, "template": request.template}
+        return await _submit_job("pdf", payload, http_request, x_client_id, priority)
+
+    try:
+        pdf = await pdf_exporter.export(request.content, request.template)
+    except (PdfQueueFullError, RenderQueueFullError):
+        raise HTTPException(status_code=503, detail="PDF export queue is full, please retry later", headers={"Retry-After": "5"})
+    except PdfExportUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting PDF: {str(e)}")
+
+    return _pdf_response(pdf)
+
+def _pdf_response(pdf: bytes) -> Response:
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": 'attachment; filename="document.pdf"'}
+    )
+
+async def _get_pdf_job(job_id: str):
+    job = await job_queue.get_job(job_id)
+    if job is None or job.kind != "pdf":
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/markdown/export/pdf/jobs/{job_id}", response_model=PdfExportJobResponse)
+async def export_pdf_job_status(job_id: str):
+    """查询异步PDF导出任务的状态（与/jobs/{job_id}相同的任务，保留此地址以兼容旧客户端）"""
+    job = await _get_pdf_job(job_id)
+    result = job.result or {}
+    return PdfExportJobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        template=job.payload.get("template") or result.get("template"),
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        size=result.get("size"),
+        error=job.error,
+    )
+
+@router.get("/markdown/export/pdf/jobs/{job_id}/result")
+async def export_pdf_job_result(job_id: str):
+    """下载异步PDF导出任务的结果"""
+    await _get_pdf_job(job_id)
+    return await job_result(job_id)
+
+@router.post("/markdown/incremental/open", response_model=IncrementalOpenResponse)
+async def incremental_open(request: IncrementalOpenRequest):
+    """打开文档用于增量预览，返回各块的HTML片段和完整页面"""
+    try:
+        session = await incremental_renderer.open(request.content, request.template, request.doc_id)
+    except RenderQueueFullError:
+        raise HTTPException(status_code=503, detail="Render queue is full, please retry later", headers={"Retry-After": "1"})
+    return IncrementalOpenResponse(
+        doc_id=session.doc_id,
+        version=session.version,
+        blocks=session.html,
+        html_content=incremental_renderer.render_page(session),
+        full_render=session.full_render
+    )
+
+@router.post("/markdown/incremental/patch", response_model=IncrementalPatchResponse)
+async def incremental_patch(request: IncrementalPatchRequest):
+    """应用文本编辑，只返回发生变化的块的HTML片段"""
+    edits = [(edit.start, edit.end, edit.text) for edit in request.edits]
+    try:
+        delta = await incremental_renderer.apply_patch(request.doc_id, request.base_version, edits)
+    except DocumentNotFoundError:
+        raise HTTPException(status_code=404, detail="Document not found, please reopen it")
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RenderQueueFullError:
+        raise HTTPException(status_code=503, detail="Render queue is full, please retry later", headers={"Retry-After": "1"})
+    return IncrementalPatchResponse(**delta)
+
+@router.delete("/markdown/incremental/{doc_id}")
+async def incremental_close(doc_id: str):
+    """关闭文档，释放服务端保存的块"""
+    incremental_renderer.close(doc_id)
+    return {"doc_id": doc_id, "closed": True}
+
+@router.post("/links/documents", response_model=LinkIndexUpdateResponse)
+async def index_document_links(request: LinkDocumentRequest):
+    """更新一篇文档的双向链接索引，内容未变化时不重新解析"""
+    try:
+        updated = await asyncio.to_thread(link_index.update, request.doc_id, request.content, request.title)
+    except WikiLinksDisabledError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return LinkIndexUpdateResponse(updated=int(updated), unchanged=int(not updated))
+
+@router.post("/links/documents/batch", response_model=LinkIndexUpdateResponse)
+async def index_documents_links(request: LinkBatchRequest):
+    """在一个事务中更新多篇文档的索引，用于首次导入笔记库"""
+    documents = [(document.doc_id, document.content, document.title) for document in request.documents]
+    try:
+        return await asyncio.to_thread(link_index.update_many, documents)
+    except WikiLinksDisabledError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("/links/documents", response_model=LinkDocumentResponse)
+async def get_document_links(doc_id: str = Query(..., description="Document id")):
+    """返回文档的出链和标题"""
+    document = await asyncio.to_thread(link_index.get_document, doc_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not indexed")
+    return document
+
+@router.delete("/links/documents")
+async def delete_document_links(doc_id: str = Query(..., description="Document id")):
+    """从索引中删除文档"""
+    if not await asyncio.to_thread(link_index.delete, doc_id):
+        raise HTTPException(status_code=404, detail="Document not indexed")
+    return {"doc_id": doc_id, "deleted": True}
+
+@router.get("/links/backlinks", response_model=List[Backlink])
+async def get_backlinks(doc_id: str = Query(..., description="Document id, need not be indexed itself")):
+    """返回链接到该文档的所有文档"""
+    return await asyncio.to_thread(link_index.backlinks, doc_id)
+
+@router.get("/links/graph", response_model=LinkGraphResponse)
+async def get_link_graph(
+    doc_id: str = Query(..., description="Center document id"),
+    depth: int = Query(1, ge=1, le=3, description="Number of hops along links and backlinks"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of nodes")
+):
+    """返回以文档为中心的链接图邻域"""
+    return await asyncio.to_thread(link_index.neighborhood, doc_id, depth, limit)
+
+@router.get("/links/stats")
+async def link_index_stats():
+    """返回双向链接索引的文档数、链接数和未解析的链接目标数"""
+    return await asyncio.to_thread(link_index.stats)
+
 @router.get("/templates", response_model=List[str])
 async def list_templates():
     # 返回可用模板的列表
@@ -71,13 +377,50 @@ async def list_templates_info():
     # 返回模板详细信息列表
     return template_manager.list_templates()
 
+@router.get("/templates/catalog", response_model=List[TemplateCatalogEntry])
+async def list_templates_catalog(if_none_match: Optional[str] = Header(None)):
+    """一次返回所有模板的元数据以及预览页面、缩略图和样式表的地址"""
+    catalog = await asyncio.to_thread(template_previews.catalog)
+    etag = render_cache.etag(*(entry["preview_url"] + entry["stylesheet_url"] for entry in catalog))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=catalog, headers=headers)
+
+@router.get("/templates/{template_name}/preview.{digest}.html", response_class=HTMLResponse)
+async def get_template_preview_page(template_name: str, digest: str, request: Request):
+    """返回预先生成的模板预览页面，当前版本的URL可永久缓存"""
+    preview = await asyncio.to_thread(template_previews.get, template_name)
+    if preview is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return preview.html.response(request.headers, template_previews.cache_control(preview, digest))
+
+@router.get("/templates/{template_name}/thumbnail.{digest}.png")
+async def get_template_thumbnail(template_name: str, digest: str, request: Request):
+    """返回预先生成的模板缩略图（PNG），当前版本的URL可永久缓存"""
+    preview = await asyncio.to_thread(template_previews.get, template_name)
+    if preview is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return preview.thumbnail.response(request.headers, template_previews.cache_control(preview, digest))
+
+@router.get("/templates/{template_name}/style.{css_hash}.css")
+async def get_template_stylesheet(template_name: str, css_hash: str, request: Request):
+    """返回模板样式表（预压缩），当前哈希的URL可永久缓存"""
+    if template_manager.get_template_info(template_name) is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    asset = template_assets.stylesheet(template_name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Stylesheet not found")
+    return asset.response(request.headers, template_assets.stylesheet_cache_control(template_name, css_hash))
+
 @router.get("/templates/{template_name}", response_class=HTMLResponse)
-async def get_template_preview(template_name: str):
-    # 返回模板预览
-    html_content = f"""<h1>Template Preview</h1><p>This is a preview of the <strong>{template_name}</strong> template.</p><h2>Sample Content</h2><p>This is a sample paragraph to demonstrate the template styling.</p><h3>Code Example</h3><pre><code>function hello() {{
-  console.log('Hello, world!');
-}}</code></pre>"""
-    return apply_template(html_content, template_name)
+async def get_template_preview(template_name: str, request: Request):
+    # 返回模板预览（每个模板版本只生成一次）
+    preview = await asyncio.to_thread(template_previews.get, template_name)
+    if preview is None:
+        # 不存在的模板按默认模板渲染，不缓存
+        return apply_template(PREVIEW_CONTENT.format(template_name=template_name), template_name)
+    return preview.html.response(request.headers, template_previews.cache_control(preview))
 
 @router.get("/health")
 async def health_check():
@@ -92,16 +435,34 @@ async def ai_status():
         "models": ai_service.get_available_models() if ai_service.is_available() else []
     }
 
+@router.get("/ai/router/stats")
+async def ai_router_stats():
+    """返回各模型最近的延迟、错误率以及对冲和回退次数"""
+    return model_router.stats()
+
+@router.get("/ai/cache/stats")
+async def ai_cache_stats():
+    """返回AI响应缓存的命中统计"""
+    return await asyncio.to_thread(ai_cache.stats)
+
 @router.post("/ai/template-recommend", response_model=AITemplateRecommendationResponse)
 async def ai_template_recommend(request: AITemplateRecommendationRequest):
-    """AI智能模板推荐"""
-    if not ai_service.is_available():
-        raise HTTPException(status_code=503, detail="AI service is not available")
-    
-    template_names = template_manager.get_template_names()
-    recommendations = ai_service.generate_template_recommendations(request.content, template_names)
+    """模板推荐：先按本地文档特征打分，置信度较低且AI可用时再请AI细化"""
+    recommendations, confidence = template_recommender.recommend(request.content)
+    source = "local"
+
+    refine = request.refine
+    if refine is None:
+        refine = template_recommender.needs_refinement(confidence)
+    if refine and ai_service.is_available():
+        template_names = template_manager.get_template_names()
+        refined = await ai_service.agenerate_template_recommendations(request.content, template_names)
+        # AI失败时保留本地推荐
+        if refined:
+            recommendations = refined
+            source = "ai"
     
-    if recommendations is None:
+    if not recommendations:
         raise HTTPException(status_code=500, detail="Failed to generate recommendations")
     
     # 确保返回的数据格式正确
@@ -110,7 +471,8 @@ async def ai_template_recommend(request: AITemplateRecommendationRequest):
         if isinstance(rec, dict) and "template" in rec and "reason" in rec:
             formatted_recommendations.append({
                 "template": rec["template"],
-                "reason": rec["reason"]
+                "reason": rec["reason"],
+                "score": rec.get("score")
             })
         else:
             # 如果格式不正确，使用默认值
@@ -119,15 +481,25 @@ async def ai_template_recommend(request: AITemplateRecommendationRequest):
                 "reason": "AI recommendation format not recognized"
             })
     
-    return AITemplateRecommendationResponse(recommendations=formatted_recommendations)
+    return AITemplateRecommendationResponse(
+        recommendations=formatted_recommendations, source=source, confidence=confidence
+    )
 
 @router.post("/ai/content-suggestions", response_model=AIContentSuggestionResponse)
-async def ai_content_suggestions(request: AIContentSuggestionRequest):
+async def ai_content_suggestions(
+    request: AIContentSuggestionRequest,
+    http_request: Request,
+    mode: str = Query("sync", pattern="^(sync|async)$", description="sync waits for the result, async returns a job id"),
+    priority: str = PRIORITY_QUERY,
+    x_client_id: Optional[str] = Header(None)
+):
     """AI内容优化建议"""
     if not ai_service.is_available():
         raise HTTPException(status_code=503, detail="AI service is not available")
+    if mode == "async":
+        return await _submit_job("suggestions", {"content": request.content}, http_request, x_client_id, priority)
     
-    suggestions = ai_service.generate_content_suggestions(request.content)
+    suggestions = await ai_service.agenerate_content_suggestions(request.content)
     
     if suggestions is None:
         raise HTTPException(status_code=500, detail="Failed to generate suggestions")
@@ -135,14 +507,143 @@ async def ai_content_suggestions(request: AIContentSuggestionRequest):
     return AIContentSuggestionResponse(suggestions=suggestions)
 
 @router.post("/ai/beautify", response_model=AIBeautifyResponse)
-async def ai_beautify(request: AIBeautifyRequest):
+async def ai_beautify(
+    request: AIBeautifyRequest,
+    http_request: Request,
+    mode: str = Query("sync", pattern="^(sync|async)$", description="sync waits for the result, async returns a job id"),
+    priority: str = PRIORITY_QUERY,
+    x_client_id: Optional[str] = Header(None)
+):
     """AI自动美化"""
     if not ai_service.is_available():
         raise HTTPException(status_code=503, detail="AI service is not available")
+    if mode == "async":
+        payload = {"content": request.content, "template": request.template}
+        return await _submit_job("beautify", payload, http_request, x_client_id, priority)
     
-    beautified_content = ai_service.auto_beautify_content(request.content, request.template)
+    beautified_content = await ai_service.aauto_beautify_content(request.content, request.template)
     
     if beautified_content is None:
         raise HTTPException(status_code=500, detail="Failed to beautify content")
     
-    return AIBeautifyResponse(beautified_content=beautified_content)
\ No newline at end of file
+    return AIBeautifyResponse(beautified_content=beautified_content)
+
+def _sse_event(data: dict, event: Optional[str] = None) -> str:
+    """格式化一条SSE消息"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _stream_ai_response(chunks: AsyncIterator[str]) -> StreamingResponse:
+    """等待模型输出首段内容后，以SSE形式逐段转发给客户端
+
+    首段内容到达前失败时返回500；首字节耗时通过Server-Timing响应头和结束事件返回。
+    """
+    start = time.perf_counter()
+    first = await anext(chunks, None)
+    if first is None:
+        raise HTTPException(status_code=500, detail="Failed to generate content")
+    ttfb_ms = (time.perf_counter() - start) * 1000
+    metrics.ai_stream_ttfb.observe(ttfb_ms / 1000)
+    logger.info(f"AI stream first token after {ttfb_ms:.1f}ms")
+
+    async def events():
+        yield _sse_event({"content": first})
+        try:
+            async for chunk in chunks:
+                yield _sse_event({"content": chunk})
+        except Exception as e:
+            yield _sse_event({"detail": f"Stream interrupted: {str(e)}"}, event="error")
+            return
+        total_ms = (time.perf_counter() - start) * 1000
+        yield _sse_event({"ttfb_ms": round(ttfb_ms, 1), "total_ms": round(total_ms, 1)}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Server-Timing": f"ttfb;dur={ttfb_ms:.1f}",
+        },
+    )
+
+@router.post("/ai/content-suggestions/stream")
+async def ai_content_suggestions_stream(request: AIContentSuggestionRequest):
+    """AI内容优化建议（SSE流式输出）"""
+    if not ai_service.is_available():
+        raise HTTPException(status_code=503, detail="AI service is not available")
+
+    return await _stream_ai_response(ai_service.astream_content_suggestions(request.content))
+
+@router.post("/ai/beautify/stream")
+async def ai_beautify_stream(request: AIBeautifyRequest):
+    """AI自动美化（SSE流式输出）"""
+    if not ai_service.is_available():
+        raise HTTPException(status_code=503, detail="AI service is not available")
+
+    return await _stream_ai_response(ai_service.astream_beautify_content(request.content, request.template))
+
+@router.get("/jobs/stats")
+async def job_stats():
+    """返回异步任务队列的排队和执行统计"""
+    return job_queue.stats()
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def job_status(job_id: str):
+    """查询异步任务的状态"""
+    job = await job_queue.describe(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """获取异步任务的结果，格式与对应同步接口的响应相同"""
+    job = await job_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Job failed: {job.error}")
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if job.kind == "pdf":
+        return _pdf_response(base64.b64decode(job.result["pdf"]))
+    return job.result
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消排队中的异步任务"""
+    if not await job_queue.cancel(job_id):
+        job = await job_queue.get_job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return {"status": "cancelled"}
+
+async def _render_job(payload: dict) -> dict:
+    keys = render_cache_keys(payload["content"], payload["template"])
+    rendered = await _render_output(payload["content"], payload["template"], keys, payload.get("output", "page"))
+    return {"filename": payload["filename"], "template": payload["template"], **rendered}
+
+async def _suggestions_job(payload: dict) -> dict:
+    suggestions = await ai_service.agenerate_content_suggestions(payload["content"])
+    if suggestions is None:
+        raise RuntimeError("Failed to generate suggestions")
+    return {"suggestions": suggestions}
+
+async def _beautify_job(payload: dict) -> dict:
+    beautified_content = await ai_service.aauto_beautify_content(payload["content"], payload["template"])
+    if beautified_content is None:
+        raise RuntimeError("Failed to beautify content")
+    return {"beautified_content": beautified_content}
+
+async def _pdf_job(payload: dict) -> dict:
+    # 任务结果以JSON保存，PDF内容用base64编码，下载时解码
+    pdf = await pdf_exporter.export(payload["content"], payload["template"])
+    return {"template": payload["template"], "size": len(pdf), "pdf": base64.b64encode(pdf).decode("ascii")}
+
+# 注册异步任务的处理函数，结果与对应同步接口的响应体相同
+job_queue.register("render", _render_job)
+job_queue.register("suggestions", _suggestions_job)
+job_queue.register("beautify", _beautify_job)
+job_queue.register("pdf", _pdf_job)
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AIResponseCache:
+    """AI响应的持久化缓存（SQLite）
+
+    键为规范化后的请求（模型、温度、消息内容折叠空白后）的哈希，因此仅空白不同的
+    相同文档也能命中。条目带TTL，总大小超过上限时按最近访问时间淘汰。
+    相同请求并发到达时只向上游发出一次请求，其余调用等待同一结果。
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("AI_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.path = os.getenv("AI_CACHE_PATH", "data/ai_cache.sqlite3")
+        self.ttl = float(os.getenv("AI_CACHE_TTL", 7 * 24 * 3600))
+        self.max_bytes = int(os.getenv("AI_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ai_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_accessed ON ai_cache (accessed_at)")
+            conn.commit()
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ai_cache").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(messages: List[Dict[str, str]], model: Optional[str], temperature: float,
+                 max_tokens: Optional[int] = None) -> str:
+        """根据请求内容生成缓存键
+
+        消息内容只统一换行符，其余原样参与哈希：Markdown中的缩进、代码块排版、
+        行尾空格（硬换行）和列表嵌套都会影响结果，不能折叠空白。
+        """
+        normalized = {
+            "model": model,
+            "temperature": round(float(temperature), 3),
+            "max_tokens": max_tokens,
+            "messages": [
+                [message.get("role", ""), message.get("content", "").replace("\r\n", "\n")]
+                for message in messages
+            ],
+        }
+        raw = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取未过期的缓存条目"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, size, created_at FROM ai_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, size, created_at = row
+            if now - created_at > self.ttl:
+                conn.execute("DELETE FROM ai_cache WHERE key = ?", (key,))
+                conn.commit()
+                self._total_bytes -= size
+                self.misses += 1
+                return None
+            conn.execute("UPDATE ai_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        """写入缓存条目，超出容量时淘汰最久未访问的条目"""
+        if not self.enabled:
+            return
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute("SELECT size FROM ai_cache WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._total_bytes -= old[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._total_bytes += size
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        # 先清理过期条目，再按最近访问时间淘汰
+        expired = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ai_cache WHERE created_at < ?", (now - self.ttl,)
+        ).fetchone()
+        if expired[0]:
+            conn.execute("DELETE FROM ai_cache WHERE created_at < ?", (now - self.ttl,))
+            self._total_bytes -= expired[1]
+            self.evictions += expired[0]
+
+        while self._total_bytes > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM ai_cache ORDER BY accessed_at LIMIT 32").fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                conn.execute("DELETE FROM ai_cache WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """优先返回缓存结果；未命中时调用fetch，并合并相同键的并发请求
+
+        fetch返回None（上游失败）时不写入缓存。
+        """
+        if not self.enabled:
+            return await fetch()
+
+        try:
+            cached = await asyncio.to_thread(self.get, key)
+        except sqlite3.Error as e:
+            logger.warning(f"AI cache lookup failed: {e}")
+            cached = None
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # 上游请求在独立任务中执行，某个调用方取消（如流式客户端断开）时只取消它自己的等待，
+            # 任务继续为其他等待者完成并写入缓存；CancelledError不会传给其他调用方
+            task = asyncio.create_task(self._fetch_and_store(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish_inflight(key, done))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        value = await fetch()
+        if value is not None:
+            try:
+                await asyncio.to_thread(self.set, key, value)
+            except sqlite3.Error as e:
+                logger.warning(f"AI cache store failed: {e}")
+        return value
+
+    def _finish_inflight(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有调用方都已取消时没有人读取结果，避免"exception was never retrieved"警告
+        if not task.cancelled():
+            task.exception()
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM ai_cache")
+            conn.commit()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0] if self.enabled else 0
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+        }
+
+
+# 全局AI响应缓存实例
+ai_cache = AIResponseCache()
@@ -1,47 +1,116 @@
 import os
 import json
-import requests
-from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
+import time
+import random
+import asyncio
+import threading
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, AsyncIterator, Awaitable, Callable, Tuple
 import logging
+from app.core.ai_cache import ai_cache
+from app.core.metrics import metrics
+from app.core.model_router import model_router
+from app.utils.markdown_blocks import chunk_markdown
 
-# 加载环境变量
-load_dotenv()
+if TYPE_CHECKING:
+    # requests和httpx的导入开销较大，只在第一次调用上游接口时导入
+    import httpx
+    import requests
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 智谱提供的模型
+ZHIPU_MODELS = ["glm-4-0520", "glm-4", "glm-4-air", "glm-4-airx", "glm-3-turbo"]
+
 class AIService:
-    """AI服务抽象层，支持多种AI提供商"""
+    """AI服务抽象层，支持多种AI提供商
+
+    导入模块时只创建空的实例，第一次访问配置时（或启动预热阶段）才加载.env、
+    读取环境变量并初始化提供商，导入app.main不会读取密钥或输出警告。
+    """
 
     def __init__(self):
-        """初始化AI服务"""
+        """初始化AI服务，配置在第一次使用时加载"""
+        self._configured = False
+        self._configure_lock = threading.Lock()
+        self._session: Optional["requests.Session"] = None
+        self._async_clients: Dict[str, "httpx.AsyncClient"] = {}
+        self._model_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        # 只在实例上还没有该属性时调用：第一次访问配置项时加载配置
+        if name.startswith("__") or self.__dict__.get("_configured", True):
+            raise AttributeError(name)
+        self._configure()
+        return getattr(self, name)
+
+    def _configure(self) -> None:
+        """加载.env（不覆盖已有的环境变量）并读取AI相关配置"""
+        with self._configure_lock:
+            if self._configured:
+                return
+            from dotenv import load_dotenv
+            load_dotenv()
+            self._load_settings()
+            self._configured = True
+
+    def _load_settings(self) -> None:
         self.zhipu_api_key = os.getenv("ZHIPU_API_KEY")
-        self.zhipu_base_url = "https://open.bigmodel.cn/api/paas/v4"
+        self.zhipu_base_url = os.getenv("ZHIPU_BASE_URL", "https://open.bigmodel.cn/api/paas/v4")
 
-        # 初始化智谱AI客户端
+        # 异步客户端配置
+        self.request_timeout = float(os.getenv("AI_REQUEST_TIMEOUT", 60))
+        self.max_connections = int(os.getenv("AI_MAX_CONNECTIONS", 20))
+        self.max_concurrency_per_model = int(os.getenv("AI_MAX_CONCURRENCY_PER_MODEL", 4))
+        self.max_retries = int(os.getenv("AI_MAX_RETRIES", 3))
+        self.retry_backoff_base = float(os.getenv("AI_RETRY_BACKOFF_BASE", 0.5))
+        self.retry_backoff_max = float(os.getenv("AI_RETRY_BACKOFF_MAX", 8))
+
+        # 长文档分段处理配置：每段字符数、单个文档的并发段数、模板推荐最多分析的段数
+        self.chunk_chars = int(os.getenv("AI_CHUNK_CHARS", 2000))
+        self.chunk_concurrency = int(os.getenv("AI_CHUNK_CONCURRENCY", 4))
+        self.recommend_max_chunks = int(os.getenv("AI_RECOMMEND_MAX_CHUNKS", 3))
+
+        # 提供商配置：除智谱外，其他OpenAI兼容接口可以通过AI_PROVIDERS以JSON配置，例如
+        # {"local": {"base_url": "http://127.0.0.1:8000/v1", "api_key": "...", "models": ["qwen2"]}}
+        # 同名模型以后配置的提供商为准
+        self.providers: Dict[str, Dict[str, Any]] = {}
         if self.zhipu_api_key:
-            self.zhipu_headers = {
-                "Authorization": f"Bearer {self.zhipu_api_key}",
-                "Content-Type": "application/json"
+            self.providers["zhipu"] = {
+                "base_url": self.zhipu_base_url,
+                "api_key": self.zhipu_api_key,
+                "models": ZHIPU_MODELS,
             }
+        self.providers.update(json.loads(os.getenv("AI_PROVIDERS") or "{}"))
+        self._model_providers: Dict[str, str] = {
+            model: name for name, provider in self.providers.items() for model in provider.get("models", [])
+        }
+
+        # 初始化智谱AI客户端
+        if self.zhipu_api_key:
+            self.zhipu_headers = self._provider_headers(self.providers["zhipu"])
             self.model = "glm-4-0520"  # 使用GLM-4模型
         else:
             self.zhipu_headers = None
-            self.model = None
-            logger.warning("Zhipu API key not found. AI features will be disabled.")
-    
+            self.model = next(iter(self._model_providers), None)
+            if self.model is None:
+                logger.warning("Zhipu API key not found. AI features will be disabled.")
+
+    @staticmethod
+    def _provider_headers(provider: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {provider.get('api_key', '')}",
+            "Content-Type": "application/json"
+        }
+
     def is_available(self) -> bool:
         """检查AI服务是否可用"""
-        return self.zhipu_headers is not None
+        return bool(self._model_providers)
 
     def get_available_models(self) -> List[str]:
         """获取可用的模型列表"""
-        if not self.is_available():
-            return []
-
-        return ["glm-4-0520", "glm-4", "glm-4-air", "glm-4-airx", "glm-3-turbo"]
+        return list(self._model_providers)
     
     def chat_completion(self, messages: List[Dict[str, str]], model: str = None,
                        temperature: float = 0.7, max_tokens: Optional[int] = None) -> Optional[str]:
@@ -64,25 +133,22 @@ class AIService:
             model = self.model
 
         try:
-            payload = {
-                "model": model,
-                "messages": messages,
-                "temperature": temperature,
-            }
+            payload = self._build_payload(messages, model, temperature, max_tokens)
 
-            if max_tokens:
-                payload["max_tokens"] = max_tokens
+            if self._session is None:
+                import requests
+                self._session = requests.Session()
 
-            response = requests.post(
-                f"{self.zhipu_base_url}/chat/completions",
-                headers=self.zhipu_headers,
+            provider = self.providers[self._model_providers[model]]
+            response = self._session.post(
+                f"{provider['base_url']}/chat/completions",
+                headers=self._provider_headers(provider),
                 json=payload,
-                timeout=60
+                timeout=self.request_timeout
             )
 
             if response.status_code == 200:
-                result = response.json()
-                return result.get("choices", [{}])[0].get("message", {}).get("content")
+                return self._extract_content(response.json())
             else:
                 logger.error(f"API request failed with status {response.status_code}: {response.text}")
                 return None
@@ -91,19 +157,348 @@ class AIService:
             logger.error(f"Error in chat completion: {e}")
             return None
     
-    def generate_template_recommendations(self, content: str, template_names: List[str]) -> Optional[List[Dict[str, Any]]]:
-        """生成模板推荐
-        
+    @staticmethod
+    def _build_payload(messages: List[Dict[str, str]], model: str,
+                       temperature: float, max_tokens: Optional[int]) -> Dict[str, Any]:
+        """构造聊天完成请求体"""
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+        }
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        return payload
+
+    @staticmethod
+    def _extract_content(result: Dict[str, Any]) -> Optional[str]:
+        """从聊天完成响应中提取文本内容"""
+        return result.get("choices", [{}])[0].get("message", {}).get("content")
+
+    def _get_async_client(self, model: str) -> "httpx.AsyncClient":
+        """获取模型所属提供商共享的异步HTTP客户端（保持长连接，复用TCP/TLS连接）"""
+        name = self._model_providers[model]
+        client = self._async_clients.get(name)
+        if client is None:
+            import httpx
+            provider = self.providers[name]
+            client = self._async_clients[name] = httpx.AsyncClient(
+                base_url=provider["base_url"],
+                headers=self._provider_headers(provider),
+                timeout=self.request_timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return client
+
+    def _get_model_semaphore(self, model: str) -> asyncio.Semaphore:
+        """获取限制单个模型并发请求数的信号量"""
+        semaphore = self._model_semaphores.get(model)
+        if semaphore is None:
+            semaphore = self._model_semaphores[model] = asyncio.Semaphore(self.max_concurrency_per_model)
+        return semaphore
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """计算带随机抖动的指数退避时间，服务端给出Retry-After时以其为下限"""
+        delay = random.uniform(0, min(self.retry_backoff_max, self.retry_backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    async def achat_completion(self, messages: List[Dict[str, str]], model: str = None,
+                               temperature: float = 0.7, max_tokens: Optional[int] = None,
+                               timeout: Optional[float] = None,
+                               max_retries: Optional[int] = None) -> Optional[str]:
+        """chat_completion的异步版本，不阻塞事件循环
+
+        遇到429、5xx或网络错误时按带抖动的指数退避重试，最多重试max_retries次。
+        每次请求的延迟和成败都会记录到模型路由器。
+
         Args:
-            content: Markdown内容
-            template_names: 可用模板名称列表
-            
+            messages: 消息列表，格式为[{"role": "user", "content": "内容"}]
+            model: 使用的模型，默认使用self.model
+            temperature: 温度参数，控制随机性
+            max_tokens: 最大令牌数
+            timeout: 单次请求超时时间（秒），默认使用AI_REQUEST_TIMEOUT
+            max_retries: 重试次数，默认使用AI_MAX_RETRIES
+
         Returns:
-            推荐结果列表，每个元素包含模板名称和推荐理由
+            AI生成的文本内容，如果出错则返回None
         """
         if not self.is_available():
+            logger.warning("AI service is not available")
             return None
-        
+
+        if model is None:
+            model = self.model
+
+        if model not in self._model_providers:
+            logger.error(f"No provider configured for model {model}")
+            return None
+
+        import httpx
+        payload = self._build_payload(messages, model, temperature, max_tokens)
+        client = self._get_async_client(model)
+        request_timeout = timeout if timeout is not None else self.request_timeout
+        max_retries = self.max_retries if max_retries is None else max_retries
+
+        semaphore = self._get_model_semaphore(model)
+        for attempt in range(max_retries + 1):
+            retry_after = None
+            # 退避等待期间不占用并发名额
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/chat/completions", json=payload, timeout=request_timeout)
+                    elapsed = time.perf_counter() - start
+                    metrics.observe_ai_request(model, str(response.status_code), elapsed)
+                    model_router.record(model, elapsed, response.status_code == 200)
+                    if response.status_code == 200:
+                        result = response.json()
+                        metrics.record_ai_usage(model, result.get("usage"))
+                        return self._extract_content(result)
+                    if response.status_code != 429 and response.status_code < 500:
+                        logger.error(f"API request failed with status {response.status_code}: {response.text}")
+                        return None
+                    retry_after = response.headers.get("Retry-After")
+                    logger.warning(f"API request failed with status {response.status_code} (attempt {attempt + 1})")
+                except httpx.HTTPError as e:
+                    elapsed = time.perf_counter() - start
+                    metrics.observe_ai_request(model, "error", elapsed)
+                    model_router.record(model, elapsed, False)
+                    logger.warning(f"Error in chat completion (attempt {attempt + 1}): {e!r}")
+                except Exception as e:
+                    logger.error(f"Error in chat completion: {e}")
+                    return None
+
+            if attempt < max_retries:
+                await asyncio.sleep(self._retry_delay(attempt, retry_after))
+
+        logger.error(f"Chat completion with {model} failed after {max_retries + 1} attempts")
+        return None
+
+    def _route(self, task: str) -> List[str]:
+        return model_router.candidates(task, self._model_providers, default=self.model)
+
+    async def aroute_completion(self, messages: List[Dict[str, str]], task: str,
+                                temperature: float = 0.7, max_tokens: Optional[int] = None) -> Optional[str]:
+        """按任务选择模型完成对话，失败时回退到下一个模型，响应过慢时对冲
+
+        首选模型超过AI_HEDGE_AFTER秒仍未返回时，同时向下一个模型发起请求，
+        取先成功返回的结果并取消其余请求；模型失败时立即尝试下一个。
+
+        Args:
+            messages: 消息列表
+            task: 任务名称（recommend、suggest、beautify）
+            temperature: 温度参数
+            max_tokens: 最大令牌数
+
+        Returns:
+            AI生成的文本内容，所有模型都失败时返回None
+        """
+        if not self.is_available():
+            logger.warning("AI service is not available")
+            return None
+
+        remaining = self._route(task)
+        # 只有一个候选模型时没有回退的余地，按正常次数重试
+        max_retries = model_router.retries_per_model if len(remaining) > 1 else None
+        pending = set()
+
+        def launch() -> None:
+            model = remaining.pop(0)
+            pending.add(asyncio.ensure_future(self.achat_completion(
+                messages, model=model, temperature=temperature, max_tokens=max_tokens, max_retries=max_retries
+            )))
+
+        launch()
+        hedged = False
+        try:
+            while pending:
+                can_hedge = not hedged and remaining and model_router.hedge_after > 0
+                done, pending = await asyncio.wait(
+                    pending, timeout=model_router.hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # 首选模型响应过慢，向下一个模型发起对冲请求
+                    hedged = True
+                    model_router.hedged += 1
+                    launch()
+                    continue
+                for task_done in done:
+                    result = task_done.result()
+                    if result:
+                        return result
+                if not pending and remaining:
+                    model_router.fallbacks += 1
+                    launch()
+        finally:
+            for task_pending in pending:
+                task_pending.cancel()
+        return None
+
+    async def _acached_completion(self, messages: List[Dict[str, str]], task: str,
+                                  temperature: float = 0.7, max_tokens: Optional[int] = None) -> Optional[str]:
+        """带响应缓存和并发请求合并的aroute_completion"""
+        key = ai_cache.make_key(messages, model_router.cache_scope(task), temperature, max_tokens)
+        return await ai_cache.get_or_fetch(
+            key, lambda: self.aroute_completion(messages, task, temperature=temperature, max_tokens=max_tokens)
+        )
+
+    async def _astream_cached(self, messages: List[Dict[str, str]], task: str,
+                              temperature: float = 0.7) -> AsyncIterator[str]:
+        """带响应缓存的流式聊天完成：命中时一次性输出缓存内容，否则在完整输出后写入缓存"""
+        key = ai_cache.make_key(messages, model_router.cache_scope(task), temperature)
+        cached = await asyncio.to_thread(ai_cache.get, key) if ai_cache.enabled else None
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        async for delta in self.aroute_stream(messages, task, temperature=temperature):
+            parts.append(delta)
+            yield delta
+        if parts:
+            await asyncio.to_thread(ai_cache.set, key, "".join(parts))
+
+    @staticmethod
+    def _extract_delta(line: str) -> Optional[str]:
+        """解析流式响应中的一行SSE数据，返回增量文本；遇到结束标记时返回None"""
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return None
+        chunk = json.loads(data)
+        return chunk.get("choices", [{}])[0].get("delta", {}).get("content") or ""
+
+    async def astream_chat_completion(self, messages: List[Dict[str, str]], model: str = None,
+                                      temperature: float = 0.7, max_tokens: Optional[int] = None,
+                                      timeout: Optional[float] = None,
+                                      max_retries: Optional[int] = None) -> AsyncIterator[str]:
+        """使用流式模式进行聊天完成，逐段产出模型生成的文本
+
+        收到第一段内容之前遇到429、5xx或网络错误会按退避策略重试；
+        一旦开始输出就不再重试，中途出错时抛出httpx.HTTPError。
+        请求最终失败时不产出任何内容。
+
+        Args:
+            messages: 消息列表，格式为[{"role": "user", "content": "内容"}]
+            model: 使用的模型，默认使用self.model
+            temperature: 温度参数，控制随机性
+            max_tokens: 最大令牌数
+            timeout: 单次读取超时时间（秒），默认使用AI_REQUEST_TIMEOUT
+            max_retries: 重试次数，默认使用AI_MAX_RETRIES
+
+        Yields:
+            模型生成的增量文本
+        """
+        if not self.is_available():
+            logger.warning("AI service is not available")
+            return
+
+        if model is None:
+            model = self.model
+
+        if model not in self._model_providers:
+            logger.error(f"No provider configured for model {model}")
+            return
+
+        import httpx
+        payload = self._build_payload(messages, model, temperature, max_tokens)
+        payload["stream"] = True
+        client = self._get_async_client(model)
+        request_timeout = timeout if timeout is not None else self.request_timeout
+        max_retries = self.max_retries if max_retries is None else max_retries
+
+        semaphore = self._get_model_semaphore(model)
+        for attempt in range(max_retries + 1):
+            retry_after = None
+            started = False
+            # 退避等待期间不占用并发名额
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    async with client.stream("POST", "/chat/completions", json=payload,
+                                             timeout=request_timeout) as response:
+                        # 流式请求以收到响应头的时间作为延迟
+                        model_router.record(model, time.perf_counter() - start, response.status_code == 200)
+                        if response.status_code == 200:
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                delta = self._extract_delta(line)
+                                if delta is None:
+                                    break
+                                if delta:
+                                    started = True
+                                    yield delta
+                            return
+
+                        await response.aread()
+                        if response.status_code != 429 and response.status_code < 500:
+                            logger.error(f"API request failed with status {response.status_code}: {response.text}")
+                            return
+                        retry_after = response.headers.get("Retry-After")
+                        logger.warning(f"API request failed with status {response.status_code} (attempt {attempt + 1})")
+                except httpx.HTTPError as e:
+                    if started:
+                        logger.error(f"Stream interrupted: {e!r}")
+                        raise
+                    model_router.record(model, time.perf_counter() - start, False)
+                    logger.warning(f"Error in streaming chat completion (attempt {attempt + 1}): {e!r}")
+                except json.JSONDecodeError as e:
+                    logger.error(f"Error parsing streaming chunk: {e}")
+                    return
+
+            if attempt < max_retries:
+                await asyncio.sleep(self._retry_delay(attempt, retry_after))
+
+        logger.error(f"Streaming chat completion with {model} failed after {max_retries + 1} attempts")
+
+    async def aroute_stream(self, messages: List[Dict[str, str]], task: str,
+                            temperature: float = 0.7) -> AsyncIterator[str]:
+        """按任务选择模型进行流式聊天完成，开始输出之前失败时回退到下一个模型
+
+        流式请求不做对冲：已经输出给客户端的内容无法撤回。
+        """
+        if not self.is_available():
+            logger.warning("AI service is not available")
+            return
+
+        candidates = self._route(task)
+        max_retries = model_router.retries_per_model if len(candidates) > 1 else None
+        for index, model in enumerate(candidates):
+            if index:
+                model_router.fallbacks += 1
+            started = False
+            async for delta in self.astream_chat_completion(messages, model=model, temperature=temperature,
+                                                            max_retries=max_retries):
+                started = True
+                yield delta
+            if started:
+                return
+
+    def warmup(self) -> None:
+        """预先导入HTTP客户端并为每个提供商创建连接池，避免第一个AI请求承担这部分开销"""
+        for model in {provider["models"][0] for provider in self.providers.values() if provider.get("models")}:
+            self._get_async_client(model)
+
+    async def aclose(self) -> None:
+        """关闭共享的HTTP连接"""
+        for client in self._async_clients.values():
+            await client.aclose()
+        self._async_clients = {}
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _template_recommendation_messages(self, content: str, template_names: List[str]) -> List[Dict[str, str]]:
+        """构造模板推荐的对话消息"""
         # 准备模板信息
         template_info = {}
         for name in template_names:
@@ -113,7 +508,7 @@ class AIService:
         你是一个专业的文档美化助手。请根据以下Markdown文档内容，从提供的模板列表中推荐最合适的3个模板。
         
         文档内容：
-        {content[:2000]}  # 限制内容长度以避免超出token限制
+        {content}
         
         可用模板列表：
         {json.dumps(template_info, ensure_ascii=False, indent=2)}
@@ -133,12 +528,14 @@ class AIService:
         只返回JSON数组，不要添加其他解释文字。
         """
         
-        messages = [
+        return [
             {"role": "system", "content": "你是一个专业的文档美化助手，擅长根据文档内容推荐合适的模板。请严格按照要求的JSON格式返回结果。"},
             {"role": "user", "content": prompt}
         ]
-        
-        response = self.chat_completion(messages, model=self.model, temperature=0.3)
+
+    @staticmethod
+    def _parse_template_recommendations(response: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """解析模型返回的模板推荐JSON"""
         if response:
             try:
                 # 尝试解析JSON响应
@@ -150,24 +547,22 @@ class AIService:
                 # 返回原始响应作为备选
                 return [{"template": "default", "reason": "AI service response parsing failed"}]
         return None
-    
-    def generate_content_suggestions(self, content: str) -> Optional[str]:
-        """生成内容优化建议
-        
-        Args:
-            content: Markdown内容
-            
-        Returns:
-            优化建议文本
-        """
-        if not self.is_available():
-            return None
-        
+
+    @staticmethod
+    def _part_note(part: Optional[Tuple[int, int]]) -> str:
+        """长文档分段处理时附加在提示词中的说明"""
+        if not part:
+            return ""
+        index, total = part
+        return f"（注意：以下内容是一篇长文档的第{index}/{total}部分，请只处理这一部分，不要添加开头语或总结。）"
+
+    def _content_suggestion_messages(self, content: str, part: Optional[Tuple[int, int]] = None) -> List[Dict[str, str]]:
+        """构造内容优化建议的对话消息"""
         prompt = f"""
-        你是一个专业的文档编辑助手。请分析以下Markdown文档内容，提供优化建议：
+        你是一个专业的文档编辑助手。请分析以下Markdown文档内容，提供优化建议：{self._part_note(part)}
         
         文档内容：
-        {content[:2000]}  # 限制内容长度以避免超出token限制
+        {content}
         
         请从以下几个方面提供具体建议：
         1. 文档结构优化（标题层次、段落组织等）
@@ -178,31 +573,19 @@ class AIService:
         请提供具体、可操作的建议，并保持建议的简洁性。
         """
         
-        messages = [
+        return [
             {"role": "system", "content": "你是一个专业的文档编辑助手，擅长提供文档优化建议。"},
             {"role": "user", "content": prompt}
         ]
-        
-        return self.chat_completion(messages, model=self.model, temperature=0.5)
-    
-    def auto_beautify_content(self, content: str, target_template: str = "default") -> Optional[str]:
-        """自动美化内容
-        
-        Args:
-            content: Markdown内容
-            target_template: 目标模板
-            
-        Returns:
-            美化后的内容
-        """
-        if not self.is_available():
-            return None
-        
+
+    def _beautify_messages(self, content: str, target_template: str,
+                           part: Optional[Tuple[int, int]] = None) -> List[Dict[str, str]]:
+        """构造自动美化的对话消息"""
         prompt = f"""
-        你是一个专业的文档美化助手。请对以下Markdown文档进行优化和美化，使其更适合"{target_template}"模板：
+        你是一个专业的文档美化助手。请对以下Markdown文档进行优化和美化，使其更适合"{target_template}"模板：{self._part_note(part)}
         
         原始文档内容：
-        {content[:2000]}  # 限制内容长度以避免超出token限制
+        {content}
         
         请进行以下操作：
         1. 优化文档结构（调整标题层次、段落组织等）
@@ -213,12 +596,275 @@ class AIService:
         请直接返回优化后的Markdown内容，不要添加任何解释说明。
         """
         
-        messages = [
+        return [
             {"role": "system", "content": "你是一个专业的文档美化助手，擅长优化和美化Markdown文档。"},
             {"role": "user", "content": prompt}
         ]
+    
+    def _merge_suggestions_messages(self, suggestions: List[str]) -> List[Dict[str, str]]:
+        """构造合并各部分优化建议的对话消息"""
+        sections = "\n\n".join(
+            f"【第{index}部分的建议】\n{text}" for index, text in enumerate(suggestions, 1)
+        )
+        prompt = f"""
+        你是一个专业的文档编辑助手。以下是针对一篇长文档各个部分分别给出的优化建议：
+        
+        {sections}
         
+        请将这些建议合并为一份针对整篇文档的优化建议，去除重复内容，并按以下几个方面组织：
+        1. 文档结构优化（标题层次、段落组织等）
+        2. 语言表达改进（清晰度、准确性、流畅性等）
+        3. 内容完整性（是否有遗漏的重要信息）
+        4. 其他改进建议
+        
+        请提供具体、可操作的建议，并保持建议的简洁性。
+        """
+        
+        return [
+            {"role": "system", "content": "你是一个专业的文档编辑助手，擅长提供文档优化建议。"},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _chunk_content(self, content: str) -> List[str]:
+        """按标题和块边界将长文档拆分为若干段"""
+        chunks = [chunk for chunk in chunk_markdown(content, self.chunk_chars) if chunk.strip()]
+        return chunks or [content]
+
+    async def _amap_chunks(self, chunks: List[str],
+                           worker: Callable[[int, str], Awaitable[Any]]) -> List[Any]:
+        """以有限并发处理各段，结果按原顺序返回"""
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
+
+        async def run(index: int, chunk: str) -> Any:
+            async with semaphore:
+                return await worker(index, chunk)
+
+        return await asyncio.gather(*(run(index, chunk) for index, chunk in enumerate(chunks)))
+
+    @staticmethod
+    def _join_chunks(parts: List[str]) -> str:
+        """按顺序拼接各段处理结果"""
+        return "\n\n".join(part.strip("\n") for part in parts) + "\n"
+
+    @staticmethod
+    def _merge_recommendations(results: List[Optional[List[Dict[str, Any]]]]) -> Optional[List[Dict[str, Any]]]:
+        """合并各段的模板推荐：按排名计分，得分相同时保持首次出现的顺序"""
+        scores: Dict[str, float] = {}
+        reasons: Dict[str, str] = {}
+        for recommendations in results:
+            if not isinstance(recommendations, list):
+                continue
+            for rank, rec in enumerate(recommendations[:3]):
+                if not isinstance(rec, dict) or "template" not in rec:
+                    continue
+                name = rec["template"]
+                scores[name] = scores.get(name, 0) + (3 - rank)
+                reasons.setdefault(name, rec.get("reason", ""))
+        if not scores:
+            return None
+        ranked = sorted(scores, key=lambda name: -scores[name])
+        return [{"template": name, "reason": reasons[name]} for name in ranked]
+
+    def generate_template_recommendations(self, content: str, template_names: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """生成模板推荐
+        
+        Args:
+            content: Markdown内容
+            template_names: 可用模板名称列表
+            
+        Returns:
+            推荐结果列表，每个元素包含模板名称和推荐理由
+        """
+        if not self.is_available():
+            return None
+        
+        messages = self._template_recommendation_messages(content[:self.chunk_chars], template_names)
+        response = self.chat_completion(messages, model=self.model, temperature=0.3)
+        return self._parse_template_recommendations(response)
+
+    async def agenerate_template_recommendations(self, content: str, template_names: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """generate_template_recommendations的异步版本
+
+        长文档从头、中、尾均匀抽取至多recommend_max_chunks段分别推荐，再按排名计分合并。
+        """
+        if not self.is_available():
+            return None
+
+        chunks = self._chunk_content(content)
+        if len(chunks) > self.recommend_max_chunks:
+            step = (len(chunks) - 1) / max(1, self.recommend_max_chunks - 1)
+            chunks = [chunks[round(i * step)] for i in range(self.recommend_max_chunks)]
+
+        async def recommend(index: int, chunk: str) -> Optional[List[Dict[str, Any]]]:
+            messages = self._template_recommendation_messages(chunk, template_names)
+            response = await self._acached_completion(messages, task="recommend", temperature=0.3)
+            return self._parse_template_recommendations(response)
+
+        results = await self._amap_chunks(chunks, recommend)
+        if len(results) == 1:
+            return results[0]
+        return self._merge_recommendations(results)
+    
+    def generate_content_suggestions(self, content: str) -> Optional[str]:
+        """生成内容优化建议
+        
+        Args:
+            content: Markdown内容
+            
+        Returns:
+            优化建议文本
+        """
+        if not self.is_available():
+            return None
+        
+        messages = self._content_suggestion_messages(content[:self.chunk_chars])
+        return self.chat_completion(messages, model=self.model, temperature=0.5)
+
+    async def agenerate_content_suggestions(self, content: str) -> Optional[str]:
+        """generate_content_suggestions的异步版本
+
+        长文档分段并发生成建议，再由模型合并为一份整体建议。
+        """
+        if not self.is_available():
+            return None
+
+        chunks = self._chunk_content(content)
+        if len(chunks) == 1:
+            messages = self._content_suggestion_messages(content)
+            return await self._acached_completion(messages, task="suggest", temperature=0.5)
+
+        async def suggest(index: int, chunk: str) -> Optional[str]:
+            messages = self._content_suggestion_messages(chunk, (index + 1, len(chunks)))
+            return await self._acached_completion(messages, task="suggest", temperature=0.5)
+
+        parts = [part for part in await self._amap_chunks(chunks, suggest) if part]
+        if not parts:
+            return None
+        if len(parts) == 1:
+            return parts[0]
+
+        merged = await self._acached_completion(
+            self._merge_suggestions_messages(parts), task="suggest", temperature=0.5
+        )
+        if merged:
+            return merged
+        # 合并失败时直接返回各部分的建议
+        return "\n\n".join(f"### 第{index}部分\n\n{part}" for index, part in enumerate(parts, 1))
+
+    async def astream_content_suggestions(self, content: str) -> AsyncIterator[str]:
+        """以流式方式生成内容优化建议
+
+        长文档先并发生成各段建议，再流式输出合并后的结果。
+        """
+        chunks = self._chunk_content(content)
+        if len(chunks) == 1:
+            messages = self._content_suggestion_messages(content)
+            async for delta in self._astream_cached(messages, task="suggest", temperature=0.5):
+                yield delta
+            return
+
+        async def suggest(index: int, chunk: str) -> Optional[str]:
+            messages = self._content_suggestion_messages(chunk, (index + 1, len(chunks)))
+            return await self._acached_completion(messages, task="suggest", temperature=0.5)
+
+        parts = [part for part in await self._amap_chunks(chunks, suggest) if part]
+        if len(parts) <= 1:
+            for part in parts:
+                yield part
+            return
+
+        messages = self._merge_suggestions_messages(parts)
+        async for delta in self._astream_cached(messages, task="suggest", temperature=0.5):
+            yield delta
+    
+    def auto_beautify_content(self, content: str, target_template: str = "default") -> Optional[str]:
+        """自动美化内容
+        
+        Args:
+            content: Markdown内容
+            target_template: 目标模板
+            
+        Returns:
+            美化后的内容
+        """
+        if not self.is_available():
+            return None
+        
+        messages = self._beautify_messages(content[:self.chunk_chars], target_template)
         return self.chat_completion(messages, model=self.model, temperature=0.4)
 
+    async def _abeautify_chunk(self, chunk: str, target_template: str,
+                               part: Optional[Tuple[int, int]]) -> str:
+        """美化单个分段，失败时保留原文"""
+        messages = self._beautify_messages(chunk, target_template, part)
+        result = await self._acached_completion(messages, task="beautify", temperature=0.4)
+        if result is None:
+            logger.warning(f"Failed to beautify chunk {part}, keeping original content")
+            return chunk
+        return result
+
+    async def aauto_beautify_content(self, content: str, target_template: str = "default") -> Optional[str]:
+        """auto_beautify_content的异步版本
+
+        长文档按标题和块边界分段，以有限并发分别美化后按原顺序拼接，
+        总耗时接近单段的处理时间。个别分段失败时保留该段原文。
+        """
+        if not self.is_available():
+            return None
+
+        chunks = self._chunk_content(content)
+        if len(chunks) == 1:
+            messages = self._beautify_messages(content, target_template)
+            return await self._acached_completion(messages, task="beautify", temperature=0.4)
+
+        total = len(chunks)
+        results = await self._amap_chunks(
+            chunks, lambda index, chunk: self._abeautify_chunk(chunk, target_template, (index + 1, total))
+        )
+        if all(result is chunk for result, chunk in zip(results, chunks)):
+            return None
+        return self._join_chunks(results)
+
+    async def astream_beautify_content(self, content: str, target_template: str = "default") -> AsyncIterator[str]:
+        """以流式方式自动美化内容
+
+        长文档的第一段逐字流式输出，其余分段同时在后台美化，按顺序依次输出。
+        所有分段都美化失败时不输出任何内容。
+        """
+        chunks = self._chunk_content(content)
+        if len(chunks) == 1:
+            messages = self._beautify_messages(content, target_template)
+            async for delta in self._astream_cached(messages, task="beautify", temperature=0.4):
+                yield delta
+            return
+
+        total = len(chunks)
+        semaphore = asyncio.Semaphore(max(1, self.chunk_concurrency - 1))
+
+        async def beautify(index: int) -> str:
+            async with semaphore:
+                return await self._abeautify_chunk(chunks[index], target_template, (index + 1, total))
+
+        rest = [asyncio.create_task(beautify(index)) for index in range(1, total)]
+        try:
+            messages = self._beautify_messages(chunks[0], target_template, (1, total))
+            streamed = False
+            async for delta in self._astream_cached(messages, task="beautify", temperature=0.4):
+                streamed = True
+                yield delta
+            if not streamed:
+                # 首段美化失败时先等待其余分段，全部失败则不输出任何内容，由调用方返回错误
+                results = [await task for task in rest]
+                if all(result is chunks[index] for index, result in enumerate(results, 1)):
+                    logger.error("Failed to beautify every chunk")
+                    return
+                yield chunks[0].strip("\n")
+            for task in rest:
+                yield "\n\n" + (await task).strip("\n")
+            yield "\n"
+        finally:
+            for task in rest:
+                task.cancel()
+
 # 全局AI服务实例
 ai_service = AIService()
\ No newline at end of file
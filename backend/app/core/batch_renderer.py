@@ -0,0 +1,250 @@
+import io
+import os
+import json
+import asyncio
+import tarfile
+import zipfile
+import posixpath
+from typing import IO, AsyncIterator, Dict, List, Set, Tuple
+
+from fastapi import UploadFile
+
+from app.core.render_executor import render_executor, RenderQueueFullError
+from app.utils.markdown_processor import render_cache_keys
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+# 解压归档成员时每次读取的字节数
+READ_CHUNK_SIZE = 64 * 1024
+# 渲染队列已满时的重试次数（退避间隔从50ms逐步增加到1s，合计约25秒）
+RENDER_RETRIES = 30
+
+
+def output_name(filename: str, used: Set[str]) -> str:
+    """
+    将输入文件名转换为zip中安全且不重复的.html文件名
+
+    去掉盘符、开头的斜杠以及"."和".."路径段，反斜杠按目录分隔符处理；
+    与已使用的名称重复时（如多次上传同名文件，或规范化后路径相同）追加-2、-3等后缀。
+
+    Args:
+        filename: 输入的文件名（可能来自归档，不可信）
+        used: 已使用的输出名称，调用后会加入本次返回的名称
+
+    Returns:
+        str: 输出文件名
+    """
+    path = filename.replace("\\", "/")
+    if len(path) > 1 and path[1] == ":":
+        # Windows盘符，如C:/docs/a.md
+        path = path[2:]
+    parts = [part for part in path.split("/") if part not in ("", ".", "..")]
+    stem = posixpath.splitext("/".join(parts))[0] or "document"
+    name = f"{stem}.html"
+    suffix = 2
+    while name.lower() in used:
+        name = f"{stem}-{suffix}.html"
+        suffix += 1
+    used.add(name.lower())
+    return name
+
+
+class BatchTooLargeError(Exception):
+    """批量请求的文件数量或总大小超过限制"""
+
+
+class _ZipStream(io.RawIOBase):
+    """不可寻址的写入缓冲，用于边生成边发送zip文件"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class BatchRenderer:
+    """批量渲染整个文档仓库
+
+    接受多个.md文件或zip/tar归档，通过渲染执行器并行渲染，每完成一个文件就
+    输出一条结果。单个文件出错只记录在该文件的结果中，不影响整个批次。
+    """
+
+    def __init__(self):
+        self.max_files = int(os.getenv("BATCH_MAX_FILES", 1000))
+        self.max_total_bytes = int(os.getenv("BATCH_MAX_TOTAL_BYTES", 100 * 1024 * 1024))
+        self.max_archive_members = int(os.getenv("BATCH_MAX_ARCHIVE_MEMBERS", 10000))
+        self.concurrency = int(os.getenv("BATCH_CONCURRENCY", render_executor.process_workers * 2))
+
+    def _read_member(self, fileobj: IO[bytes], declared_size: int, budget: int) -> bytes:
+        """分块读取归档成员，解压后的大小超过剩余额度时抛出BatchTooLargeError
+
+        归档头中声明的大小可能是伪造的，因此除了读取前检查声明的大小，
+        读取时也按实际解压出的字节数计数。
+        """
+        if declared_size > budget:
+            raise BatchTooLargeError(f"Batch exceeds {self.max_total_bytes} bytes after decompression")
+        chunks = []
+        size = 0
+        while True:
+            chunk = fileobj.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return b"".join(chunks)
+            size += len(chunk)
+            if size > budget:
+                raise BatchTooLargeError(f"Batch exceeds {self.max_total_bytes} bytes after decompression")
+            chunks.append(chunk)
+
+    def _extract_archive(self, filename: str, data: bytes, budget: int, max_files: int) -> List[Tuple[str, bytes]]:
+        """
+        从zip/tar归档中取出所有.md文件
+
+        Args:
+            filename: 归档文件名，用于判断格式
+            data: 归档内容
+            budget: 解压后内容允许的最大字节数
+            max_files: 允许取出的最大文件数
+
+        Returns:
+            List[Tuple[str, bytes]]: (文件名, 原始内容)列表
+        """
+        documents = []
+
+        def add(name: str, fileobj: IO[bytes], declared_size: int) -> None:
+            nonlocal budget
+            if len(documents) >= max_files:
+                raise BatchTooLargeError(f"Batch exceeds {self.max_files} files")
+            content = self._read_member(fileobj, declared_size, budget)
+            budget -= len(content)
+            documents.append((name, content))
+
+        if filename.endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                members = archive.infolist()
+                if len(members) > self.max_archive_members:
+                    raise BatchTooLargeError(f"Archive has more than {self.max_archive_members} entries")
+                for info in members:
+                    if not info.is_dir() and info.filename.endswith(".md"):
+                        with archive.open(info) as fileobj:
+                            add(info.filename, fileobj, info.file_size)
+        else:
+            with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as archive:
+                # 逐个迭代成员，不一次性读取全部成员列表
+                for count, member in enumerate(archive, 1):
+                    if count > self.max_archive_members:
+                        raise BatchTooLargeError(f"Archive has more than {self.max_archive_members} entries")
+                    if member.isfile() and member.name.endswith(".md"):
+                        add(member.name, archive.extractfile(member), member.size)
+        return documents
+
+    async def collect(self, files: List[UploadFile]) -> List[Tuple[str, bytes]]:
+        """
+        读取上传的文件，展开其中的归档
+        
+        Args:
+            files: 上传的.md文件或zip/tar归档
+            
+        Returns:
+            List[Tuple[str, bytes]]: (文件名, 原始内容)列表
+        """
+        documents: List[Tuple[str, bytes]] = []
+        total = 0
+        for upload in files:
+            data = await upload.read()
+            total += len(data)
+            if total > self.max_total_bytes:
+                raise BatchTooLargeError(f"Batch exceeds {self.max_total_bytes} bytes")
+
+            filename = upload.filename or ""
+            if filename.endswith(ARCHIVE_SUFFIXES):
+                # 解压后的内容同样计入总大小，避免压缩炸弹耗尽内存
+                extracted = await asyncio.to_thread(
+                    self._extract_archive, filename, data,
+                    self.max_total_bytes - total, self.max_files - len(documents),
+                )
+                total += sum(len(content) for _, content in extracted)
+                documents.extend(extracted)
+            else:
+                documents.append((filename, data))
+
+            if len(documents) > self.max_files:
+                raise BatchTooLargeError(f"Batch exceeds {self.max_files} files")
+        return documents
+
+    @staticmethod
+    async def _render_one(index: int, filename: str, data: bytes, template: str) -> Dict:
+        if not filename.endswith(".md"):
+            return {"index": index, "filename": filename, "status": "error", "detail": "Only .md files are allowed"}
+        try:
+            markdown_text = data.decode("utf-8")
+            keys = render_cache_keys(markdown_text, template)
+            # 所有文档都在进程池中渲染，多个文档在多个工作进程中并行，不受GIL限制；
+            # 同样计入排队上限，队列已满时稍后重试，批量渲染让出执行器给交互请求
+            for attempt in range(RENDER_RETRIES):
+                try:
+                    page = await render_executor.render(markdown_text, template, keys, kind="large")
+                    break
+                except RenderQueueFullError:
+                    if attempt == RENDER_RETRIES - 1:
+                        raise
+                    await asyncio.sleep(min(1.0, 0.05 * 2 ** attempt))
+            return {"index": index, "filename": filename, "status": "ok", "html_content": page}
+        except Exception as e:
+            return {"index": index, "filename": filename, "status": "error", "detail": str(e)}
+
+    async def render(self, documents: List[Tuple[str, bytes]], template: str) -> AsyncIterator[Dict]:
+        """并行渲染所有文档，按完成顺序逐个产出结果"""
+        # 至少为交互请求的大文档保留一个进程池排队名额
+        semaphore = asyncio.Semaphore(max(1, min(self.concurrency, render_executor.max_pending_large - 1)))
+
+        async def run(index: int, filename: str, data: bytes) -> Dict:
+            async with semaphore:
+                return await self._render_one(index, filename, data, template)
+
+        tasks = [asyncio.create_task(run(index, name, data)) for index, (name, data) in enumerate(documents)]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stream_ndjson(self, documents: List[Tuple[str, bytes]], template: str) -> AsyncIterator[bytes]:
+        """以NDJSON格式逐行输出结果，最后一行为汇总信息"""
+        succeeded = failed = 0
+        async for result in self.render(documents, template):
+            if result["status"] == "ok":
+                succeeded += 1
+            else:
+                failed += 1
+            yield (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+        summary = {"status": "done", "total": len(documents), "succeeded": succeeded, "failed": failed}
+        yield (json.dumps(summary) + "\n").encode("utf-8")
+
+    async def stream_zip(self, documents: List[Tuple[str, bytes]], template: str) -> AsyncIterator[bytes]:
+        """以zip格式边渲染边输出，每个文档保存为同名.html，出错的文件记录在errors.json中"""
+        stream = _ZipStream()
+        errors = []
+        used = {"errors.json"}
+        with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            async for result in self.render(documents, template):
+                if result["status"] == "ok":
+                    archive.writestr(output_name(result["filename"], used), result["html_content"])
+                    yield stream.drain()
+                else:
+                    errors.append({"filename": result["filename"], "detail": result["detail"]})
+            if errors:
+                archive.writestr("errors.json", json.dumps(errors, ensure_ascii=False, indent=2))
+        yield stream.drain()
+
+
+# 全局批量渲染器实例
+batch_renderer = BatchRenderer()
@@ -0,0 +1,255 @@
+import os
+import gzip
+import zlib
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import anyio.to_thread
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.render_cache import etag_matches
+from app.core.template_manager import template_manager
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """解析Accept-Encoding请求头，返回客户端接受的编码（忽略q=0的项）"""
+    encodings = []
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings.append(name)
+    return encodings
+
+
+# 不再压缩的内容类型：已压缩的格式、SSE事件流和PDF
+EXCLUDED_CONTENT_TYPES = (
+    "application/gzip",
+    "application/x-gzip",
+    "application/zip",
+    "application/pdf",
+    "audio/*",
+    "font/woff",
+    "font/woff2",
+    "image/avif",
+    "image/gif",
+    "image/jpeg",
+    "image/png",
+    "image/webp",
+    "text/event-stream",
+    "video/*",
+)
+
+
+class CompressingResponder:
+    """按指定编码压缩单个响应的ASGI包装
+
+    收到响应头后先暂存，根据第一块正文决定是否压缩：已设置Content-Encoding、
+    部分内容（206）、排除的内容类型以及较小的非流式响应原样发送。
+    """
+
+    def __init__(self, app: ASGIApp, encoding: str, level: int, minimum_size: int,
+                 thread_minimum_size: int, exclude_content_types: Tuple[str, ...]):
+        self.app = app
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.thread_minimum_size = thread_minimum_size
+        self.exclude_content_types = exclude_content_types
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.passthrough = False
+        self.started = False
+        self._compressor = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    def _excluded(self, message: Message) -> bool:
+        headers = Headers(raw=message["headers"])
+        if "content-encoding" in headers or message["status"] == 206:
+            return True
+        media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+        return bool({media_type, media_type.partition("/")[0] + "/*"} & set(self.exclude_content_types))
+
+    async def send_with_compression(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # 先暂存响应头，等第一块正文确定是否压缩后再发送
+            self.initial_message = message
+            self.passthrough = self._excluded(message)
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            if not self.started and message_type == "http.response.pathsend":
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.started:
+            message["body"] = await self.compress(body, more_body)
+            await self.send(message)
+            return
+
+        self.started = True
+        headers = MutableHeaders(raw=self.initial_message["headers"])
+        if len(body) < self.minimum_size and not more_body:
+            # 较小的响应不压缩
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+        headers.add_vary_header("Accept-Encoding")
+        headers["Content-Encoding"] = self.encoding
+        message["body"] = await self.compress(body, more_body)
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(message["body"]))
+        await self.send(self.initial_message)
+        await self.send(message)
+
+    async def compress(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= self.thread_minimum_size:
+            # 大块内容在线程中压缩，避免阻塞事件循环
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        # 流式响应每块都刷新，保证客户端能逐块解压显示
+        if self.encoding == "br":
+            if self._compressor is None:
+                self._compressor = brotli.Compressor(quality=self.level)
+            data = self._compressor.process(body)
+            return data + (self._compressor.flush() if more_body else self._compressor.finish())
+        if self._compressor is None:
+            self._compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        data = self._compressor.compress(body)
+        return data + self._compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """压缩较大的响应
+
+    客户端接受br时使用brotli，否则使用gzip；SSE、图片、PDF和已设置
+    Content-Encoding的响应（如预压缩的模板样式表）不再压缩。流式响应逐块压缩并刷新。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.gzip_level = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+        self.brotli_quality = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+        self.minimum_size = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+        self.thread_minimum_size = 128 * 1024
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = accepted_encodings(Headers(scope=scope).get("Accept-Encoding", ""))
+        if "br" in accepted:
+            encoding, level = "br", self.brotli_quality
+        elif "gzip" in accepted:
+            encoding, level = "gzip", self.gzip_level
+        else:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressingResponder(
+            self.app, encoding, level, self.minimum_size,
+            thread_minimum_size=self.thread_minimum_size,
+            exclude_content_types=EXCLUDED_CONTENT_TYPES,
+        )
+        await responder(scope, receive, send)
+
+
+class StaticAsset:
+    """以最高压缩级别预先压缩好的静态资源，响应时按Accept-Encoding选择
+
+    已经压缩过的格式（如PNG）传入compress=False，只提供原始内容。
+    """
+
+    def __init__(self, body: bytes, media_type: str, compress: bool = True):
+        self.body = body
+        self.media_type = media_type
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.encoded: Dict[str, bytes] = {}
+        if compress:
+            self.encoded["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            self.encoded["br"] = brotli.compress(body, quality=11)
+
+    def response(self, headers: Headers, cache_control: str) -> Response:
+        response_headers = {"ETag": self.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(headers.get("If-None-Match"), self.etag):
+            return Response(status_code=304, headers=response_headers)
+        accepted = accepted_encodings(headers.get("Accept-Encoding", ""))
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.encoded:
+                response_headers["Content-Encoding"] = encoding
+                return Response(self.encoded[encoding], media_type=self.media_type, headers=response_headers)
+        return Response(self.body, media_type=self.media_type, headers=response_headers)
+
+
+class TemplateAssets:
+    """模板样式表
+
+    紧凑响应只返回正文片段，页面样式通过带内容哈希的URL单独加载。样式内容不变时
+    URL不变，浏览器可以长期缓存；模板修改后哈希变化，URL随之改变。
+    每个模板的样式表在第一次使用（或启动预热）时压缩一次。
+    """
+
+    def __init__(self):
+        self.max_age = int(os.getenv("STATIC_ASSET_MAX_AGE", 365 * 24 * 3600))
+        self._stylesheets: Dict[str, Tuple[str, StaticAsset]] = {}
+
+    @staticmethod
+    def _resolve_name(template_name: str) -> str:
+        # 与渲染时一致，不存在的模板使用默认模板
+        return template_name if template_manager.get_template_info(template_name) else "default"
+
+    def stylesheet_url(self, template_name: str) -> str:
+        template_name = self._resolve_name(template_name)
+        return f"/api/templates/{template_name}/style.{template_manager.get_template_css_hash(template_name)}.css"
+
+    def stylesheet(self, template_name: str) -> Optional[StaticAsset]:
+        """获取模板当前版本的样式表"""
+        template_name = self._resolve_name(template_name)
+        css_hash = template_manager.get_template_css_hash(template_name)
+        if not css_hash:
+            return None
+        cached = self._stylesheets.get(template_name)
+        if cached is not None and cached[0] == css_hash:
+            return cached[1]
+        asset = StaticAsset(template_manager.get_template_css(template_name).encode("utf-8"), "text/css")
+        self._stylesheets[template_name] = (css_hash, asset)
+        return asset
+
+    def stylesheet_cache_control(self, template_name: str, css_hash: str) -> str:
+        # 旧哈希的URL仍返回当前样式，但不允许长期缓存
+        if css_hash == template_manager.get_template_css_hash(template_name):
+            return f"public, max-age={self.max_age}, immutable"
+        return "no-cache"
+
+    def warmup(self) -> None:
+        for template_name in template_manager.get_template_names():
+            self.stylesheet(template_name)
+
+
+# 全局模板样式表实例
+template_assets = TemplateAssets()
@@ -0,0 +1,244 @@
+import os
+import re
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.core.render_executor import render_executor
+from app.utils.markdown_blocks import split_blocks
+from app.utils.markdown_processor import apply_template, process_markdown
+
+# 引用式链接定义，例如 [id]: https://example.com
+REFERENCE_DEF_RE = re.compile(r"^ {0,3}\[[^\]]+\]:\s*\S.*$", re.MULTILINE)
+
+# 依赖全文的内容：脚注引用或定义、目录标记、缩写定义（extra中的abbr对全文生效）
+FOOTNOTE_RE = re.compile(r"\[\^[^\]\s]+\]")
+ABBR_DEF_RE = re.compile(r"^\*\[[^\]]+\]:", re.MULTILINE)
+TOC_MARKER_RE = re.compile(r"^ {0,3}\[TOC\]\s*$", re.MULTILINE)
+# ATX标题和Setext标题，用于检查重复的标题id
+ATX_HEADING_RE = re.compile(r"^ {0,3}#{1,6}[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+SETEXT_HEADING_RE = re.compile(r"^ {0,3}(\S.*?)[ \t]*\n {0,3}(?:=+|-+)[ \t]*$", re.MULTILINE)
+# 块首的HTML块级标签或注释
+HTML_BLOCK_RE = re.compile(r"^ {0,3}<(!--|[a-zA-Z][a-zA-Z0-9-]*)")
+
+
+class DocumentNotFoundError(KeyError):
+    """文档会话不存在或已过期"""
+
+
+class VersionConflictError(Exception):
+    """客户端的基准版本与服务端不一致，需要重新打开文档"""
+
+
+def render_blocks(blocks: List[str], references: str = "") -> List[str]:
+    """
+    逐块将Markdown转换为HTML片段
+    
+    Args:
+        blocks: 顶层Markdown块
+        references: 文档中的引用式链接定义，附加到每个块之后以便解析引用链接
+        
+    Returns:
+        List[str]: 与blocks一一对应的HTML片段
+    """
+    suffix = f"\n\n{references}\n" if references else ""
+    return [process_markdown(block + suffix) if block.strip() else "" for block in blocks]
+
+
+def _html_block_spans_blocks(block: str) -> bool:
+    """块以HTML块级标签或注释开头、但在块内没有结束，说明HTML块跨越了空行"""
+    match = HTML_BLOCK_RE.match(block)
+    if match is None:
+        return False
+    from markdown.util import BLOCK_LEVEL_ELEMENTS
+    name = match.group(1)
+    if name == "!--":
+        return "-->" not in block
+    name = name.lower()
+    if name not in BLOCK_LEVEL_ELEMENTS:
+        return False
+    return f"</{name}" not in block.lower()
+
+
+def needs_full_render(text: str, blocks: List[str]) -> bool:
+    """
+    判断文档是否包含逐块转换与整篇转换结果不同的内容
+    
+    脚注、目录、缩写定义、重复的标题（整篇转换时id会加后缀去重）以及跨越空行的
+    HTML块都依赖其他块，这类文档需要整篇转换。
+    
+    Args:
+        text: 文档全文
+        blocks: 文档拆分后的顶层块
+        
+    Returns:
+        bool: 是否需要整篇转换
+    """
+    if FOOTNOTE_RE.search(text) or TOC_MARKER_RE.search(text) or ABBR_DEF_RE.search(text):
+        return True
+    headings = ATX_HEADING_RE.findall(text) + SETEXT_HEADING_RE.findall(text)
+    from markdown.extensions.toc import slugify
+    ids = [slugify(re.sub(r"[*_`]", "", heading), "-") for heading in headings]
+    if len(ids) != len(set(ids)):
+        return True
+    return any(_html_block_spans_blocks(block) for block in blocks)
+
+
+def render_full(blocks: List[str]) -> List[str]:
+    """整篇转换，结果作为唯一的HTML片段"""
+    return [process_markdown("".join(blocks))]
+
+
+class DocumentSession:
+    """一个正在编辑的文档：保存按顶层块拆分的源码和对应的HTML片段"""
+
+    def __init__(self, doc_id: str, template: str, blocks: List[str], html: List[str], references: str,
+                 full_render: bool = False):
+        self.doc_id = doc_id
+        self.template = template
+        self.version = 1
+        self.blocks = blocks
+        self.html = html
+        self.references = references
+        # 整篇转换时html只有一个片段，不再与blocks一一对应
+        self.full_render = full_render
+        self.lock = asyncio.Lock()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.blocks)
+
+
+class IncrementalRenderer:
+    """实时预览的增量渲染
+
+    客户端打开文档后只需发送文本编辑（按顺序应用的字符区间替换），服务端重新
+    拆分顶层块，与上一版本比较公共前缀和后缀，只渲染中间发生变化的块并返回
+    HTML片段的替换区间。拆分是线性的字符串扫描，远比Markdown转换便宜，因此
+    预览延迟主要取决于编辑涉及的块而不是文档大小。
+
+    各块独立转换：引用式链接定义会附加到每个块以保证解析正确，定义变化时整篇
+    重新渲染。文档包含脚注、目录、缩写定义、重复标题或跨越空行的HTML块时逐块转换的结果
+    与整篇转换不同，此时改为整篇转换，HTML只有一个片段，每次编辑都替换整个片段，
+    响应中的full_render告知客户端。
+    """
+
+    def __init__(self):
+        self.max_documents = int(os.getenv("INCREMENTAL_MAX_DOCUMENTS", 1000))
+        self._sessions: "OrderedDict[str, DocumentSession]" = OrderedDict()
+
+    @staticmethod
+    def _references(text: str) -> str:
+        return "\n".join(match.group(0).strip() for match in REFERENCE_DEF_RE.finditer(text))
+
+    def _store(self, session: DocumentSession) -> None:
+        self._sessions[session.doc_id] = session
+        self._sessions.move_to_end(session.doc_id)
+        while len(self._sessions) > self.max_documents:
+            self._sessions.popitem(last=False)
+
+    def _get(self, doc_id: str) -> DocumentSession:
+        session = self._sessions.get(doc_id)
+        if session is None:
+            raise DocumentNotFoundError(doc_id)
+        self._sessions.move_to_end(doc_id)
+        return session
+
+    async def open(self, content: str, template: str = "default",
+                   doc_id: Optional[str] = None) -> DocumentSession:
+        """打开（或重新打开）文档并完整渲染一次"""
+        doc_id = doc_id or uuid.uuid4().hex
+        blocks = split_blocks(content)
+        references = self._references(content)
+        full_render = needs_full_render(content, blocks)
+        if full_render:
+            html = await render_executor.submit(render_full, blocks, size=len(content))
+        else:
+            html = await render_executor.submit(render_blocks, blocks, references, size=len(content))
+        session = DocumentSession(doc_id, template, blocks, html, references, full_render)
+        self._store(session)
+        return session
+
+    def close(self, doc_id: str) -> None:
+        self._sessions.pop(doc_id, None)
+
+    @staticmethod
+    def _apply_edits(text: str, edits: List[Tuple[int, int, str]]) -> str:
+        for start, end, replacement in edits:
+            if not 0 <= start <= end <= len(text):
+                raise ValueError(f"Edit range [{start}, {end}) is out of bounds")
+            text = text[:start] + replacement + text[end:]
+        return text
+
+    async def apply_patch(self, doc_id: str, base_version: int,
+                          edits: List[Tuple[int, int, str]]) -> Dict:
+        """
+        应用文本编辑并只重新渲染变化的块
+        
+        Args:
+            doc_id: 文档ID
+            base_version: 编辑所基于的版本号
+            edits: (起始偏移, 结束偏移, 替换文本)列表，按顺序应用，偏移基于前一次编辑后的文本
+            
+        Returns:
+            Dict: 新版本号、HTML片段的替换区间(start, delete, insert)、片段数以及是否整篇转换
+        """
+        session = self._get(doc_id)
+        async with session.lock:
+            if base_version != session.version:
+                raise VersionConflictError(
+                    f"Document is at version {session.version}, patch is based on {base_version}"
+                )
+
+            text = self._apply_edits(session.text, edits)
+            blocks = split_blocks(text)
+            references = self._references(text)
+
+            full_render = needs_full_render(text, blocks)
+            old_blocks = session.blocks
+            if full_render or session.full_render or references != session.references:
+                # 整篇转换，或引用定义变化可能影响任意块，替换全部片段
+                prefix = suffix = 0
+            else:
+                limit = min(len(old_blocks), len(blocks))
+                prefix = 0
+                while prefix < limit and old_blocks[prefix] == blocks[prefix]:
+                    prefix += 1
+                suffix = 0
+                while (suffix < limit - prefix
+                       and old_blocks[len(old_blocks) - 1 - suffix] == blocks[len(blocks) - 1 - suffix]):
+                    suffix += 1
+
+            if full_render:
+                inserted = await render_executor.submit(render_full, blocks, size=len(text))
+            else:
+                changed = blocks[prefix:len(blocks) - suffix]
+                inserted = await render_executor.submit(
+                    render_blocks, changed, references, size=sum(len(block) for block in changed)
+                )
+
+            delete = len(session.html) - prefix - suffix
+            session.html[prefix:prefix + delete] = inserted
+            session.blocks = blocks
+            session.references = references
+            session.full_render = full_render
+            session.version += 1
+
+            return {
+                "doc_id": doc_id,
+                "version": session.version,
+                "start": prefix,
+                "delete": delete,
+                "insert": inserted,
+                "block_count": len(session.html),
+                "full_render": full_render,
+            }
+
+    def render_page(self, session: DocumentSession) -> str:
+        """将当前所有块的HTML片段应用模板，得到完整页面"""
+        return apply_template("\n".join(session.html), session.template)
+
+
+# 全局增量渲染器实例
+incremental_renderer = IncrementalRenderer()
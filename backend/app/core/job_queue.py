@@ -0,0 +1,405 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 优先级名称到调度顺序（数值越小越先执行）
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+# 任务处理函数：接收提交时的参数，返回可JSON序列化的结果
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class JobQueueFullError(Exception):
+    """任务队列（或单个客户端的排队数）已满"""
+
+
+class JobStoreError(Exception):
+    """任务无法写入持久化存储"""
+
+
+class UnknownJobKindError(Exception):
+    """没有注册对应类型的任务处理函数"""
+
+
+class Job:
+    """异步任务"""
+
+    def __init__(self, kind: str, payload: Dict[str, Any], client_id: str, priority: str = "normal",
+                 job_id: Optional[str] = None, created_at: Optional[float] = None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload
+        self.client_id = client_id
+        self.priority = priority
+        self.status = "pending"
+        self.created_at = created_at or time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+    def to_dict(self, position: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "position": position,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """任务的持久化存储（SQLite）
+
+    未完成的任务连同参数一起保存，重启后重新排队；完成后清除参数、保存结果，
+    结果保留JOB_TTL秒。
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    client_id TEXT NOT NULL,
+                    priority TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def save(self, job: Job) -> None:
+        finished = job.status in ("completed", "failed", "cancelled")
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, kind, client_id, priority, status, payload, result, error,"
+                " created_at, started_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.job_id, job.kind, job.client_id, job.priority, job.status,
+                    None if finished else json.dumps(job.payload, ensure_ascii=False),
+                    json.dumps(job.result, ensure_ascii=False) if job.status == "completed" else None,
+                    job.error, job.created_at, job.started_at, job.finished_at,
+                ),
+            )
+            conn.commit()
+
+    @staticmethod
+    def _from_row(row: tuple) -> Job:
+        job_id, kind, client_id, priority, status, payload, result, error, created_at, started_at, finished_at = row
+        job = Job(kind, json.loads(payload) if payload else {}, client_id, priority, job_id, created_at)
+        job.status = status
+        job.result = json.loads(result) if result is not None else None
+        job.error = error
+        job.started_at = started_at
+        job.finished_at = finished_at
+        return job
+
+    def load(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._from_row(row) if row is not None else None
+
+    def load_unfinished(self) -> List[Job]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT * FROM jobs WHERE status IN ('pending', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def expire(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+            conn.commit()
+        return deleted
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobQueue:
+    """长耗时任务（AI美化、内容建议、大文档渲染）的异步队列
+
+    提交后立即返回任务ID，由固定数量的工作协程执行，请求不再占用HTTP连接等待结果。
+    调度规则：
+    - 先按优先级（high、normal、low）
+    - 同一优先级内按客户端轮流取任务，单个客户端大量提交不会让其他客户端一直排队
+    - 每个客户端的排队数不超过JOB_MAX_PENDING_PER_CLIENT，总排队数不超过JOB_MAX_PENDING
+    任务状态和结果写入SQLite，重启后未完成的任务重新排队，已完成的结果仍可查询。
+    """
+
+    def __init__(self):
+        self.workers = int(os.getenv("JOB_WORKERS", 4))
+        self.max_pending = int(os.getenv("JOB_MAX_PENDING", 256))
+        self.max_pending_per_client = int(os.getenv("JOB_MAX_PENDING_PER_CLIENT", 16))
+        self.timeout = float(os.getenv("JOB_TIMEOUT", 300))
+        self.store = JobStore(os.getenv("JOB_STORE_PATH", "data/jobs.sqlite3"), float(os.getenv("JOB_TTL", 24 * 3600)))
+
+        self._handlers: Dict[str, JobHandler] = {}
+        # 优先级 -> 客户端 -> 该客户端排队中的任务；OrderedDict的顺序即轮转顺序
+        self._queues: Dict[int, "OrderedDict[str, Deque[Job]]"] = {level: OrderedDict() for level in PRIORITIES.values()}
+        self._active: Dict[str, Job] = {}
+        self._pending_by_client: Dict[str, int] = {}
+        self._pending = 0
+        # 保护排队计数：检查上限和占用名额必须在同一次加锁中完成
+        self._count_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """注册某类任务的处理函数"""
+        self._handlers[kind] = handler
+
+    async def start(self) -> None:
+        """启动工作协程，并将上次运行时未完成的任务重新排队"""
+        if self._wakeup is not None:
+            return
+        self._wakeup = asyncio.Event()
+        try:
+            await asyncio.to_thread(self.store.expire)
+            unfinished = await asyncio.to_thread(self.store.load_unfinished)
+        except sqlite3.Error as e:
+            logger.warning(f"Job store unavailable: {e}")
+            unfinished = []
+        for job in unfinished:
+            if job.kind not in self._handlers:
+                continue
+            job.status = "pending"
+            job.started_at = None
+            self._reserve(job.client_id)
+            self._enqueue(job)
+        if unfinished:
+            logger.info(f"Requeued {len(unfinished)} unfinished jobs")
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """停止工作协程；执行中的任务保持running状态，下次启动时重新执行"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._wakeup = None
+        for queue in self._queues.values():
+            queue.clear()
+        self._active.clear()
+        self._pending_by_client.clear()
+        self._pending = 0
+        self.store.close()
+
+    def _reserve(self, client_id: str, limited: bool = False) -> None:
+        """占用一个排队名额；limited为True时先检查上限，超出时抛出JobQueueFullError"""
+        with self._count_lock:
+            if limited:
+                if self._pending >= self.max_pending:
+                    self.rejected += 1
+                    raise JobQueueFullError("Too many pending jobs")
+                if self._pending_by_client.get(client_id, 0) >= self.max_pending_per_client:
+                    self.rejected += 1
+                    raise JobQueueFullError(f"Too many pending jobs for client {client_id}")
+            self._pending_by_client[client_id] = self._pending_by_client.get(client_id, 0) + 1
+            self._pending += 1
+
+    def _enqueue(self, job: Job) -> None:
+        queue = self._queues[PRIORITIES[job.priority]]
+        queue.setdefault(job.client_id, deque()).append(job)
+        self._active[job.job_id] = job
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _dequeue(self) -> Optional[Job]:
+        for level in sorted(self._queues):
+            queue = self._queues[level]
+            if not queue:
+                continue
+            # 取轮到的客户端的第一个任务，该客户端还有任务时排到本优先级的末尾
+            client_id, jobs = next(iter(queue.items()))
+            job = jobs.popleft()
+            if jobs:
+                queue.move_to_end(client_id)
+            else:
+                del queue[client_id]
+            self._release(job.client_id)
+            return job
+        return None
+
+    def _release(self, client_id: str) -> None:
+        with self._count_lock:
+            self._pending -= 1
+            remaining = self._pending_by_client[client_id] - 1
+            if remaining:
+                self._pending_by_client[client_id] = remaining
+            else:
+                del self._pending_by_client[client_id]
+
+    async def submit(self, kind: str, payload: Dict[str, Any], client_id: str, priority: str = "normal") -> Job:
+        """提交任务，队列已满时抛出JobQueueFullError，任务无法持久化时抛出JobStoreError
+
+        Args:
+            kind: 任务类型，需事先注册处理函数
+            payload: 传给处理函数的参数，需可JSON序列化
+            client_id: 提交任务的客户端，用于公平调度
+            priority: high、normal或low
+
+        Returns:
+            Job: 已排队的任务
+        """
+        if kind not in self._handlers:
+            raise UnknownJobKindError(f"Unknown job kind: {kind}")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        # 先占用名额再等待写入，并发提交不会同时通过上限检查
+        self._reserve(client_id, limited=True)
+        job = Job(kind, payload, client_id, priority)
+        try:
+            await self.start()
+            await asyncio.to_thread(self.store.save, job)
+        except sqlite3.Error as e:
+            self._release(client_id)
+            raise JobStoreError(f"Job store unavailable: {e}")
+        except BaseException:
+            self._release(client_id)
+            raise
+        self._enqueue(job)
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = self._dequeue()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            await asyncio.to_thread(self.store.save, job)
+            job.result = await asyncio.wait_for(self._handlers[job.kind](job.payload), self.timeout)
+            job.status = "completed"
+            self.completed += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            job.error = f"Job timed out after {self.timeout:.0f}s"
+            job.status = "failed"
+            self.failed += 1
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            self.failed += 1
+        job.finished_at = time.time()
+        job.payload = {}
+        try:
+            await asyncio.to_thread(self.store.save, job)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist job {job.job_id}: {e}")
+        self._active.pop(job.job_id, None)
+
+    def _position(self, job: Job) -> Optional[int]:
+        """估算排队中的任务前面还有多少个任务"""
+        if job.status != "pending":
+            return None
+        level = PRIORITIES[job.priority]
+        ahead = sum(
+            sum(len(jobs) for jobs in self._queues[other].values()) for other in self._queues if other < level
+        )
+        jobs = self._queues[level].get(job.client_id)
+        if jobs is None:
+            return ahead
+        # 轮转调度下，同优先级的每个客户端每轮执行一个任务
+        rounds = jobs.index(job) + 1
+        return ahead + sum(min(len(other), rounds) for other in self._queues[level].values()) - 1
+
+    async def get_job(self, job_id: str) -> Optional[Job]:
+        job = self._active.get(job_id)
+        if job is not None:
+            return job
+        return await asyncio.to_thread(self.store.load, job_id)
+
+    async def describe(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.get_job(job_id)
+        return job.to_dict(self._position(job)) if job is not None else None
+
+    async def cancel(self, job_id: str) -> bool:
+        """取消排队中的任务，已开始执行的任务不能取消"""
+        job = self._active.get(job_id)
+        if job is None or job.status != "pending":
+            return False
+        jobs = self._queues[PRIORITIES[job.priority]][job.client_id]
+        jobs.remove(job)
+        if not jobs:
+            del self._queues[PRIORITIES[job.priority]][job.client_id]
+        self._release(job.client_id)
+        self._active.pop(job_id, None)
+        job.status = "cancelled"
+        job.finished_at = time.time()
+        job.payload = {}
+        await asyncio.to_thread(self.store.save, job)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": sum(1 for job in self._active.values() if job.status == "running"),
+            "pending": self._pending,
+            "pending_by_priority": {
+                name: sum(len(jobs) for jobs in self._queues[level].values()) for name, level in PRIORITIES.items()
+            },
+            "clients": len(self._pending_by_client),
+            "max_pending": self.max_pending,
+            "max_pending_per_client": self.max_pending_per_client,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+# 全局任务队列实例
+job_queue = JobQueue()
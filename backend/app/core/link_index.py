@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+class WikiLinksDisabledError(Exception):
+    """渲染管线未启用双向链接扩展（WIKI_LINKS=false），无法建立链接索引"""
+
+
+def normalize_note_name(name: str) -> str:
+    """笔记名称的规范形式：忽略大小写、首尾空白、多余空白和.md后缀，用于匹配链接目标"""
+    name = " ".join(name.split()).casefold()
+    return name[:-3] if name.endswith(".md") else name
+
+
+class DocumentLinks:
+    """一篇文档中的双向链接和标题"""
+
+    def __init__(self, links: List[Dict[str, Any]], headings: List[Dict[str, Any]]):
+        self.links = links
+        self.headings = headings
+
+    @property
+    def title(self) -> Optional[str]:
+        for heading in self.headings:
+            if heading["level"] == 1 and heading["text"]:
+                return heading["text"]
+        return None
+
+
+def analyze_document(markdown_text: str) -> DocumentLinks:
+    """取文档渲染时wiki_links扩展收集的[[双向链接]]和标题
+
+    渲染过的文档直接使用渲染缓存中的结果，不再重新解析；未渲染过的文档按渲染管线渲染一次。
+    """
+    from app.utils.markdown_processor import build_links
+
+    links = build_links(markdown_text)
+    if links is None:
+        raise WikiLinksDisabledError("Wiki links are disabled (WIKI_LINKS=false)")
+    data = json.loads(links)
+    return DocumentLinks(data["links"], data["headings"])
+
+
+class LinkIndex:
+    """双向链接的持久化倒排索引（SQLite）
+
+    每篇文档更新时只替换该文档自己的出链和标题（内容哈希未变时跳过），
+    links表按目标建索引，反向链接和图邻域查询都是索引查找，与笔记总数基本无关。
+    链接目标按normalize_note_name匹配文档（忽略大小写和.md后缀），
+    目标文档尚未建立索引的链接也会保留，文档加入后自动成为其反向链接。
+    """
+
+    def __init__(self):
+        self.path = os.getenv("LINK_INDEX_PATH", "data/links.sqlite3")
+        self.max_graph_nodes = int(os.getenv("LINK_GRAPH_MAX_NODES", 500))
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # 串行化更新：读取哈希、解析和写入在同一次加锁中完成，同一文档的并发更新
+        # 不会让先开始、后写入的旧版本覆盖新版本；查询只使用_lock，不受解析影响
+        self._update_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_key TEXT PRIMARY KEY,
+                    doc_id TEXT NOT NULL,
+                    title TEXT,
+                    digest TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS links (
+                    source_key TEXT NOT NULL,
+                    target_key TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    heading TEXT,
+                    count INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_links_source ON links (source_key);
+                CREATE INDEX IF NOT EXISTS idx_links_target ON links (target_key, source_key);
+                CREATE TABLE IF NOT EXISTS headings (
+                    doc_key TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    level INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    anchor TEXT,
+                    PRIMARY KEY (doc_key, position)
+                );
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _digest(markdown_text: str, title: Optional[str]) -> str:
+        return hashlib.sha256(f"{title or ''}\x00{markdown_text}".encode("utf-8")).hexdigest()
+
+    def _write(self, conn: sqlite3.Connection, doc_id: str, title: Optional[str], digest: str,
+               document: DocumentLinks) -> None:
+        doc_key = normalize_note_name(doc_id)
+        conn.execute("DELETE FROM links WHERE source_key = ?", (doc_key,))
+        conn.execute("DELETE FROM headings WHERE doc_key = ?", (doc_key,))
+        counts = Counter(
+            (normalize_note_name(link["target"]), link["target"], link["heading"]) for link in document.links
+        )
+        conn.executemany(
+            "INSERT INTO links (source_key, target_key, target, heading, count) VALUES (?, ?, ?, ?, ?)",
+            [(doc_key, target_key, target, heading, count) for (target_key, target, heading), count in counts.items()],
+        )
+        conn.executemany(
+            "INSERT INTO headings (doc_key, position, level, text, anchor) VALUES (?, ?, ?, ?, ?)",
+            [(doc_key, position, heading["level"], heading["text"], heading["anchor"])
+             for position, heading in enumerate(document.headings)],
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO documents (doc_key, doc_id, title, digest, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (doc_key, doc_id, title or document.title or doc_id, digest, time.time()),
+        )
+
+    def update_many(self, documents: Iterable[Tuple[str, str, Optional[str]]]) -> Dict[str, int]:
+        """在一个事务中更新多篇文档的索引
+
+        Args:
+            documents: (文档ID, Markdown文本, 标题)，标题为None时使用第一个一级标题
+
+        Returns:
+            {"updated": 重新索引的文档数, "unchanged": 内容未变而跳过的文档数}
+        """
+        pending = []
+        for doc_id, markdown_text, title in documents:
+            pending.append((doc_id, markdown_text, title, self._digest(markdown_text, title)))
+        with self._update_lock:
+            with self._lock:
+                conn = self._connect()
+                keys = [normalize_note_name(doc_id) for doc_id, _, _, _ in pending]
+                current = {}
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    current.update(conn.execute(
+                        f"SELECT doc_key, digest FROM documents WHERE doc_key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall())
+
+            changed = [item for key, item in zip(keys, pending) if current.get(key) != item[3]]
+            # 解析时只持有_update_lock，不阻塞查询
+            analyzed = [(doc_id, title, digest, analyze_document(markdown_text))
+                        for doc_id, markdown_text, title, digest in changed]
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    for doc_id, title, digest, document in analyzed:
+                        self._write(conn, doc_id, title, digest, document)
+        return {"updated": len(analyzed), "unchanged": len(pending) - len(analyzed)}
+
+    def update(self, doc_id: str, markdown_text: str, title: Optional[str] = None) -> bool:
+        """更新一篇文档的索引，内容有变化时返回True"""
+        return self.update_many([(doc_id, markdown_text, title)])["updated"] > 0
+
+    def delete(self, doc_id: str) -> bool:
+        """从索引中删除文档（其他文档指向它的链接保留为未解析链接）"""
+        doc_key = normalize_note_name(doc_id)
+        with self._update_lock, self._lock:
+            conn = self._connect()
+            with conn:
+                deleted = conn.execute("DELETE FROM documents WHERE doc_key = ?", (doc_key,)).rowcount
+                conn.execute("DELETE FROM links WHERE source_key = ?", (doc_key,))
+                conn.execute("DELETE FROM headings WHERE doc_key = ?", (doc_key,))
+        return deleted > 0
+
+    def _document_row(self, conn: sqlite3.Connection, doc_key: str) -> Optional[Tuple[str, str]]:
+        return conn.execute("SELECT doc_id, title FROM documents WHERE doc_key = ?", (doc_key,)).fetchone()
+
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """返回文档的标题、出链和标题列表"""
+        doc_key = normalize_note_name(doc_id)
+        with self._lock:
+            conn = self._connect()
+            row = self._document_row(conn, doc_key)
+            if row is None:
+                return None
+            links = conn.execute(
+                "SELECT l.target, l.heading, l.count, d.doc_id FROM links l "
+                "LEFT JOIN documents d ON d.doc_key = l.target_key WHERE l.source_key = ? ORDER BY l.target_key",
+                (doc_key,),
+            ).fetchall()
+            headings = conn.execute(
+                "SELECT level, text, anchor FROM headings WHERE doc_key = ? ORDER BY position", (doc_key,)
+            ).fetchall()
+        return {
+            "doc_id": row[0],
+            "title": row[1],
+            "links": [
+                {"target": target, "heading": heading, "count": count, "resolved": resolved is not None}
+                for target, heading, count, resolved in links
+            ],
+            "headings": [{"level": level, "text": text, "anchor": anchor} for level, text, anchor in headings],
+        }
+
+    def backlinks(self, doc_id: str) -> List[Dict[str, Any]]:
+        """返回链接到该文档的所有文档（文档本身不必已建立索引）"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT d.doc_id, d.title, l.heading, l.count FROM links l "
+                "JOIN documents d ON d.doc_key = l.source_key WHERE l.target_key = ? ORDER BY d.doc_key",
+                (normalize_note_name(doc_id),),
+            ).fetchall()
+        return [{"doc_id": source, "title": title, "heading": heading, "count": count}
+                for source, title, heading, count in rows]
+
+    def neighborhood(self, doc_id: str, depth: int = 1, limit: Optional[int] = None) -> Dict[str, Any]:
+        """返回以文档为中心、沿出链和反向链接扩展depth步的子图
+
+        Args:
+            doc_id: 中心文档
+            depth: 扩展步数
+            limit: 节点数上限，默认LINK_GRAPH_MAX_NODES
+
+        Returns:
+            {"nodes": [{id, title, exists, distance}], "edges": [{source, target, count}], "truncated": bool}
+        """
+        limit = min(limit or self.max_graph_nodes, self.max_graph_nodes)
+        center = normalize_note_name(doc_id)
+        distances = {center: 0}
+        edges: Dict[Tuple[str, str], int] = {}
+        frontier = [center]
+        truncated = False
+
+        with self._lock:
+            conn = self._connect()
+            for distance in range(1, depth + 1):
+                if not frontier or truncated:
+                    break
+                next_frontier = []
+                for start in range(0, len(frontier), 500):
+                    chunk = frontier[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT source_key, target_key, SUM(count) FROM links WHERE source_key IN ({placeholders}) "
+                        f"GROUP BY source_key, target_key UNION ALL "
+                        f"SELECT source_key, target_key, SUM(count) FROM links WHERE target_key IN ({placeholders}) "
+                        f"GROUP BY source_key, target_key",
+                        chunk + chunk,
+                    ).fetchall()
+                    for source, target, count in rows:
+                        for node in (source, target):
+                            if node in distances:
+                                continue
+                            if len(distances) >= limit:
+                                truncated = True
+                                continue
+                            distances[node] = distance
+                            next_frontier.append(node)
+                        if source in distances and target in distances:
+                            edges[(source, target)] = count
+                frontier = next_frontier
+
+            keys = list(distances)
+            documents: Dict[str, Tuple[str, str]] = {}
+            display: Dict[str, str] = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for doc_key, doc, title in conn.execute(
+                    f"SELECT doc_key, doc_id, title FROM documents WHERE doc_key IN ({placeholders})", chunk
+                ):
+                    documents[doc_key] = (doc, title)
+                # 未建立索引的目标使用链接中写的名称
+                for target_key, target in conn.execute(
+                    f"SELECT target_key, MIN(target) FROM links WHERE target_key IN ({placeholders}) GROUP BY target_key",
+                    chunk,
+                ):
+                    display[target_key] = target
+
+        def node_id(key: str) -> str:
+            return documents[key][0] if key in documents else display.get(key, key)
+
+        return {
+            "nodes": [
+                {
+                    "id": node_id(key),
+                    "title": documents[key][1] if key in documents else node_id(key),
+                    "exists": key in documents,
+                    "distance": distance,
+                }
+                for key, distance in distances.items()
+            ],
+            "edges": [
+                {"source": node_id(source), "target": node_id(target), "count": count}
+                for (source, target), count in edges.items()
+            ],
+            "truncated": truncated,
+        }
+
+    def clear(self) -> None:
+        with self._update_lock, self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM documents")
+                conn.execute("DELETE FROM links")
+                conn.execute("DELETE FROM headings")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            conn = self._connect()
+            documents = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            links = conn.execute("SELECT COALESCE(SUM(count), 0) FROM links").fetchone()[0]
+            unresolved = conn.execute(
+                "SELECT COUNT(DISTINCT target_key) FROM links WHERE target_key NOT IN (SELECT doc_key FROM documents)"
+            ).fetchone()[0]
+        return {"documents": documents, "links": links, "unresolved_targets": unresolved}
+
+
+# 全局链接索引实例
+link_index = LinkIndex()
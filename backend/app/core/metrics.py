@@ -0,0 +1,221 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Prometheus默认的延迟桶（秒），末尾补充了适合AI请求的长耗时桶
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# 当前请求记录的阶段耗时，用于生成Server-Timing响应头
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def _escape_label_value(value: str) -> str:
+    """按Prometheus文本格式转义标签值中的反斜杠、双引号和换行"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{_escape_label_value(value)}"' for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    """按标签分组的直方图"""
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # 每组标签：各桶计数（非累计，最后一项为+Inf）、总和、次数
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, (('le', repr(bound)),))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total[0]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """整条处理管线的性能指标
+
+    各阶段耗时记录在直方图中，通过/metrics以Prometheus文本格式导出；
+    同时记入当前请求的阶段列表，由ServerTimingMiddleware写入Server-Timing响应头。
+    METRICS_ENABLED=false时stage()直接返回空上下文，几乎没有额外开销。
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.stage_duration = Histogram(
+            "bettermd_stage_duration_seconds", "Time spent in each processing stage"
+        )
+        self.request_duration = Histogram(
+            "bettermd_http_request_duration_seconds", "HTTP request latency by route"
+        )
+        self.ai_upstream_duration = Histogram(
+            "bettermd_ai_upstream_duration_seconds", "Latency of upstream AI model requests"
+        )
+        self.ai_stream_ttfb = Histogram(
+            "bettermd_ai_stream_first_token_seconds", "Time to first token for streaming AI requests"
+        )
+        self.ai_tokens = Counter("bettermd_ai_tokens_total", "Tokens reported by the AI provider")
+        self._metrics = [
+            self.stage_duration,
+            self.request_duration,
+            self.ai_upstream_duration,
+            self.ai_stream_ttfb,
+            self.ai_tokens,
+        ]
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        """记录一个阶段的耗时"""
+        self.stage_duration.observe(seconds, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, seconds))
+
+    @contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def stage(self, name: str):
+        """计时上下文：with metrics.stage("markdown_convert"): ..."""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    def observe_ai_request(self, model: str, status: str, seconds: float) -> None:
+        if self.enabled:
+            self.ai_upstream_duration.observe(seconds, model=model, status=status)
+            self.record_stage("ai_upstream", seconds)
+
+    def record_ai_usage(self, model: str, usage: Optional[Dict]) -> None:
+        if not self.enabled or not usage:
+            return
+        for kind in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            if usage.get(kind):
+                self.ai_tokens.inc(usage[kind], model=model, kind=kind.replace("_tokens", ""))
+
+    def expose(self) -> str:
+        """以Prometheus文本格式导出所有指标"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+def _server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """合并同名阶段，生成Server-Timing响应头"""
+    totals: Dict[str, List[float]] = {}
+    for name, seconds in timings:
+        entry = totals.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    parts = []
+    for name, (seconds, count) in totals.items():
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="x{count}"'
+        parts.append(part)
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """收集每个请求的阶段耗时，写入Server-Timing响应头并记录请求延迟"""
+
+    def __init__(self, app, path_prefixes: Tuple[str, ...] = ("/api/markdown", "/api/ai")):
+        self.app = app
+        self.path_prefixes = path_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                existing = [value for name, value in headers if name.lower() == b"server-timing"]
+                header = _server_timing_header(timings + [("app", time.perf_counter() - start)])
+                if existing:
+                    header = existing[0].decode("latin-1") + ", " + header
+                    headers = [(name, value) for name, value in headers if name.lower() != b"server-timing"]
+                headers.append((b"server-timing", header.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            metrics.request_duration.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"]),
+            )
+
+
+# 全局指标实例
+metrics = Metrics()
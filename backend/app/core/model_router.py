@@ -0,0 +1,164 @@
+import os
+import time
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+# 各类任务默认使用的模型，按优先顺序排列
+DEFAULT_TASK_MODELS = {
+    # 模板推荐只需返回简短的JSON，优先使用响应更快的轻量模型
+    "recommend": "glm-4-airx,glm-4-air,glm-4-0520",
+    "suggest": "glm-4-0520,glm-4,glm-4-air",
+    "beautify": "glm-4-0520,glm-4,glm-4-air",
+}
+
+# 按观测到的延迟（而不是配置顺序）选择模型的任务
+LATENCY_FIRST_TASKS = ("recommend",)
+
+
+class ModelStats:
+    """单个模型最近若干次请求的延迟和成败"""
+
+    def __init__(self, window: int):
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.last_error_at: Optional[float] = None
+
+    def record(self, latency: float, ok: bool) -> None:
+        self._samples.append((latency, ok))
+        if not ok:
+            self.last_error_at = time.time()
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    @property
+    def latency(self) -> Optional[float]:
+        """成功请求延迟的中位数"""
+        latencies = sorted(latency for latency, ok in self._samples if ok)
+        return latencies[len(latencies) // 2] if latencies else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.count,
+            "error_rate": round(self.error_rate, 3),
+            "latency_p50": self.latency,
+            "last_error_at": self.last_error_at,
+        }
+
+
+class ModelRouter:
+    """按任务选择模型
+
+    每个任务配置一组按优先顺序排列的模型（AI_MODELS_<TASK>，逗号分隔）。
+    路由器记录每个模型最近AI_ROUTER_WINDOW次请求的延迟和错误率：
+    - 错误率超过AI_ROUTER_MAX_ERROR_RATE的模型排到最后，冷却AI_ROUTER_COOLDOWN秒后恢复原位
+    - LATENCY_FIRST_TASKS中的任务在健康的模型里按延迟中位数从低到高选择
+    调用方按返回的顺序依次尝试（失败时回退），首个模型超过hedge_after秒未返回时
+    可以同时向下一个模型发起请求（对冲），取先返回的结果。
+    """
+
+    def __init__(self):
+        self.window = int(os.getenv("AI_ROUTER_WINDOW", 50))
+        self.min_samples = int(os.getenv("AI_ROUTER_MIN_SAMPLES", 5))
+        self.max_error_rate = float(os.getenv("AI_ROUTER_MAX_ERROR_RATE", 0.5))
+        self.cooldown = float(os.getenv("AI_ROUTER_COOLDOWN", 30))
+        # 对冲等待时间（秒），为0时不对冲
+        self.hedge_after = float(os.getenv("AI_HEDGE_AFTER", 10))
+        # 路由时每个模型的重试次数，失败后尽快回退到下一个模型
+        self.retries_per_model = int(os.getenv("AI_ROUTER_RETRIES", 1))
+
+        self.task_models: Dict[str, List[str]] = {
+            task: self._parse_models(os.getenv(f"AI_MODELS_{task.upper()}", default))
+            for task, default in DEFAULT_TASK_MODELS.items()
+        }
+        self._stats: Dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+        self.hedged = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def _parse_models(value: str) -> List[str]:
+        return [model.strip() for model in value.split(",") if model.strip()]
+
+    def _get_stats(self, model: str) -> ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = ModelStats(self.window)
+        return stats
+
+    def record(self, model: str, latency: float, ok: bool) -> None:
+        """记录一次请求的结果"""
+        with self._lock:
+            self._get_stats(model).record(latency, ok)
+
+    def is_healthy(self, model: str) -> bool:
+        stats = self._stats.get(model)
+        if stats is None or stats.count < self.min_samples or stats.error_rate <= self.max_error_rate:
+            return True
+        # 冷却期过后重新给不健康的模型机会，由新的请求结果决定其状态
+        return stats.last_error_at is not None and time.time() - stats.last_error_at > self.cooldown
+
+    def _measured_latency(self, model: str) -> Optional[float]:
+        stats = self._stats.get(model)
+        if stats is None or stats.count < self.min_samples:
+            return None
+        return stats.latency
+
+    def candidates(self, task: str, available: Iterable[str], default: Optional[str] = None) -> List[str]:
+        """按尝试顺序返回任务可用的模型
+
+        Args:
+            task: 任务名称（recommend、suggest、beautify）
+            available: 已配置提供商的模型
+            default: 任务未配置可用模型时使用的模型
+
+        Returns:
+            模型名称列表，第一个为首选
+        """
+        available = set(available)
+        models = [model for model in self.task_models.get(task, []) if model in available]
+        if not models and default in available:
+            models = [default]
+        with self._lock:
+            order = {model: index for index, model in enumerate(models)}
+            if task in LATENCY_FIRST_TASKS:
+                measured = {model: self._measured_latency(model) for model in models}
+                known = sorted(latency for latency in measured.values() if latency is not None)
+                # 样本不足的模型取其他模型延迟的中位数，与之相同时按配置顺序
+                prior = known[len(known) // 2] if known else 0.0
+                key = lambda model: (
+                    not self.is_healthy(model),
+                    prior if measured[model] is None else measured[model],
+                    order[model],
+                )
+            else:
+                key = lambda model: (not self.is_healthy(model), order[model])
+            return sorted(models, key=key)
+
+    def cache_scope(self, task: str) -> str:
+        """响应缓存键中代表任务及其模型配置的部分"""
+        return f"task:{task}:{','.join(self.task_models.get(task, []))}"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tasks": self.task_models,
+                "hedge_after": self.hedge_after,
+                "hedged": self.hedged,
+                "fallbacks": self.fallbacks,
+                "models": {
+                    model: {**stats.snapshot(), "healthy": self.is_healthy(model)}
+                    for model, stats in self._stats.items()
+                },
+            }
+
+
+# 全局模型路由器实例
+model_router = ModelRouter()
@@ -0,0 +1,121 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from app.core.template_manager import STYLE_BLOCK_RE, template_manager
+from app.core.render_executor import render_executor
+from app.utils.markdown_processor import render_cache_keys
+
+
+class PdfExportUnavailableError(Exception):
+    """weasyprint或其依赖的系统库不可用"""
+
+
+class PdfQueueFullError(Exception):
+    """PDF导出队列已满"""
+
+
+# 以下为工作进程中的状态：解析后的样式表和字体配置在同一进程的多次导出间复用
+_font_config = None
+_stylesheets: Dict[str, object] = {}
+
+
+def _init_worker() -> None:
+    """工作进程启动时预先加载weasyprint和字体配置"""
+    global _font_config
+    try:
+        from weasyprint.text.fonts import FontConfiguration
+    except (ImportError, OSError):
+        return
+    _font_config = FontConfiguration()
+
+
+def render_pdf(html: str, template_version: str, css: str, base_url: Optional[str] = None) -> bytes:
+    """
+    在工作进程中将HTML转换为PDF
+    
+    Args:
+        html: 不含<style>块的完整页面
+        template_version: 模板版本标识，用作样式表缓存的键
+        css: 模板样式
+        base_url: 解析相对链接和图片的基准地址
+        
+    Returns:
+        bytes: PDF内容
+    """
+    global _font_config
+    try:
+        from weasyprint import CSS, HTML
+        from weasyprint.text.fonts import FontConfiguration
+    except (ImportError, OSError) as e:
+        raise PdfExportUnavailableError(f"weasyprint is not available: {e}")
+
+    if _font_config is None:
+        _font_config = FontConfiguration()
+
+    stylesheet = _stylesheets.get(template_version)
+    if stylesheet is None:
+        stylesheet = CSS(string=css, font_config=_font_config)
+        _stylesheets[template_version] = stylesheet
+
+    return HTML(string=html, base_url=base_url).write_pdf(
+        stylesheets=[stylesheet], font_config=_font_config
+    )
+
+
+class PdfExporter:
+    """服务端PDF导出
+
+    Markdown先经过渲染缓存和渲染执行器得到模板页面，再交给专用进程池中的
+    weasyprint转换。模板样式从页面中剥离出来单独传入，工作进程按模板版本缓存
+    解析后的样式表，并在所有任务间共享字体配置。大文档通过统一的异步任务队列
+    （job_queue中的pdf任务）导出，通过任务ID查询状态和下载结果。
+    """
+
+    def __init__(self):
+        self.workers = int(os.getenv("PDF_WORKERS", 2))
+        self.max_pending = int(os.getenv("PDF_MAX_PENDING", 16))
+        self.async_threshold = int(os.getenv("PDF_ASYNC_THRESHOLD_CHARS", 100 * 1024))
+        self.base_url = os.getenv("PDF_BASE_URL") or None
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(render_executor.process_start_method),
+                initializer=_init_worker,
+            )
+        return self._pool
+
+    async def export(self, markdown_text: str, template: str = "default") -> bytes:
+        """将Markdown导出为PDF，队列已满时抛出PdfQueueFullError"""
+        if self._pending >= self.max_pending:
+            raise PdfQueueFullError("Too many pending PDF exports")
+
+        self._pending += 1
+        try:
+            keys = render_cache_keys(markdown_text, template)
+            page = await render_executor.render(markdown_text, template, keys)
+            html = STYLE_BLOCK_RE.sub("", page)
+            css = template_manager.get_template_css(template)
+            version = template_manager.get_template_version(template)
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, render_pdf, html, version, css, self.base_url)
+        finally:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# 全局PDF导出器实例
+pdf_exporter = PdfExporter()
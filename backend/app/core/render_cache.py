@@ -0,0 +1,129 @@
+import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class LRUByteCache:
+    """按字节数限制容量的线程安全LRU缓存"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: str, value: str) -> None:
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            # 单个条目超过总容量时不缓存，避免清空整个缓存
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._items[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _digest(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class RenderCache:
+    """内容寻址的渲染缓存
+
+    分为两层：
+    - fragments: Markdown转换得到的HTML片段，键为(内容, 扩展配置)
+    - pages: 应用模板后的完整页面，键为(片段键, 模板名称, 模板版本)
+    切换模板时可以直接复用已转换的HTML片段。
+    另外links以片段键保存转换时wiki_links扩展收集的链接和标题（JSON），供双向链接索引使用。
+    """
+
+    def __init__(self):
+        self.fragments = LRUByteCache(int(os.getenv("RENDER_CACHE_FRAGMENT_BYTES", 32 * 1024 * 1024)))
+        self.pages = LRUByteCache(int(os.getenv("RENDER_CACHE_PAGE_BYTES", 64 * 1024 * 1024)))
+        self.links = LRUByteCache(int(os.getenv("RENDER_CACHE_LINK_BYTES", 8 * 1024 * 1024)))
+
+    @staticmethod
+    def fragment_key(content: str, config_key: str) -> str:
+        return _digest("fragment", config_key, content)
+
+    @staticmethod
+    def page_key(fragment_key: str, template_name: str, template_version: str) -> str:
+        return _digest("page", fragment_key, template_name or "", template_version)
+
+    @staticmethod
+    def etag(page_key: str, *extra: str) -> str:
+        """根据页面键（以及响应中的其他字段）生成强ETag"""
+        return f'"{_digest(page_key, *extra)[:32]}"'
+
+    def clear(self) -> None:
+        self.fragments.clear()
+        self.pages.clear()
+        self.links.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "fragments": self.fragments.stats(),
+            "pages": self.pages.stats(),
+            "links": self.links.stats(),
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断If-None-Match请求头是否与ETag匹配"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+# 全局渲染缓存实例
+render_cache = RenderCache()
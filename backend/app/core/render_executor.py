@@ -0,0 +1,190 @@
+import os
+import asyncio
+import contextlib
+import contextvars
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.render_cache import render_cache
+from app.core.metrics import metrics
+from app.utils.markdown_processor import (
+    HIGHLIGHT_CACHE_ENABLED, build_fragment, build_page, convert_document, render_document, store_fragment
+)
+
+
+class RenderQueueFullError(Exception):
+    """渲染队列已满，调用方应返回503让客户端稍后重试"""
+
+
+class RenderExecutor:
+    """将CPU密集的渲染任务移出事件循环
+
+    小文档在线程池中渲染（切换开销小，可共享进程内的渲染缓存）；
+    超过阈值的大文档交给进程池，避免长时间持有GIL拖慢其他请求。
+    两类任务各自限制排队数量，大文档排满时不会影响小文档。
+    """
+
+    def __init__(self):
+        self.large_document_threshold = int(os.getenv("RENDER_LARGE_DOC_CHARS", 256 * 1024))
+        self.thread_workers = int(os.getenv("RENDER_THREAD_WORKERS", 4))
+        self.process_workers = int(os.getenv("RENDER_PROCESS_WORKERS", min(4, os.cpu_count() or 1)))
+        self.max_pending_small = int(os.getenv("RENDER_MAX_PENDING_SMALL", 64))
+        self.max_pending_large = int(os.getenv("RENDER_MAX_PENDING_LARGE", 8))
+        self.process_start_method = os.getenv("RENDER_PROCESS_START_METHOD", "spawn")
+        # 大文档中未缓存的代码块达到该数量时并行高亮
+        self.highlight_parallel_min_blocks = int(os.getenv("HIGHLIGHT_PARALLEL_MIN_BLOCKS", 16))
+
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._pending = {"small": 0, "large": 0}
+        self.rejected = 0
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.thread_workers, thread_name_prefix="render"
+            )
+        return self._thread_pool
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context(self.process_start_method),
+            )
+        return self._process_pool
+
+    def is_large(self, size: int) -> bool:
+        return size >= self.large_document_threshold
+
+    async def submit(self, func: Callable, *args: Any, size: int = 0, kind: Optional[str] = None,
+                     stage: Optional[str] = "render_process") -> Any:
+        """按任务大小选择执行器运行func，队列已满时抛出RenderQueueFullError
+
+        kind可显式指定small（线程池）或large（进程池），用于不以文档大小衡量的任务；
+        stage为进程池任务记录的阶段名称，已在外层计时的任务传None。
+        """
+        kind = kind or ("large" if self.is_large(size) else "small")
+        limit = self.max_pending_large if kind == "large" else self.max_pending_small
+        if self._pending[kind] >= limit:
+            self.rejected += 1
+            raise RenderQueueFullError(f"Too many pending {kind} render jobs")
+
+        self._pending[kind] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            if kind == "large":
+                # 工作进程中的阶段耗时无法回传，整体记为一个阶段
+                with metrics.stage(stage) if stage else contextlib.nullcontext():
+                    return await loop.run_in_executor(self.process_pool, functools.partial(func, *args))
+            # 复制上下文，使线程中记录的阶段耗时归入当前请求
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self.thread_pool, functools.partial(context.run, func, *args))
+        finally:
+            self._pending[kind] -= 1
+
+    async def render(self, markdown_text: str, template_name: str, keys: Tuple[str, str],
+                     kind: Optional[str] = None) -> str:
+        """渲染Markdown为完整页面，缓存命中时不占用执行器
+
+        kind默认按文档大小选择；批量渲染传large，使多个文档在多个工作进程中并行渲染。
+        """
+        fragment_key, page_key = keys
+        page = render_cache.pages.get(page_key)
+        if page is not None:
+            return page
+
+        size = len(markdown_text)
+        kind = kind or ("large" if self.is_large(size) else "small")
+        if kind == "small":
+            return await self.submit(build_page, markdown_text, template_name, keys, size=size, kind=kind)
+
+        # 工作进程中的缓存与主进程不共享，结果由主进程写入缓存；只有大文档才值得先并行高亮
+        highlights = None
+        if HIGHLIGHT_CACHE_ENABLED and self.is_large(size):
+            highlights = await self.prehighlight(markdown_text)
+        fragment, page, links = await self.submit(
+            render_document, markdown_text, template_name, highlights, size=size, kind=kind
+        )
+        store_fragment(fragment_key, fragment, links)
+        render_cache.pages.set(page_key, page)
+        return page
+
+    async def render_fragment(self, markdown_text: str, fragment_key: str) -> str:
+        """只将Markdown转换为HTML片段（不套用模板），缓存命中时不占用执行器"""
+        fragment = render_cache.fragments.get(fragment_key)
+        if fragment is not None:
+            return fragment
+
+        size = len(markdown_text)
+        if not self.is_large(size):
+            return await self.submit(build_fragment, markdown_text, fragment_key, size=size)
+
+        highlights = await self.prehighlight(markdown_text) if HIGHLIGHT_CACHE_ENABLED else None
+        fragment, links = await self.submit(convert_document, markdown_text, highlights, size=size)
+        store_fragment(fragment_key, fragment, links)
+        return fragment
+
+    async def prehighlight(self, markdown_text: str) -> Dict[str, str]:
+        """将大文档中未缓存的代码块分批交给多个工作进程并行高亮
+
+        代码块少于HIGHLIGHT_PARALLEL_MIN_BLOCKS时只返回已缓存的结果，
+        其余的由渲染进程在转换时自行高亮。
+
+        Returns:
+            {缓存键: 高亮后的HTML}
+        """
+        from app.utils.highlight_cache import extract_highlight_jobs, highlight_batch, highlight_cache
+
+        # 扫描大文档也需要一些时间，放到线程池中避免阻塞事件循环；与渲染任务一样计入排队上限
+        highlights, jobs = await self.submit(extract_highlight_jobs, markdown_text, kind="small")
+        if len(jobs) < self.highlight_parallel_min_blocks:
+            return highlights
+
+        # 每批占用一个大任务名额，并为随后的渲染任务留出一个；名额不足时不并行，
+        # 由渲染进程自行高亮，避免高亮任务占满进程池而submit仍显示有空闲
+        free = self.max_pending_large - self._pending["large"] - 1
+        batch_count = min(self.process_workers, len(jobs), free)
+        if batch_count < 2:
+            return highlights
+        batches = [jobs[index::batch_count] for index in range(batch_count)]
+        with metrics.stage("highlight_parallel"):
+            results = await asyncio.gather(
+                *(self.submit(highlight_batch, batch, kind="large", stage=None) for batch in batches),
+                return_exceptions=True,
+            )
+        for result in results:
+            if isinstance(result, RenderQueueFullError):
+                # 这一批的代码块留给渲染进程高亮
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            for key, html in result.items():
+                highlight_cache.set(key, html)
+            highlights.update(result)
+        return highlights
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending_small": self._pending["small"],
+            "pending_large": self._pending["large"],
+            "max_pending_small": self.max_pending_small,
+            "max_pending_large": self.max_pending_large,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+
+# 全局渲染执行器实例
+render_executor = RenderExecutor()
@@ -0,0 +1,106 @@
+import os
+import codecs
+import asyncio
+from typing import AsyncIterator
+
+from fastapi import UploadFile
+
+from app.core.template_manager import template_manager
+from app.core.render_executor import render_executor, RenderQueueFullError
+from app.utils.markdown_blocks import split_blocks
+from app.utils.markdown_processor import process_markdown
+
+
+class UploadTooLargeError(Exception):
+    """上传文件超过流式处理的大小上限"""
+
+
+# 渲染队列已满时每组的重试次数（退避间隔从50ms逐步增加到1s，合计约10秒）
+RENDER_RETRIES = 15
+
+
+class StreamRenderer:
+    """大文件的流式渲染
+
+    分块读取上传内容并增量解码，在安全的顶层块边界处切分，每凑够一组块就
+    转换并立即输出，页面按页头、正文分块、页尾的顺序流式返回。任何时刻内存中
+    只保留一组块的源码和HTML，峰值内存与文件大小基本无关。
+
+    各组独立转换，引用式链接定义只对同一组内的引用生效。
+    """
+
+    def __init__(self):
+        self.read_chunk_bytes = int(os.getenv("STREAM_READ_CHUNK_BYTES", 64 * 1024))
+        self.group_chars = int(os.getenv("STREAM_GROUP_CHARS", 64 * 1024))
+        self.max_upload_bytes = int(os.getenv("STREAM_MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+
+    async def iter_text(self, upload: UploadFile) -> AsyncIterator[str]:
+        """分块读取上传文件并增量解码为UTF-8文本"""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        total = 0
+        while True:
+            data = await upload.read(self.read_chunk_bytes)
+            if not data:
+                break
+            total += len(data)
+            if total > self.max_upload_bytes:
+                raise UploadTooLargeError(f"File exceeds {self.max_upload_bytes} bytes")
+            text = decoder.decode(data)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    async def iter_groups(self, text_chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """将文本流在顶层块边界处切分为约group_chars大小的Markdown片段
+
+        最后一个块可能尚未结束（例如代码块或列表还在继续），始终留到下一轮再判断。
+        """
+        pending = ""
+        threshold = self.group_chars
+        async for text in text_chunks:
+            pending += text
+            if len(pending) < threshold:
+                continue
+            blocks = split_blocks(pending)
+            if len(blocks) <= 1:
+                # 单个超长块，等待更多内容，避免反复扫描
+                threshold = len(pending) * 2
+                continue
+            yield "".join(blocks[:-1])
+            pending = blocks[-1]
+            threshold = self.group_chars
+        if pending:
+            yield pending
+
+    async def render_group(self, group: str) -> str:
+        """转换一组块；渲染队列已满时等待后重试，页头已经发出，不能再返回503"""
+        for attempt in range(RENDER_RETRIES):
+            try:
+                return await render_executor.submit(process_markdown, group, size=len(group))
+            except RenderQueueFullError:
+                if attempt == RENDER_RETRIES - 1:
+                    raise
+                await asyncio.sleep(min(1.0, 0.05 * 2 ** attempt))
+
+    async def render(self, upload: UploadFile, template: str = "default",
+                     title: str = "Beautified Document") -> AsyncIterator[str]:
+        """按页头、正文分块、页尾的顺序流式输出完整HTML"""
+        head, tail = template_manager.render_template_parts(template, title)
+        yield head
+        try:
+            async for group in self.iter_groups(self.iter_text(upload)):
+                yield await self.render_group(group)
+                yield "\n"
+        except UnicodeDecodeError as e:
+            yield f"<!-- Error decoding file: {e} -->"
+        except UploadTooLargeError as e:
+            yield f"<!-- {e} -->"
+        except RenderQueueFullError as e:
+            yield f"<!-- {e}, output truncated -->"
+        yield tail
+
+
+# 全局流式渲染器实例
+stream_renderer = StreamRenderer()
@@ -1,9 +1,14 @@
 import os
+import re
 import json
-from typing import List, Dict, Optional
-from jinja2 import Environment, FileSystemLoader
+import hashlib
+import threading
+from typing import TYPE_CHECKING, Callable, List, Dict, Optional, Tuple
 from pydantic import BaseModel
 
+if TYPE_CHECKING:
+    from jinja2 import Template
+
 class TemplateInfo(BaseModel):
     name: str
     title: str
@@ -13,57 +18,189 @@ class TemplateInfo(BaseModel):
     tags: List[str]
     created_at: str
 
+# 布局中引用样式表的include语句，加载时直接替换为样式内容
+CSS_INCLUDE_RE = re.compile(r"""{%-?\s*include\s+["']([^"']+\.css)["']\s*-?%}""")
+# 布局中的内联样式块
+STYLE_BLOCK_RE = re.compile(r"<style[^>]*>(.*?)</style>", re.IGNORECASE | re.DOTALL)
+BODY_RE = re.compile(r"<body[^>]*>(.*)</body>", re.IGNORECASE | re.DOTALL)
+
+
+class LoadedTemplate:
+    """已加载到内存中的模板"""
+
+    def __init__(self, name: str, info: TemplateInfo, layout: "Template", version: str, css: str):
+        self.name = name
+        self.info = info
+        self.layout = layout
+        self.version = version
+        self.css = css
+        # 样式内容的哈希，用作样式表URL的一部分
+        self.css_hash = hashlib.sha256(css.encode("utf-8")).hexdigest()[:16]
+        # <body>中正文之前和之后的模板标记，第一次使用时生成
+        self.body_parts: Optional[Tuple[str, str]] = None
+
+
 class TemplateManager:
+    """模板注册表
+
+    第一次使用时（或启动预热阶段）扫描模板目录，将元数据、布局和样式读入内存并
+    预编译所有布局，布局中include的CSS在加载时内联。之后列出和渲染模板不再访问
+    文件系统；模板文件变化由后台线程通过修改时间检测，检测到变化后整体重新加载。
+    """
+
     def __init__(self, templates_dir: str = "app/templates"):
         self.templates_dir = templates_dir
-        self.env = Environment(loader=FileSystemLoader(templates_dir))
+        self.reload_interval = float(os.getenv("TEMPLATE_RELOAD_INTERVAL", 2))
+        self.bytecode_cache_dir = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR")
+        self.bytecode_cache = None
+
+        self._templates: Dict[str, LoadedTemplate] = {}
+        self._mtimes: Dict[str, int] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self._reload_listeners: List[Callable[[], None]] = []
+
+    @property
+    def templates(self) -> Dict[str, LoadedTemplate]:
+        """已加载的模板，首次访问时才加载"""
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.reload()
+        return self._templates
+
+    def _scan_mtimes(self) -> Dict[str, int]:
+        """收集模板目录下所有文件的修改时间"""
+        mtimes = {}
+        if not os.path.isdir(self.templates_dir):
+            return mtimes
+        for template_name in os.listdir(self.templates_dir):
+            template_dir = os.path.join(self.templates_dir, template_name)
+            if not os.path.isdir(template_dir):
+                continue
+            for entry in os.scandir(template_dir):
+                if entry.is_file():
+                    mtimes[f"{template_name}/{entry.name}"] = entry.stat().st_mtime_ns
+        return mtimes
+
+    def _read_sources(self, mtimes: Dict[str, int]) -> Dict[str, str]:
+        sources = {}
+        for relative_path in mtimes:
+            try:
+                with open(os.path.join(self.templates_dir, relative_path), "r", encoding="utf-8") as f:
+                    sources[relative_path] = f.read()
+            except (OSError, UnicodeDecodeError):
+                continue
+        return sources
+
+    @staticmethod
+    def _inline_css(source: str, sources: Dict[str, str]) -> str:
+        return CSS_INCLUDE_RE.sub(lambda m: sources.get(m.group(1), m.group(0)), source)
+
+    def reload(self) -> None:
+        """重新扫描模板目录，加载元数据并预编译所有布局"""
+        from jinja2 import Environment, DictLoader, FileSystemBytecodeCache
+
+        with self._lock:
+            if self.bytecode_cache_dir and self.bytecode_cache is None:
+                os.makedirs(self.bytecode_cache_dir, exist_ok=True)
+                self.bytecode_cache = FileSystemBytecodeCache(self.bytecode_cache_dir)
+
+            mtimes = self._scan_mtimes()
+            sources = self._read_sources(mtimes)
+
+            mapping = dict(sources)
+            for path, source in sources.items():
+                if path.endswith(".html"):
+                    mapping[path] = self._inline_css(source, sources)
+            env = Environment(loader=DictLoader(mapping), auto_reload=False, bytecode_cache=self.bytecode_cache)
+
+            templates = {}
+            for path in sorted(mapping):
+                template_name, _, filename = path.partition("/")
+                if filename != "template.json" or f"{template_name}/layout.html" not in mapping:
+                    continue
+                try:
+                    info = TemplateInfo(**json.loads(mapping[path]))
+                    layout = env.get_template(f"{template_name}/layout.html")
+                except Exception:
+                    continue
+                digest = hashlib.sha256()
+                for file_path in sorted(p for p in mapping if p.startswith(f"{template_name}/")):
+                    digest.update(file_path.encode("utf-8"))
+                    digest.update(mapping[file_path].encode("utf-8"))
+                version = f"{template_name}:{info.version}:{digest.hexdigest()[:16]}"
+                css = "\n".join(
+                    block.strip() for block in STYLE_BLOCK_RE.findall(mapping[f"{template_name}/layout.html"])
+                )
+                templates[template_name] = LoadedTemplate(template_name, info, layout, version, css)
+
+            self.env = env
+            self._templates = templates
+            self._mtimes = mtimes
+            self._loaded = True
+
+    def check_for_changes(self) -> bool:
+        """检查模板文件是否有变化，有变化时重新加载并返回True"""
+        try:
+            mtimes = self._scan_mtimes()
+        except OSError:
+            return False
+        if mtimes == self._mtimes:
+            return False
+        self.reload()
+        for listener in self._reload_listeners:
+            listener()
+        return True
+
+    def on_reload(self, listener: Callable[[], None]) -> None:
+        """注册模板文件变化并重新加载后调用的函数（在监视线程中执行）"""
+        if listener not in self._reload_listeners:
+            self._reload_listeners.append(listener)
+
+    def _watch(self) -> None:
+        while not self._stop_watching.wait(self.reload_interval):
+            self.check_for_changes()
+
+    def start_watching(self) -> None:
+        """启动后台线程，按TEMPLATE_RELOAD_INTERVAL秒检查模板文件变化（为0时不启动）"""
+        if self.reload_interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, name="template-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+        self._watcher = None
+
+    def _resolve(self, template_name: str) -> Optional[LoadedTemplate]:
+        """查找模板，不存在时回退到默认模板"""
+        templates = self.templates
+        return templates.get(template_name) or templates.get("default")
         
     def get_template_info(self, template_name: str) -> Optional[TemplateInfo]:
         """获取模板信息"""
-        template_dir = os.path.join(self.templates_dir, template_name)
-        if not os.path.exists(template_dir):
-            return None
-            
-        info_file = os.path.join(template_dir, "template.json")
-        if not os.path.exists(info_file):
-            return None
-            
-        try:
-            with open(info_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                return TemplateInfo(**data)
-        except Exception:
-            return None
+        template = self.templates.get(template_name)
+        return template.info if template else None
     
     def list_templates(self) -> List[TemplateInfo]:
         """列出所有可用模板"""
-        templates = []
-        if not os.path.exists(self.templates_dir):
-            return templates
-            
-        for item in os.listdir(self.templates_dir):
-            item_path = os.path.join(self.templates_dir, item)
-            if os.path.isdir(item_path):
-                template_info = self.get_template_info(item)
-                if template_info:
-                    templates.append(template_info)
-        
-        return templates
+        return [template.info for template in self.templates.values()]
     
     def render_template(self, content: str, template_name: str = "default", title: str = "Beautified Document") -> str:
         """使用指定模板渲染内容"""
         try:
             # 检查模板是否存在，如果不存在则使用默认模板
-            template_dir = os.path.join(self.templates_dir, template_name)
-            if not os.path.exists(template_dir):
-                template_name = "default"
+            template = self._resolve(template_name)
+            if template is None:
+                raise LookupError("No templates loaded")
             
-            # 加载布局模板
-            layout_file = f"{template_name}/layout.html"
-            template = self.env.get_template(layout_file)
-            
-            # 渲染模板
-            return template.render(content=content, title=title)
+            # 渲染预编译的布局模板
+            return template.layout.render(content=content, title=title)
         except Exception as e:
             # 如果模板渲染失败，返回基本HTML
             return f"""
@@ -80,19 +217,52 @@ class TemplateManager:
             </body>
             </html>
             """
+
+    def render_template_parts(self, template_name: str = "default",
+                              title: str = "Beautified Document") -> Tuple[str, str]:
+        """渲染模板中正文之前和之后的部分，用于流式输出（页头、正文分块、页尾）"""
+        marker = "<!--bettermd-content-->"
+        page = self.render_template(marker, template_name, title)
+        head, _, tail = page.partition(marker)
+        return head, tail
+
+    def render_body_parts(self, template_name: str = "default") -> Tuple[str, str]:
+        """渲染模板<body>中正文之前和之后的标记，用于只返回正文的紧凑响应
+
+        样式通过样式表链接单独加载，这里不包含<head>和<style>。
+        """
+        template = self._resolve(template_name)
+        if template is not None and template.body_parts is not None:
+            return template.body_parts
+        marker = "<!--bettermd-content-->"
+        match = BODY_RE.search(self.render_template(marker, template_name))
+        before, _, after = (match.group(1) if match else marker).partition(marker)
+        parts = (before.strip(), after.strip())
+        if template is not None:
+            template.body_parts = parts
+        return parts
+
+    def get_template_css_hash(self, template_name: str) -> str:
+        """获取模板样式内容的哈希，样式变化时随之变化"""
+        template = self._resolve(template_name)
+        return template.css_hash if template else ""
+
+    def get_template_css(self, template_name: str) -> str:
+        """获取模板布局中内联的全部样式"""
+        template = self._resolve(template_name)
+        return template.css if template else ""
+
+    def get_template_version(self, template_name: str) -> str:
+        """获取模板版本标识（元数据版本号加模板文件内容的哈希）
+
+        模板文件被修改后标识随之变化，用于使渲染缓存失效。
+        """
+        template = self._resolve(template_name)
+        return template.version if template else ""
     
     def get_template_names(self) -> List[str]:
         """获取所有模板名称"""
-        template_names = []
-        if not os.path.exists(self.templates_dir):
-            return template_names
-            
-        for item in os.listdir(self.templates_dir):
-            item_path = os.path.join(self.templates_dir, item)
-            if os.path.isdir(item_path):
-                template_names.append(item)
-        
-        return template_names
+        return list(self.templates)
 
 # 全局模板管理器实例
 template_manager = TemplateManager()
\ No newline at end of file
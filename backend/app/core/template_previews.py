@@ -0,0 +1,290 @@
+import os
+import io
+import re
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.compression import StaticAsset, template_assets
+from app.core.template_manager import template_manager
+
+logger = logging.getLogger(__name__)
+
+# 预览页面中的示例内容
+PREVIEW_CONTENT = """<h1>Template Preview</h1><p>This is a preview of the <strong>{template_name}</strong> template.</p><h2>Sample Content</h2><p>This is a sample paragraph to demonstrate the template styling.</p><h3>Code Example</h3><pre><code>function hello() {{
+  console.log('Hello, world!');
+}}</code></pre>"""
+
+CSS_RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+CSS_MEDIA_RE = re.compile(r"@media[^{]*\{(?:[^{}]*\{[^{}]*\})*[^{}]*\}")
+CSS_COLOR_RE = re.compile(r"#[0-9a-fA-F]{3,8}\b|rgba?\([^)]*\)")
+
+Color = Tuple[int, int, int]
+
+
+def _css_declarations(css: str) -> Dict[str, Dict[str, str]]:
+    """将样式表解析为{选择器: {属性: 值}}，忽略@media中的规则，后出现的声明覆盖前面的"""
+    rules: Dict[str, Dict[str, str]] = {}
+    for selectors, body in CSS_RULE_RE.findall(CSS_MEDIA_RE.sub("", css)):
+        declarations = {}
+        for declaration in body.split(";"):
+            name, _, value = declaration.partition(":")
+            if value:
+                declarations[name.strip().lower()] = value.strip()
+        for selector in selectors.split(","):
+            rules.setdefault(" ".join(selector.split()), {}).update(declarations)
+    return rules
+
+
+def _parse_color(value: str) -> Optional[Color]:
+    """取CSS值中的第一个颜色（渐变取起始色），半透明颜色按白色背景混合"""
+    from PIL import ImageColor
+
+    match = CSS_COLOR_RE.search(value)
+    candidates = [match.group(0)] if match else value.split()
+    for candidate in candidates:
+        try:
+            color = ImageColor.getrgb(candidate.replace(" ", ""))
+        except ValueError:
+            continue
+        if len(color) == 4:
+            alpha = color[3] / 255
+            return tuple(round(channel * alpha + 255 * (1 - alpha)) for channel in color[:3])
+        return color
+    return None
+
+
+class TemplatePalette:
+    """从模板样式中提取绘制缩略图所需的颜色"""
+
+    def __init__(self, css: str):
+        self.rules = _css_declarations(css)
+        text = self.color(("body",), ("color",), (51, 51, 51))
+        self.page = self.color(("body",), ("background", "background-color"), (255, 255, 255))
+        self.paper = self.color((".container", ".document-container"), ("background", "background-color"), (255, 255, 255))
+        self.title = self.color(("h1",), ("color",), text)
+        self.title_rule = self.color((".header", ".title-section", "h1"), ("border-bottom",), None)
+        self.heading = self.color(("h2",), ("color",), self.title)
+        self.heading_rule = self.color(("h2",), ("border-bottom", "border-left"), None)
+        self.heading_rule_side = "left" if "border-left" in self.rules.get("h2", {}) else "bottom"
+        self.text = self.color(("p",), ("color",), text)
+        self.code = self.color(("pre",), ("background", "background-color"), (246, 248, 250))
+        self.code_accent = self.color(("pre",), ("border-left",), None)
+        self.code_text = self.color(("pre",), ("color",), (150, 150, 150))
+
+    def color(self, selectors: Tuple[str, ...], properties: Tuple[str, ...],
+              default: Optional[Color]) -> Optional[Color]:
+        for selector in selectors:
+            declarations = self.rules.get(selector, {})
+            for name in properties:
+                if name in declarations:
+                    color = _parse_color(declarations[name])
+                    if color is not None:
+                        return color
+        return default
+
+
+def render_thumbnail(css: str, size: Tuple[int, int]) -> bytes:
+    """用模板的配色绘制页面结构示意图（标题、段落、代码块），返回PNG
+
+    Pillow不能渲染HTML，缩略图只表现模板的配色和版式特征，供模板选择器预览。
+    """
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    palette = TemplatePalette(css)
+    image = Image.new("RGB", size, palette.page)
+    draw = ImageDraw.Draw(image)
+
+    unit = width / 24
+    margin = round(unit * 1.5)
+    draw.rectangle((margin, margin, width - margin, height + unit), fill=palette.paper)
+    left, right = round(margin + unit * 1.5), round(width - margin - unit * 1.5)
+    y = margin + unit * 1.5
+    line = max(2, round(unit * 0.45))
+
+    def text_lines(count: int, last_width: float = 0.6) -> None:
+        nonlocal y
+        for index in range(count):
+            end = right if index < count - 1 else left + (right - left) * last_width
+            draw.rectangle((left, y, end, y + line), fill=palette.text)
+            y += line * 2.6
+        y += line
+
+    # 标题
+    draw.rectangle((left, y, left + (right - left) * 0.7, y + line * 2.4), fill=palette.title)
+    y += line * 3.6
+    if palette.title_rule is not None:
+        draw.rectangle((left, y, right, y + max(1, line // 2)), fill=palette.title_rule)
+        y += line * 2
+    text_lines(3)
+
+    # 二级标题
+    heading_left = left
+    if palette.heading_rule is not None and palette.heading_rule_side == "left":
+        draw.rectangle((left, y - line * 0.2, left + line, y + line * 2), fill=palette.heading_rule)
+        heading_left = left + line * 2
+    draw.rectangle((heading_left, y, heading_left + (right - left) * 0.45, y + line * 1.8), fill=palette.heading)
+    y += line * 2.8
+    if palette.heading_rule is not None and palette.heading_rule_side == "bottom":
+        draw.rectangle((left, y, right, y + max(1, line // 3)), fill=palette.heading_rule)
+        y += line * 1.6
+    text_lines(2, 0.8)
+
+    # 代码块
+    code_bottom = y + line * 9
+    draw.rectangle((left, y, right, code_bottom), fill=palette.code)
+    if palette.code_accent is not None:
+        draw.rectangle((left, y, left + line, code_bottom), fill=palette.code_accent)
+    code_y = y + line * 1.6
+    for indent, length in ((0, 0.5), (1, 0.6), (0, 0.2)):
+        start = left + line * 3 + indent * line * 3
+        draw.rectangle((start, code_y, start + (right - left) * length, code_y + line), fill=palette.code_text)
+        code_y += line * 2.4
+    y = code_bottom + line * 2
+    text_lines(4, 0.4)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+class TemplatePreview:
+    """某个模板版本的预览页面和缩略图"""
+
+    def __init__(self, template_name: str, version: str, html: StaticAsset, thumbnail: StaticAsset):
+        self.template_name = template_name
+        self.version = version
+        # URL中使用的版本哈希
+        self.digest = hashlib.sha256(version.encode("utf-8")).hexdigest()[:16]
+        self.html = html
+        self.thumbnail = thumbnail
+
+    @property
+    def preview_url(self) -> str:
+        return f"/api/templates/{self.template_name}/preview.{self.digest}.html"
+
+    @property
+    def thumbnail_url(self) -> str:
+        return f"/api/templates/{self.template_name}/thumbnail.{self.digest}.png"
+
+
+class TemplatePreviews:
+    """模板预览缓存
+
+    每个模板版本的预览页面和PNG缩略图只生成一次：启动预热时生成全部模板的预览，
+    模板文件修改后版本变化，下一次请求时重新生成。生成结果写入TEMPLATE_PREVIEW_DIR，
+    重启后版本未变的模板直接从磁盘读取。URL带版本哈希，可以长期缓存。
+    """
+
+    def __init__(self):
+        self.directory = os.getenv("TEMPLATE_PREVIEW_DIR", "data/previews") or None
+        size = os.getenv("TEMPLATE_THUMBNAIL_SIZE", "240x320").lower().split("x")
+        self.thumbnail_size = (int(size[0]), int(size[1]))
+        self.max_age = int(os.getenv("STATIC_ASSET_MAX_AGE", 365 * 24 * 3600))
+
+        self._previews: Dict[str, TemplatePreview] = {}
+        self._lock = threading.Lock()
+        self.generated = 0
+        self.disk_hits = 0
+
+    def _path(self, template_name: str, digest: str, extension: str) -> str:
+        width, height = self.thumbnail_size
+        suffix = f"{width}x{height}.{extension}" if extension == "png" else extension
+        return os.path.join(self.directory, f"{template_name}-{digest}.{suffix}")
+
+    def _read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, path: str, data: bytes) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # 先写临时文件再原子替换，避免其他进程读到写了一半的内容
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # mkstemp创建的文件权限为0600，改为与普通文件一致，便于静态文件服务等其他用户读取
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write template preview {path}: {e}")
+
+    def _load_or_generate(self, path: Optional[str], generate: Callable[[], bytes]) -> bytes:
+        if path is not None:
+            data = self._read(path)
+            if data is not None:
+                self.disk_hits += 1
+                return data
+        data = generate()
+        self.generated += 1
+        if path is not None:
+            self._write(path, data)
+        return data
+
+    def get(self, template_name: str) -> Optional[TemplatePreview]:
+        """获取模板当前版本的预览，模板不存在时返回None"""
+        if template_manager.get_template_info(template_name) is None:
+            return None
+        version = template_manager.get_template_version(template_name)
+        preview = self._previews.get(template_name)
+        if preview is not None and preview.version == version:
+            return preview
+
+        with self._lock:
+            preview = self._previews.get(template_name)
+            if preview is not None and preview.version == version:
+                return preview
+            digest = hashlib.sha256(version.encode("utf-8")).hexdigest()[:16]
+            html = self._load_or_generate(
+                self._path(template_name, digest, "html") if self.directory else None,
+                lambda: template_manager.render_template(
+                    PREVIEW_CONTENT.format(template_name=template_name), template_name
+                ).encode("utf-8"),
+            )
+            thumbnail = self._load_or_generate(
+                self._path(template_name, digest, "png") if self.directory else None,
+                lambda: render_thumbnail(template_manager.get_template_css(template_name), self.thumbnail_size),
+            )
+            preview = TemplatePreview(
+                template_name, version,
+                StaticAsset(html, "text/html; charset=utf-8"),
+                StaticAsset(thumbnail, "image/png", compress=False),
+            )
+            self._previews[template_name] = preview
+            return preview
+
+    def cache_control(self, preview: TemplatePreview, digest: Optional[str] = None) -> str:
+        """带当前版本哈希的URL可永久缓存，其余（旧哈希或不带哈希的地址）每次重新验证"""
+        if digest == preview.digest:
+            return f"public, max-age={self.max_age}, immutable"
+        return "no-cache"
+
+    def catalog(self) -> List[Dict]:
+        """所有模板的元数据和预览、缩略图、样式表地址"""
+        entries = []
+        for info in template_manager.list_templates():
+            preview = self.get(info.name)
+            entries.append({
+                **info.model_dump(),
+                "preview_url": preview.preview_url,
+                "thumbnail_url": preview.thumbnail_url,
+                "stylesheet_url": template_assets.stylesheet_url(info.name),
+            })
+        return entries
+
+    def warmup(self) -> None:
+        for template_name in template_manager.get_template_names():
+            try:
+                self.get(template_name)
+            except Exception as e:
+                logger.warning(f"Failed to build preview for template {template_name}: {e!r}")
+
+
+# 全局模板预览实例
+template_previews = TemplatePreviews()
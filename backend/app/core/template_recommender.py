@@ -0,0 +1,188 @@
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+from app.core.template_manager import template_manager
+
+# 模板标签到文档类别的映射；模板按其标签所属类别的得分排序，未知标签不参与计分
+TAG_CATEGORIES = {
+    "学术": "academic", "论文": "academic", "研究": "academic",
+    "academic": "academic", "paper": "academic", "research": "academic",
+    "商务": "business", "专业": "business", "报告": "business",
+    "business": "business", "professional": "business", "report": "business",
+    "技术": "technical", "开发": "technical", "代码": "technical",
+    "technical": "technical", "developer": "technical", "code": "technical",
+    "通用": "general", "现代": "general", "简洁": "general",
+    "general": "general", "modern": "general", "simple": "general",
+}
+
+CATEGORY_LABELS = {"academic": "学术", "business": "商务", "technical": "技术", "general": "通用"}
+
+# 各类别的特征词
+VOCABULARY = {
+    "academic": (
+        "摘要", "引言", "研究", "实验", "结论", "假设", "方法", "文献", "理论", "样本", "显著", "综述",
+        "abstract", "introduction", "hypothesis", "methodology", "experiment", "conclusion",
+        "literature", "theorem", "lemma", "proof", "et al",
+    ),
+    "business": (
+        "市场", "客户", "营收", "收入", "利润", "季度", "战略", "预算", "增长", "成本", "竞争", "投资",
+        "业绩", "运营", "目标", "kpi", "roi", "revenue", "profit", "quarter", "stakeholder", "strategy",
+        "budget", "market", "customer", "growth",
+    ),
+    "technical": (
+        "函数", "接口", "安装", "配置", "部署", "参数", "返回", "调用", "依赖", "服务器", "数据库", "命令",
+        "api", "function", "install", "config", "deploy", "server", "database", "docker", "http",
+        "json", "request", "response", "error", "class", "module",
+    ),
+}
+
+
+def _term_matcher(words: Tuple[str, ...]) -> Tuple["re.Pattern", Tuple[str, ...]]:
+    """英文特征词按整词（允许复数后缀）匹配，中文特征词没有词边界，按子串计数"""
+    ascii_words = sorted((word for word in words if word.isascii()), key=len, reverse=True)
+    # 边界只看英文字母和数字，中英文混排时（如“客户KPI”）也能匹配
+    pattern = re.compile(r"(?<![a-z0-9])(?:" + "|".join(map(re.escape, ascii_words)) + r")(?:s|es)?(?![a-z0-9])")
+    return pattern, tuple(word for word in words if not word.isascii())
+
+
+TERM_MATCHERS = {category: _term_matcher(words) for category, words in VOCABULARY.items()}
+# 链接地址中的http、api等不算作特征词
+URL_RE = re.compile(r"(?:https?|ftp)://\S+|www\.\S+")
+
+FENCE_RE = re.compile(r"^(```|~~~).*?^\1", re.MULTILINE | re.DOTALL)
+INLINE_CODE_RE = re.compile(r"`[^`\n]+`")
+HEADING_RE = re.compile(r"^(#{1,6})\s", re.MULTILINE)
+TABLE_ROW_RE = re.compile(r"^\s*\|.*\|\s*$", re.MULTILINE)
+MATH_RE = re.compile(r"\$\$|\\\(|\\\[|\\(?:frac|sum|int|alpha|beta|sigma|mathbb|begin\{equation)")
+CITATION_RE = re.compile(
+    r"\[\d+(?:[,\-–]\s*\d+)*\]|\[@[\w:-]+\]|\([A-Z][A-Za-z-]+(?: et al\.)?,? \d{4}\)|doi:|参考文献|^#+\s*references",
+    re.IGNORECASE | re.MULTILINE,
+)
+FIGURE_RE = re.compile(r"\d+(?:\.\d+)?\s*(?:%|％|万|亿|元|美元)|[¥$€]\s?\d")
+
+
+def _saturate(value: float, scale: float) -> float:
+    """把非负特征值压缩到[0, 1)，scale为得分达到0.5时的特征值"""
+    return value / (value + scale) if value > 0 else 0.0
+
+
+def _count_terms(lowered: str, category: str) -> int:
+    """统计小写文本中某一类别特征词的出现次数"""
+    pattern, cjk_words = TERM_MATCHERS[category]
+    return len(pattern.findall(lowered)) + sum(lowered.count(word) for word in cjk_words)
+
+
+def extract_features(text: str) -> Dict[str, float]:
+    """提取用于模板推荐的文档特征
+
+    Args:
+        text: Markdown文本
+
+    Returns:
+        特征名称到数值的映射
+    """
+    length = max(len(text), 1)
+    code_chars = sum(len(match.group(0)) for match in FENCE_RE.finditer(text))
+    prose = FENCE_RE.sub("", text)
+    per_kilo = 1000 / max(len(prose), 1)
+    headings = [len(match.group(1)) for match in HEADING_RE.finditer(prose)]
+    lowered = URL_RE.sub(" ", prose.lower())
+    return {
+        "chars": len(text),
+        "code_ratio": code_chars / length,
+        "code_blocks": sum(1 for _ in FENCE_RE.finditer(text)),
+        "inline_code": len(INLINE_CODE_RE.findall(prose)),
+        "table_rows": len(TABLE_ROW_RE.findall(prose)),
+        "math": len(MATH_RE.findall(text)),
+        "citations": len(CITATION_RE.findall(prose)),
+        "figures_per_kilo": len(FIGURE_RE.findall(prose)) * per_kilo,
+        "headings": len(headings),
+        "heading_depth": max(headings, default=0),
+        **{f"{category}_terms_per_kilo": _count_terms(lowered, category) * per_kilo
+           for category in VOCABULARY},
+    }
+
+
+def score_categories(features: Dict[str, float]) -> Dict[str, Tuple[float, str]]:
+    """根据特征计算每个类别的得分（0到1）和主要依据"""
+    technical = (
+        0.45 * _saturate(features["code_ratio"], 0.15)
+        + 0.2 * _saturate(features["code_blocks"] + features["inline_code"] / 5, 2)
+        + 0.35 * _saturate(features["technical_terms_per_kilo"], 4)
+    )
+    academic = (
+        0.35 * _saturate(features["citations"], 3)
+        + 0.2 * _saturate(features["math"], 2)
+        + 0.35 * _saturate(features["academic_terms_per_kilo"], 4)
+        + 0.1 * (features["heading_depth"] >= 3)
+    )
+    business = (
+        0.2 * _saturate(features["table_rows"], 6)
+        + 0.45 * _saturate(features["business_terms_per_kilo"], 4)
+        + 0.35 * _saturate(features["figures_per_kilo"], 3)
+    )
+    scores = {
+        "technical": (technical, f"代码块约占全文的{features['code_ratio']:.0%}，并包含较多技术术语"
+                      if features["code_ratio"] >= 0.05 else "文档包含较多技术术语和行内代码"),
+        "academic": (academic, f"包含{int(features['citations'])}处引用和{int(features['math'])}处数学公式，"
+                     "行文偏学术" if features["citations"] or features["math"] else "文档使用较多研究类术语"),
+        "business": (business, "包含较多业务指标、数据表格和商务术语"),
+        # 通用模板作为基准：其他类别的特征都不明显时排在最前
+        "general": (0.25, "文档没有明显的专业特征，适合简洁通用的排版"),
+    }
+    # 得分很低的类别不给出具体依据
+    return {
+        category: (score, reason if category == "general" or score >= 0.1
+                   else f"文档中没有明显的{CATEGORY_LABELS[category]}特征")
+        for category, (score, reason) in scores.items()
+    }
+
+
+class TemplateRecommender:
+    """基于本地特征的模板推荐
+
+    提取文档特征（代码占比、数学公式、表格、标题层级、引用格式、领域词汇），
+    按模板标签对应的类别打分，不需要访问远程模型。最高分与次高分之差作为置信度，
+    低于TEMPLATE_RECOMMEND_MIN_CONFIDENCE时可以再交给AI进一步判断。
+    """
+
+    def __init__(self):
+        # 只分析文档开头的部分，保证耗时与文档长度无关
+        self.sample_chars = int(os.getenv("TEMPLATE_RECOMMEND_SAMPLE_CHARS", 20000))
+        self.min_confidence = float(os.getenv("TEMPLATE_RECOMMEND_MIN_CONFIDENCE", 0.1))
+        self.refine_with_ai = os.getenv("TEMPLATE_RECOMMEND_AI_REFINE", "true").lower() in ("1", "true", "yes")
+
+    def recommend(self, content: str, limit: int = 3) -> Tuple[List[Dict[str, Any]], float]:
+        """推荐模板
+
+        Args:
+            content: Markdown文本
+            limit: 最多返回的推荐数
+
+        Returns:
+            (按得分从高到低排列的推荐列表[{template, reason, score}], 置信度)
+        """
+        categories = score_categories(extract_features(content[:self.sample_chars]))
+        ranked = []
+        for info in template_manager.list_templates():
+            tag_categories = {TAG_CATEGORIES[tag.lower()] for tag in info.tags if tag.lower() in TAG_CATEGORIES}
+            if not tag_categories:
+                tag_categories = {"general"}
+            category = max(tag_categories, key=lambda name: categories[name][0])
+            score, reason = categories[category]
+            ranked.append({"template": info.name, "reason": reason, "score": round(score, 3)})
+        ranked.sort(key=lambda item: item["score"], reverse=True)
+
+        if len(ranked) > 1:
+            confidence = ranked[0]["score"] - ranked[1]["score"]
+        else:
+            confidence = 1.0 if ranked else 0.0
+        return ranked[:limit], round(confidence, 3)
+
+    def needs_refinement(self, confidence: float) -> bool:
+        return self.refine_with_ai and confidence < self.min_confidence
+
+
+# 全局模板推荐器实例
+template_recommender = TemplateRecommender()
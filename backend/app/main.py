@@ -1,11 +1,75 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api.router import router as api_router
+from app.core.render_executor import render_executor
+from app.core.ai_service import ai_service
+from app.core.template_manager import template_manager
+from app.core.pdf_exporter import pdf_exporter
+from app.core.job_queue import job_queue
+from app.core.metrics import metrics, ServerTimingMiddleware
+from app.core.compression import CompressionMiddleware, template_assets
+from app.core.template_previews import template_previews
+from app.utils.markdown_processor import process_markdown
+
+logger = logging.getLogger(__name__)
+
+# 启动预热方式：background在后台预热、不阻塞启动；blocking预热完成后才开始接收请求；off不预热
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background").lower()
+
+
+def warmup() -> None:
+    """加载并编译模板、预压缩模板样式表、生成模板预览和缩略图、
+    初始化Markdown转换器（导入扩展和Pygments）、创建AI服务的连接池
+
+    这些工作在首次使用时也会自动完成，预热只是把开销从第一个请求挪到启动阶段。
+    """
+    template_manager.get_template_names()
+    template_assets.warmup()
+    template_previews.warmup()
+    process_markdown("# warmup\n\n```python\npass\n```\n")
+    ai_service.warmup()
+
+
+async def _run_warmup() -> None:
+    try:
+        # 在渲染线程池中执行，使该线程的转换器也一并初始化
+        await render_executor.submit(warmup)
+    except Exception as e:
+        logger.warning(f"Startup warmup failed: {e!r}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup_task = None
+    if STARTUP_WARMUP == "blocking":
+        await _run_warmup()
+    elif STARTUP_WARMUP != "off":
+        warmup_task = asyncio.create_task(_run_warmup())
+    # 监视模板文件变化以便热更新，模板更新后在监视线程中重新生成预览
+    template_manager.on_reload(template_previews.warmup)
+    template_manager.start_watching()
+    # 启动异步任务的工作协程，并恢复上次未完成的任务
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    if warmup_task is not None:
+        await warmup_task
+    template_manager.stop_watching()
+    # 关闭渲染和PDF导出的工作池以及AI服务的HTTP连接
+    render_executor.shutdown()
+    pdf_exporter.shutdown()
+    await ai_service.aclose()
 
 app = FastAPI(
     title="BetterMD API",
     description="API for BetterMD - Markdown Beautifier",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 添加CORS中间件
@@ -17,6 +81,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 记录各阶段耗时并添加Server-Timing响应头
+app.add_middleware(ServerTimingMiddleware)
+
+# 压缩较大的响应（客户端支持时优先使用br，否则使用gzip）
+if os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes"):
+    app.add_middleware(CompressionMiddleware)
+
 # 包含API路由
 app.include_router(api_router, prefix="/api")
 
@@ -28,6 +99,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """以Prometheus文本格式导出性能指标"""
+    return PlainTextResponse(metrics.expose(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
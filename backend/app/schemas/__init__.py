@@ -4,11 +4,15 @@ from typing import Optional, List
 class MarkdownProcessRequest(BaseModel):
     content: str
     template: Optional[str] = "default"
+    # 提供时在渲染后更新该文档的双向链接索引
+    doc_id: Optional[str] = None
 
 class MarkdownProcessResponse(BaseModel):
     filename: str
     html_content: str
     template: Optional[str] = None
+    # output=fragment时html_content只包含<body>中的内容，样式从该地址加载
+    stylesheet_url: Optional[str] = None
 
 class TemplateInfo(BaseModel):
     name: str
@@ -19,16 +23,27 @@ class TemplateInfo(BaseModel):
     tags: List[str]
     created_at: str
 
+class TemplateCatalogEntry(TemplateInfo):
+    preview_url: str
+    thumbnail_url: str
+    stylesheet_url: str
+
 # AI相关模型
 class TemplateRecommendation(BaseModel):
     template: str
     reason: str
+    score: Optional[float] = None
 
 class AITemplateRecommendationRequest(BaseModel):
     content: str
+    # 是否请AI细化推荐：None表示仅在本地推荐置信度较低时，True总是，False从不
+    refine: Optional[bool] = None
 
 class AITemplateRecommendationResponse(BaseModel):
     recommendations: List[TemplateRecommendation]
+    # 推荐来源：local（本地特征打分）或ai
+    source: Optional[str] = None
+    confidence: Optional[float] = None
 
 class AIContentSuggestionRequest(BaseModel):
     content: str
@@ -41,4 +56,114 @@ class AIBeautifyRequest(BaseModel):
     template: Optional[str] = "default"
 
 class AIBeautifyResponse(BaseModel):
-    beautified_content: str
\ No newline at end of file
+    beautified_content: str
+
+# 增量渲染相关模型
+class IncrementalOpenRequest(BaseModel):
+    content: str
+    template: Optional[str] = "default"
+    doc_id: Optional[str] = None
+
+class IncrementalOpenResponse(BaseModel):
+    doc_id: str
+    version: int
+    blocks: List[str]
+    html_content: str
+    full_render: bool = False
+
+class TextEdit(BaseModel):
+    start: int
+    end: int
+    text: str = ""
+
+class IncrementalPatchRequest(BaseModel):
+    doc_id: str
+    base_version: int
+    edits: List[TextEdit]
+
+class IncrementalPatchResponse(BaseModel):
+    doc_id: str
+    version: int
+    start: int
+    delete: int
+    insert: List[str]
+    block_count: int
+    full_render: bool = False
+
+# 异步任务相关模型
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    priority: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # 排队中的任务前面大约还有多少个任务
+    position: Optional[int] = None
+    error: Optional[str] = None
+
+# 双向链接索引相关模型
+class LinkDocumentRequest(BaseModel):
+    doc_id: str
+    content: str
+    # 为空时使用文档的第一个一级标题
+    title: Optional[str] = None
+
+class LinkBatchRequest(BaseModel):
+    documents: List[LinkDocumentRequest]
+
+class LinkIndexUpdateResponse(BaseModel):
+    updated: int
+    unchanged: int
+
+class WikiLink(BaseModel):
+    target: str
+    heading: Optional[str] = None
+    count: int
+    # 目标文档是否已建立索引
+    resolved: bool
+
+class DocumentHeading(BaseModel):
+    level: int
+    text: str
+    anchor: Optional[str] = None
+
+class LinkDocumentResponse(BaseModel):
+    doc_id: str
+    title: str
+    links: List[WikiLink]
+    headings: List[DocumentHeading]
+
+class Backlink(BaseModel):
+    doc_id: str
+    title: str
+    heading: Optional[str] = None
+    count: int
+
+class GraphNode(BaseModel):
+    id: str
+    title: str
+    exists: bool
+    distance: int
+
+class GraphEdge(BaseModel):
+    source: str
+    target: str
+    count: int
+
+class LinkGraphResponse(BaseModel):
+    nodes: List[GraphNode]
+    edges: List[GraphEdge]
+    # 节点数达到上限，子图不完整
+    truncated: bool
+
+# PDF导出相关模型
+class PdfExportJobResponse(BaseModel):
+    job_id: str
+    status: str
+    template: Optional[str] = None
+    created_at: float
+    finished_at: Optional[float] = None
+    size: Optional[int] = None
+    error: Optional[str] = None
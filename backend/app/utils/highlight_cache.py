@@ -0,0 +1,214 @@
+"""代码高亮缓存
+
+codehilite启用时，每个围栏代码块在每次渲染中都要交给Pygments重新分词和格式化，
+代码较多的文档大部分渲染时间都花在这里。本模块按(语言, 代码哈希, 格式化选项)
+缓存高亮结果：
+- 内存层：每个进程一个按字节数限制的LRU缓存
+- 磁盘层（可选）：设置HIGHLIGHT_CACHE_DIR后写入该目录，在多个工作进程和重启之间共享
+
+扩展只替换当前Markdown实例中fenced_code和codehilite注册的处理器，替换后的处理器
+沿用原实现的代码，只是其中的CodeHilite指向带缓存的子类，输出与原实现完全相同；
+Markdown模块本身不做修改，进程中其他Markdown实例不受影响。
+
+大文档在进程池中渲染前，可以先用extract_highlight_jobs找出尚未缓存的代码块，
+由多个工作进程并行调用highlight_batch，再把结果随文档一起交给渲染进程预先填充缓存。
+"""
+import os
+import re
+import types
+import hashlib
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from markdown import Markdown
+from markdown.extensions import Extension
+from markdown.extensions.codehilite import CodeHilite, CodeHiliteExtension, HiliteTreeprocessor, parse_hl_lines
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+
+from app.core.render_cache import LRUByteCache
+
+try:
+    from pygments import __version__ as PYGMENTS_VERSION
+except ImportError:  # pragma: no cover
+    PYGMENTS_VERSION = "none"
+
+# (缓存键, 代码, CodeHilite参数)
+HighlightJob = Tuple[str, str, Dict[str, Any]]
+
+
+class HighlightCache:
+    """两级代码高亮缓存：进程内LRU加可选的磁盘目录"""
+
+    def __init__(self):
+        self.memory = LRUByteCache(int(os.getenv("HIGHLIGHT_CACHE_BYTES", 16 * 1024 * 1024)))
+        self.directory = os.getenv("HIGHLIGHT_CACHE_DIR") or None
+        self.disk_hits = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.html")
+
+    def get(self, key: str) -> Optional[str]:
+        html = self.memory.get(key)
+        if html is not None or self.directory is None:
+            return html
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                html = f.read()
+        except (OSError, UnicodeDecodeError):
+            return None
+        self.disk_hits += 1
+        self.memory.set(key, html)
+        return html
+
+    def set(self, key: str, html: str, persist: bool = True) -> None:
+        self.memory.set(key, html)
+        if self.directory is None or not persist:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再原子替换，避免其他进程读到写了一半的内容
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(html)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def seed(self, highlights: Dict[str, str]) -> None:
+        """将已计算好的高亮结果放入内存层（不写磁盘）"""
+        for key, html in highlights.items():
+            self.memory.set(key, html)
+
+    def clear(self) -> None:
+        self.memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats["disk_hits"] = self.disk_hits
+        stats["directory"] = self.directory
+        return stats
+
+
+# 全局高亮缓存实例（每个进程一个）
+highlight_cache = HighlightCache()
+
+
+def _option_value(value: Any) -> Any:
+    # 格式化器可以是类，用限定名参与缓存键
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    return value
+
+
+class CachedCodeHilite(CodeHilite):
+    """带缓存的CodeHilite，缓存键覆盖所有影响输出的参数"""
+
+    def cache_key(self, shebang: bool = True) -> str:
+        options = sorted((name, repr(_option_value(value))) for name, value in self.options.items())
+        digest = hashlib.sha256()
+        for part in (PYGMENTS_VERSION, str(shebang), repr(self.lang), str(self.guess_lang),
+                     str(self.use_pygments), self.lang_prefix, repr(_option_value(self.pygments_formatter)),
+                     repr(options), self.src):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def hilite(self, shebang: bool = True) -> str:
+        key = self.cache_key(shebang)
+        html = highlight_cache.get(key)
+        if html is None:
+            html = super().hilite(shebang)
+            highlight_cache.set(key, html)
+        return html
+
+
+def _with_cached_hilite(func: types.FunctionType) -> types.FunctionType:
+    """复制func，使其中引用的CodeHilite指向带缓存的子类，不修改原模块"""
+    namespace = dict(func.__globals__, CodeHilite=CachedCodeHilite)
+    return types.FunctionType(func.__code__, namespace, func.__name__, func.__defaults__, func.__closure__)
+
+
+class CachedFencedBlockPreprocessor(FencedBlockPreprocessor):
+    """使用带缓存高亮器的围栏代码块预处理器"""
+
+    run = _with_cached_hilite(FencedBlockPreprocessor.run)
+
+
+class CachedHiliteTreeprocessor(HiliteTreeprocessor):
+    """使用带缓存高亮器的缩进代码块高亮处理器"""
+
+    run = _with_cached_hilite(HiliteTreeprocessor.run)
+
+
+class HighlightCacheExtension(Extension):
+    """启用代码高亮缓存的扩展，需放在fenced_code和codehilite之后"""
+
+    def extendMarkdown(self, md: Markdown) -> None:
+        # 名称相同时register会替换原处理器，优先级与fenced_code、codehilite中的一致
+        if "fenced_code_block" in md.preprocessors:
+            original = md.preprocessors["fenced_code_block"]
+            md.preprocessors.register(CachedFencedBlockPreprocessor(md, original.config), "fenced_code_block", 25)
+        if "hilite" in md.treeprocessors:
+            hiliter = CachedHiliteTreeprocessor(md)
+            hiliter.config = md.treeprocessors["hilite"].config
+            md.treeprocessors.register(hiliter, "hilite", 30)
+
+
+def makeExtension(**kwargs) -> HighlightCacheExtension:
+    return HighlightCacheExtension(**kwargs)
+
+
+def _normalize(text: str, tab_length: int = 4) -> str:
+    # 与Markdown的NormalizeWhitespace预处理器一致，保证提取出的代码与转换时相同
+    text = text.replace("\r\n", "\n").replace("\r", "\n") + "\n\n"
+    text = text.expandtabs(tab_length)
+    return re.sub(r"(?<=\n) +\n", "\n", text)
+
+
+def extract_highlight_jobs(markdown_text: str,
+                           codehilite_configs: Optional[Dict[str, Any]] = None
+                           ) -> Tuple[Dict[str, str], List[HighlightJob]]:
+    """找出文档中的围栏代码块，区分已缓存和需要高亮的部分
+
+    只处理fenced_code会交给CodeHilite的简单形式（```lang或带hl_lines），
+    带{属性}的代码块留给转换时处理。
+
+    Args:
+        markdown_text: 原始Markdown文本
+        codehilite_configs: codehilite扩展的配置
+
+    Returns:
+        (已缓存的结果{缓存键: HTML}, 需要高亮的任务列表，已去重)
+    """
+    configs = CodeHiliteExtension(**(codehilite_configs or {})).getConfigs()
+    if not configs.get("use_pygments", True):
+        return {}, []
+
+    cached: Dict[str, str] = {}
+    jobs: Dict[str, HighlightJob] = {}
+    for match in FencedBlockPreprocessor.FENCED_BLOCK_RE.finditer(_normalize(markdown_text)):
+        if match.group("attrs"):
+            continue
+        options = configs.copy()
+        if match.group("hl_lines"):
+            options["hl_lines"] = parse_hl_lines(match.group("hl_lines"))
+        options["lang"] = match.group("lang") or None
+        options["style"] = options.pop("pygments_style", "default")
+        code = match.group("code")
+        key = CachedCodeHilite(code, **dict(options)).cache_key(shebang=False)
+        if key in cached or key in jobs:
+            continue
+        html = highlight_cache.get(key)
+        if html is not None:
+            cached[key] = html
+        else:
+            jobs[key] = (key, code, options)
+    return cached, list(jobs.values())
+
+
+def highlight_batch(jobs: List[HighlightJob]) -> Dict[str, str]:
+    """高亮一批代码块，供进程池中的工作进程调用"""
+    return {key: CodeHilite(code, **dict(options)).hilite(shebang=False) for key, code, options in jobs}
@@ -0,0 +1,103 @@
+import re
+import html
+import xml.etree.ElementTree as etree
+from typing import Dict
+
+from markdown import Markdown
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+from app.core.metrics import metrics
+
+UNSAFE_TAGS = {"script", "style", "iframe", "object", "embed", "frame", "frameset", "form", "base", "meta", "link"}
+URL_ATTRIBUTES = ("href", "src")
+UNSAFE_SCHEMES = ("javascript:", "vbscript:", "data:text/html")
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+# 浏览器解析URL时会忽略其中的空白和控制字符，检查协议前先解码字符实体并全部去掉
+IGNORED_URL_CHARS = re.compile(r"[\s\x00-\x1f\x7f]+")
+
+
+def is_unsafe_url(value: str) -> bool:
+    """判断链接地址是否使用危险协议（如java\\tscript:）"""
+    return IGNORED_URL_CHARS.sub("", html.unescape(value)).lower().startswith(UNSAFE_SCHEMES)
+
+
+class PostProcessTreeprocessor(Treeprocessor):
+    """在一次树遍历中完成清理、标题锚点和CSS类注入"""
+
+    def __init__(self, md: Markdown, sanitize: bool, heading_anchors: bool, class_map: Dict[str, str]):
+        super().__init__(md)
+        self.sanitize = sanitize
+        self.heading_anchors = heading_anchors
+        self.class_map = class_map
+
+    def _clean(self, element: etree.Element) -> None:
+        for child in list(element):
+            if child.tag in UNSAFE_TAGS:
+                element.remove(child)
+        for name in list(element.attrib):
+            value = element.attrib[name]
+            if name.lower().startswith("on"):
+                del element.attrib[name]
+            elif name in URL_ATTRIBUTES and is_unsafe_url(value):
+                element.attrib[name] = "#"
+
+    def _add_anchor(self, element: etree.Element) -> None:
+        anchor_id = element.get("id")
+        if not anchor_id:
+            return
+        anchor = etree.SubElement(element, "a", {"class": "heading-anchor", "href": f"#{anchor_id}"})
+        anchor.text = "#"
+
+    def run(self, root: etree.Element) -> None:
+        with metrics.stage("html_postprocess"):
+            self._process(root)
+
+    def _process(self, root: etree.Element) -> None:
+        for element in list(root.iter()):
+            if self.sanitize:
+                self._clean(element)
+            classes = self.class_map.get(element.tag)
+            if classes:
+                existing = element.get("class")
+                element.set("class", f"{existing} {classes}" if existing else classes)
+            if self.heading_anchors and element.tag in HEADING_TAGS:
+                self._add_anchor(element)
+
+
+class PostProcessExtension(Extension):
+    """单次遍历的HTML后处理扩展
+
+    以树处理器的形式在序列化之前直接修改元素树，取代对输出HTML重新解析再
+    序列化的做法。应放在扩展列表的最后。支持：
+    - sanitize: 不再透传原始HTML，并移除危险元素、事件属性和javascript:链接
+    - heading_anchors: 为带id的标题添加锚点链接
+    - class_map: 按标签名为元素添加CSS类，便于模板定制样式
+    """
+
+    def __init__(self, **kwargs):
+        self.config = {
+            "sanitize": [False, "Drop raw HTML and unsafe elements, attributes and URLs"],
+            "heading_anchors": [False, "Append an anchor link to headings that have an id"],
+            "class_map": [{}, "Mapping of tag name to CSS classes to add"],
+        }
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md: Markdown) -> None:
+        sanitize = self.getConfig("sanitize")
+        if sanitize:
+            # 原始HTML以文本形式转义输出，而不是原样透传
+            if "html_block" in md.preprocessors:
+                md.preprocessors.deregister("html_block")
+            if "html" in md.inlinePatterns:
+                md.inlinePatterns.deregister("html")
+        # 在目录扩展（优先级5）生成标题id之后运行
+        md.treeprocessors.register(
+            PostProcessTreeprocessor(md, sanitize, self.getConfig("heading_anchors"), self.getConfig("class_map")),
+            "bettermd_postprocess",
+            1,
+        )
+
+
+def makeExtension(**kwargs) -> PostProcessExtension:
+    return PostProcessExtension(**kwargs)
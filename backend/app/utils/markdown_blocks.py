@@ -0,0 +1,114 @@
+import re
+from typing import List, Optional, Tuple
+
+# ATX标题、围栏代码块起止、列表项、引用
+HEADING_RE = re.compile(r"^ {0,3}#{1,6}(\s|$)")
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+LIST_ITEM_RE = re.compile(r"^ {0,3}([*+-]|\d+[.)])\s")
+QUOTE_RE = re.compile(r"^ {0,3}>")
+
+
+def _closes_fence(line: str, fence: Tuple[str, int]) -> bool:
+    stripped = line.strip()
+    char, length = fence
+    return len(stripped) >= length and set(stripped) == {char}
+
+
+def split_blocks(markdown_text: str) -> List[str]:
+    """
+    将Markdown文本拆分为顶层块
+    
+    块之间以空行分隔，标题单独成块，围栏代码块内部的空行不会拆分，
+    缩进内容、松散列表的后续列表项以及空行后继续的引用归入前一个块
+    （Python-Markdown会把空行分隔的连续引用合并为一个blockquote）。
+    拆分是无损的：各块按顺序拼接后与原文完全一致（空行归入其前面的块）。
+    
+    Args:
+        markdown_text (str): Markdown文本
+        
+    Returns:
+        List[str]: 顶层块列表
+    """
+    blocks: List[str] = []
+    current: List[str] = []
+    has_content = False
+    prev_blank = False
+    fence: Optional[Tuple[str, int]] = None
+    current_kind = None
+
+    for line in markdown_text.splitlines(keepends=True):
+        if fence is not None:
+            current.append(line)
+            if _closes_fence(line, fence):
+                fence = None
+            continue
+
+        if not line.strip():
+            current.append(line)
+            prev_blank = True
+            continue
+
+        heading = HEADING_RE.match(line) is not None
+        fence_match = FENCE_RE.match(line)
+        list_item = LIST_ITEM_RE.match(line) is not None
+        quote = QUOTE_RE.match(line) is not None
+
+        starts_block = False
+        if has_content:
+            if heading or fence_match or current_kind == "heading":
+                starts_block = True
+            elif prev_blank:
+                indented = line[0] in " \t"
+                continues_list = current_kind == "list" and list_item
+                continues_quote = current_kind == "quote" and quote
+                starts_block = not (indented or continues_list or continues_quote)
+
+        if starts_block:
+            blocks.append("".join(current))
+            current = []
+            has_content = False
+
+        if not has_content:
+            current_kind = "heading" if heading else "list" if list_item else "quote" if quote else "other"
+            has_content = True
+
+        current.append(line)
+        prev_blank = False
+        if fence_match:
+            marker = fence_match.group(1)
+            fence = (marker[0], len(marker))
+
+    if current:
+        blocks.append("".join(current))
+    return blocks
+
+
+def chunk_markdown(markdown_text: str, max_chars: int) -> List[str]:
+    """
+    将Markdown文本按块边界合并为不超过max_chars的若干段
+    
+    优先在标题处分段；单个块超过上限时独立成段而不会被截断。
+    
+    Args:
+        markdown_text (str): Markdown文本
+        max_chars (int): 每段的目标最大字符数
+        
+    Returns:
+        List[str]: 分段列表，按顺序拼接后与原文一致
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+
+    for block in split_blocks(markdown_text):
+        is_heading = HEADING_RE.match(block) is not None
+        if current and (size + len(block) > max_chars or (is_heading and size >= max_chars // 2)):
+            chunks.append("".join(current))
+            current = []
+            size = 0
+        current.append(block)
+        size += len(block)
+
+    if current:
+        chunks.append("".join(current))
+    return chunks
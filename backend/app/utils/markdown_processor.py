@@ -1,37 +1,198 @@
-import markdown
-from bs4 import BeautifulSoup
+import os
+import json
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Optional, Tuple
+
 from app.core.template_manager import template_manager
+from app.core.render_cache import render_cache
+from app.core.metrics import metrics
+
+if TYPE_CHECKING:
+    import markdown
+
+logger = logging.getLogger(__name__)
+
+# 默认Markdown扩展，支持标准语法和扩展语法
+DEFAULT_EXTENSIONS: Tuple[str, ...] = (
+    'markdown.extensions.extra',
+    'markdown.extensions.codehilite',
+    'markdown.extensions.toc',
+    'markdown.extensions.tables',
+    'markdown.extensions.fenced_code',
+)
+
+
+# HTML后处理方式：treeprocessor（在Markdown元素树上单次处理）、bs4（旧的BeautifulSoup往返）、none
+HTML_POSTPROCESSOR = os.getenv("HTML_POSTPROCESSOR", "treeprocessor")
+POSTPROCESS_EXTENSION = 'app.utils.html_postprocess'
+
+# 是否缓存代码块的Pygments高亮结果
+HIGHLIGHT_CACHE_ENABLED = os.getenv("HIGHLIGHT_CACHE", "true").lower() in ("1", "true", "yes")
+HIGHLIGHT_CACHE_EXTENSION = 'app.utils.highlight_cache'
+
+# 是否将[[双向链接]]渲染为链接，以及链接地址的前缀和后缀
+WIKI_LINKS_ENABLED = os.getenv("WIKI_LINKS", "true").lower() in ("1", "true", "yes")
+WIKI_LINKS_EXTENSION = 'app.utils.wiki_links'
+WIKI_LINKS_CONFIGS = {
+    "base_url": os.getenv("WIKI_LINK_BASE_URL", ""),
+    "end_url": os.getenv("WIKI_LINK_END_URL", ""),
+}
+
+
+def _postprocess_configs() -> Dict[str, Any]:
+    """从环境变量读取后处理扩展的配置"""
+    configs: Dict[str, Any] = {}
+    if os.getenv("HTML_SANITIZE", "false").lower() in ("1", "true", "yes"):
+        configs["sanitize"] = True
+    if os.getenv("HTML_HEADING_ANCHORS", "false").lower() in ("1", "true", "yes"):
+        configs["heading_anchors"] = True
+    class_map = _parse_class_map(os.getenv("HTML_CLASS_MAP", ""))
+    if class_map:
+        configs["class_map"] = class_map
+    return configs
+
+
+def _parse_class_map(value: str) -> Dict[str, str]:
+    """解析HTML_CLASS_MAP，格式不正确时记录警告并忽略，不影响服务启动"""
+    if not value:
+        return {}
+    try:
+        class_map = json.loads(value)
+    except json.JSONDecodeError as e:
+        logger.warning(f"Ignoring HTML_CLASS_MAP, invalid JSON: {e}")
+        return {}
+    if not isinstance(class_map, dict) or not all(
+        isinstance(tag, str) and isinstance(classes, str) for tag, classes in class_map.items()
+    ):
+        logger.warning("Ignoring HTML_CLASS_MAP, expected a JSON object mapping tag names to CSS classes")
+        return {}
+    return class_map
+
+
+def pipeline_extensions(postprocessor: str = HTML_POSTPROCESSOR) -> Tuple[Tuple[str, ...], Dict[str, Dict[str, Any]]]:
+    """返回渲染管线使用的扩展列表和扩展配置"""
+    extensions = DEFAULT_EXTENSIONS
+    extension_configs: Dict[str, Dict[str, Any]] = {}
+    if HIGHLIGHT_CACHE_ENABLED:
+        extensions += (HIGHLIGHT_CACHE_EXTENSION,)
+    if WIKI_LINKS_ENABLED:
+        extensions += (WIKI_LINKS_EXTENSION,)
+        extension_configs[WIKI_LINKS_EXTENSION] = WIKI_LINKS_CONFIGS
+    configs = _postprocess_configs()
+    if postprocessor == "treeprocessor" and configs:
+        # 后处理扩展放在最后
+        extensions += (POSTPROCESS_EXTENSION,)
+        extension_configs[POSTPROCESS_EXTENSION] = configs
+    return extensions, extension_configs
 
-def process_markdown(markdown_text: str) -> str:
+
+PIPELINE_EXTENSIONS, PIPELINE_EXTENSION_CONFIGS = pipeline_extensions()
+
+
+def extension_config_key(extensions: Iterable[str] = DEFAULT_EXTENSIONS,
+                         extension_configs: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+    """生成扩展配置的稳定标识，用于区分不同配置的转换器"""
+    return json.dumps(
+        [list(extensions), extension_configs or {}],
+        sort_keys=True,
+        default=repr,
+        ensure_ascii=False,
+    )
+
+
+class MarkdownConverterPool:
+    """Markdown转换器池
+
+    创建markdown.Markdown实例时需要注册全部扩展的预处理器、行内模式和树处理器，
+    开销远大于转换一篇小文档。这里按扩展配置缓存已初始化的实例，并在每次转换后
+    调用reset()清理状态以便复用。Markdown实例不是线程安全的，因此每个线程持有
+    自己的一组实例。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _get_converter(self, extensions: Tuple[str, ...],
+                       extension_configs: Optional[Dict[str, Dict[str, Any]]]) -> "markdown.Markdown":
+        converters = getattr(self._local, "converters", None)
+        if converters is None:
+            converters = self._local.converters = {}
+
+        key = extension_config_key(extensions, extension_configs)
+        md = converters.get(key)
+        if md is None:
+            # 第一次创建转换器时才导入markdown及其扩展
+            import markdown
+            md = markdown.Markdown(
+                extensions=list(extensions),
+                extension_configs=extension_configs or {},
+            )
+            converters[key] = md
+        return md
+
+    def convert(self, markdown_text: str,
+                extensions: Iterable[str] = DEFAULT_EXTENSIONS,
+                extension_configs: Optional[Dict[str, Dict[str, Any]]] = None,
+                on_converted: Optional[Callable[["markdown.Markdown"], None]] = None) -> str:
+        """使用当前线程的复用实例转换Markdown文本
+
+        on_converted在转换完成、重置实例之前调用，用于读取扩展收集的信息（如双向链接）。
+        """
+        md = self._get_converter(tuple(extensions), extension_configs)
+        try:
+            html = md.convert(markdown_text)
+            if on_converted is not None:
+                on_converted(md)
+            return html
+        finally:
+            # 及时释放本次转换的状态（引用定义、HTML暂存等）
+            md.reset()
+
+
+# 全局转换器池实例
+converter_pool = MarkdownConverterPool()
+
+# 渲染管线配置的标识，作为渲染缓存键的一部分
+DEFAULT_CONFIG_KEY = extension_config_key(PIPELINE_EXTENSIONS, PIPELINE_EXTENSION_CONFIGS) + HTML_POSTPROCESSOR
+
+
+def process_markdown(markdown_text: str,
+                     extensions: Optional[Iterable[str]] = None,
+                     extension_configs: Optional[Dict[str, Dict[str, Any]]] = None,
+                     postprocessor: str = HTML_POSTPROCESSOR,
+                     on_converted: Optional[Callable[["markdown.Markdown"], None]] = None) -> str:
     """
     处理Markdown文本并转换为HTML
     
     Args:
         markdown_text (str): 原始Markdown文本
+        extensions: 启用的Markdown扩展，默认使用渲染管线的扩展
+        extension_configs: 扩展配置
+        postprocessor: HTML后处理方式（treeprocessor、bs4或none）
+        on_converted: 转换完成后以Markdown实例调用，用于读取扩展收集的信息
         
     Returns:
         str: 处理后的HTML
     """
-    # 配置Markdown扩展，支持标准语法和扩展语法
-    md = markdown.Markdown(extensions=[
-        # 标准Markdown语法支持
-        'markdown.extensions.extra',
-        'markdown.extensions.codehilite',
-        'markdown.extensions.toc',
-        'markdown.extensions.tables',
-        'markdown.extensions.fenced_code',
-    ])
-    
-    # 转换Markdown为HTML
-    html = md.convert(markdown_text)
-    
-    # 使用BeautifulSoup清理HTML并添加基本样式
-    soup = BeautifulSoup(html, 'html.parser')
+    if extensions is None:
+        extensions, extension_configs = (
+            (PIPELINE_EXTENSIONS, PIPELINE_EXTENSION_CONFIGS)
+            if postprocessor == HTML_POSTPROCESSOR
+            else pipeline_extensions(postprocessor)
+        )
+
+    # 转换Markdown为HTML（复用当前线程已初始化的转换器，后处理在元素树上完成）
+    with metrics.stage("markdown_convert"):
+        html = converter_pool.convert(markdown_text, extensions, extension_configs, on_converted)
     
-    # 添加基本的CSS样式以确保基本的Markdown元素正确显示
-    styled_html = str(soup)
+    if postprocessor == "bs4":
+        # 旧的处理方式：用BeautifulSoup解析后重新序列化
+        from bs4 import BeautifulSoup
+        with metrics.stage("html_postprocess"):
+            html = str(BeautifulSoup(html, 'html.parser'))
     
-    return styled_html
+    return html
 
 def apply_template(html_content: str, template_name: str = "default") -> str:
     """
@@ -45,4 +206,158 @@ def apply_template(html_content: str, template_name: str = "default") -> str:
         str: 应用模板后的完整HTML
     """
     # 使用模板管理器渲染内容
-    return template_manager.render_template(html_content, template_name, "Beautified Document")
\ No newline at end of file
+    with metrics.stage("template_render"):
+        return template_manager.render_template(html_content, template_name, "Beautified Document")
+
+def render_cache_keys(markdown_text: str, template_name: str = "default") -> Tuple[str, str]:
+    """
+    计算文档在渲染缓存中的键
+    
+    Args:
+        markdown_text (str): 原始Markdown文本
+        template_name (str): 模板名称
+        
+    Returns:
+        Tuple[str, str]: (HTML片段键, 完整页面键)
+    """
+    fragment_key = render_cache.fragment_key(markdown_text, DEFAULT_CONFIG_KEY)
+    page_key = render_cache.page_key(
+        fragment_key, template_name, template_manager.get_template_version(template_name)
+    )
+    return fragment_key, page_key
+
+def convert_with_links(markdown_text: str) -> Tuple[str, Optional[str]]:
+    """
+    用渲染管线转换文档，同时取出wiki_links扩展在这次转换中收集的链接和标题
+    
+    Args:
+        markdown_text (str): 原始Markdown文本
+        
+    Returns:
+        Tuple[str, Optional[str]]: (HTML片段, 链接和标题的JSON)，未启用双向链接时后者为None
+    """
+    collected: Dict[str, str] = {}
+
+    def collect(md) -> None:
+        if hasattr(md, "wiki_links"):
+            collected["links"] = json.dumps(
+                {"links": md.wiki_links, "headings": md.wiki_headings}, ensure_ascii=False
+            )
+
+    fragment = process_markdown(markdown_text, on_converted=collect)
+    return fragment, collected.get("links")
+
+def render_document(markdown_text: str, template_name: str = "default",
+                    highlights: Optional[Dict[str, str]] = None) -> Tuple[str, str, Optional[str]]:
+    """
+    不经过缓存完整渲染文档，供进程池中的工作进程调用
+    
+    Args:
+        markdown_text (str): 原始Markdown文本
+        template_name (str): 模板名称
+        highlights: 预先并行计算好的代码高亮结果，转换前放入本进程的高亮缓存
+        
+    Returns:
+        Tuple[str, str, Optional[str]]: (HTML片段, 应用模板后的完整HTML, 链接和标题的JSON)
+    """
+    fragment, links = convert_document(markdown_text, highlights)
+    return fragment, apply_template(fragment, template_name), links
+
+def convert_document(markdown_text: str, highlights: Optional[Dict[str, str]] = None) -> Tuple[str, Optional[str]]:
+    """
+    不经过缓存将文档转换为HTML片段，供进程池中的工作进程调用
+    
+    Args:
+        markdown_text (str): 原始Markdown文本
+        highlights: 预先并行计算好的代码高亮结果，转换前放入本进程的高亮缓存
+        
+    Returns:
+        Tuple[str, Optional[str]]: (HTML片段, 链接和标题的JSON)
+    """
+    if highlights:
+        from app.utils.highlight_cache import highlight_cache
+        highlight_cache.seed(highlights)
+    return convert_with_links(markdown_text)
+
+def store_fragment(fragment_key: str, fragment: str, links: Optional[str]) -> None:
+    """将转换结果（HTML片段和收集到的链接）写入渲染缓存"""
+    render_cache.fragments.set(fragment_key, fragment)
+    if links is not None:
+        render_cache.links.set(fragment_key, links)
+
+def build_fragment(markdown_text: str, fragment_key: str) -> str:
+    """
+    在片段缓存未命中时转换文档，并写入缓存
+    
+    Args:
+        markdown_text (str): 原始Markdown文本
+        fragment_key (str): render_cache_keys返回的HTML片段键
+        
+    Returns:
+        str: HTML片段
+    """
+    fragment = render_cache.fragments.get(fragment_key)
+    if fragment is None:
+        fragment, links = convert_with_links(markdown_text)
+        store_fragment(fragment_key, fragment, links)
+    return fragment
+
+def build_links(markdown_text: str) -> Optional[str]:
+    """
+    返回文档渲染时收集的链接和标题（JSON）
+    
+    文档已渲染过时直接取渲染缓存中的结果；尚未渲染或已被淘汰时渲染一次，
+    HTML片段同时写入缓存，之后的预览请求可以直接使用。
+    
+    Args:
+        markdown_text (str): 原始Markdown文本
+        
+    Returns:
+        Optional[str]: 链接和标题的JSON，未启用双向链接时为None
+    """
+    if not WIKI_LINKS_ENABLED:
+        return None
+    fragment_key = render_cache.fragment_key(markdown_text, DEFAULT_CONFIG_KEY)
+    links = render_cache.links.get(fragment_key)
+    if links is None:
+        fragment, links = convert_with_links(markdown_text)
+        store_fragment(fragment_key, fragment, links)
+    return links
+
+def build_page(markdown_text: str, template_name: str, keys: Tuple[str, str]) -> str:
+    """
+    在页面缓存未命中时生成完整页面（复用已缓存的HTML片段），并写入缓存
+    
+    Args:
+        markdown_text (str): 原始Markdown文本
+        template_name (str): 模板名称
+        keys: render_cache_keys返回的缓存键
+        
+    Returns:
+        str: 应用模板后的完整HTML
+    """
+    fragment_key, page_key = keys
+    fragment = build_fragment(markdown_text, fragment_key)
+    page = apply_template(fragment, template_name)
+    render_cache.pages.set(page_key, page)
+    return page
+
+def render_markdown(markdown_text: str, template_name: str = "default",
+                    keys: Optional[Tuple[str, str]] = None) -> str:
+    """
+    将Markdown渲染为应用模板后的完整HTML，优先使用渲染缓存
+    
+    Args:
+        markdown_text (str): 原始Markdown文本
+        template_name (str): 模板名称
+        keys: 预先计算好的缓存键，省略时自动计算
+        
+    Returns:
+        str: 应用模板后的完整HTML
+    """
+    keys = keys or render_cache_keys(markdown_text, template_name)
+
+    page = render_cache.pages.get(keys[1])
+    if page is None:
+        page = build_page(markdown_text, template_name, keys)
+    return page
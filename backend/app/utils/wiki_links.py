@@ -0,0 +1,88 @@
+import re
+import xml.etree.ElementTree as etree
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from markdown import Markdown
+from markdown.extensions import Extension
+from markdown.extensions.toc import slugify
+from markdown.inlinepatterns import InlineProcessor
+from markdown.treeprocessors import Treeprocessor
+
+# [[笔记]]、[[笔记#标题]]、[[笔记|显示文字]]、[[#本文标题]]
+WIKI_LINK_RE = r"\[\[([^\[\]|#\n]*)(?:#([^\[\]|\n]+))?(?:\|([^\[\]\n]+))?\]\]"
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+
+
+class WikiLinkInlineProcessor(InlineProcessor):
+    """将[[双向链接]]转换为<a class="wikilink">，并记录到md.wiki_links"""
+
+    def __init__(self, pattern: str, md: Markdown, base_url: str, end_url: str):
+        super().__init__(pattern, md)
+        self.base_url = base_url
+        self.end_url = end_url
+
+    def handleMatch(self, m: re.Match, data: str) -> Tuple[Optional[etree.Element], int, int]:
+        target = " ".join(m.group(1).split())
+        heading = m.group(2).strip() if m.group(2) else None
+        alias = m.group(3).strip() if m.group(3) else None
+        if not target and not heading:
+            return None, m.start(0), m.end(0)
+
+        href = f"{self.base_url}{quote(target)}{self.end_url}" if target else ""
+        if heading:
+            href += f"#{slugify(heading, '-')}"
+        element = etree.Element("a", {"class": "wikilink", "href": href})
+        if target:
+            element.set("data-target", target)
+        element.text = alias or (f"{target}#{heading}" if target and heading else target or heading)
+        if target:
+            self.md.wiki_links.append({"target": target, "heading": heading})
+        return element, m.start(0), m.end(0)
+
+
+class HeadingCollector(Treeprocessor):
+    """收集文档中的标题（级别、文字、锚点id）到md.wiki_headings"""
+
+    def run(self, root: etree.Element) -> None:
+        for element in root.iter():
+            level = HEADING_TAGS.get(element.tag)
+            if level is not None:
+                text = " ".join("".join(element.itertext()).split())
+                self.md.wiki_headings.append({"level": level, "text": text, "anchor": element.get("id")})
+
+
+class WikiLinksExtension(Extension):
+    """Obsidian风格的双向链接扩展
+
+    渲染时将[[链接]]转换为带data-target属性的链接，同时收集文档中的链接目标和标题，
+    转换后可从md.wiki_links和md.wiki_headings读取，供链接索引使用。
+    代码块和行内代码中的[[...]]不会被处理。
+    """
+
+    def __init__(self, **kwargs):
+        self.config = {
+            "base_url": ["", "String to prepend to the link target in href"],
+            "end_url": ["", "String to append to the link target in href"],
+        }
+        super().__init__(**kwargs)
+
+    def extendMarkdown(self, md: Markdown) -> None:
+        md.registerExtension(self)
+        self.md = md
+        self.reset()
+        processor = WikiLinkInlineProcessor(
+            WIKI_LINK_RE, md, self.getConfig("base_url"), self.getConfig("end_url")
+        )
+        # 优先于普通链接和引用链接（170），低于行内代码（190）
+        md.inlinePatterns.register(processor, "wiki_link", 175)
+        # 在toc（5）生成标题id之后运行
+        md.treeprocessors.register(HeadingCollector(md), "wiki_headings", 4)
+
+    def reset(self) -> None:
+        self.md.wiki_links = []
+        self.md.wiki_headings = []
+
+
+def makeExtension(**kwargs) -> WikiLinksExtension:
+    return WikiLinksExtension(**kwargs)
@@ -0,0 +1,138 @@
+"""AI接口负载测试
+
+启动本地模拟的智谱接口（benchmarks.fake_zhipu），在同一进程内通过ASGITransport以不同
+并发数调用各个AI路由，统计吞吐量、延迟分位数，流式接口另外统计首个事件的延迟。
+默认关闭AI响应缓存，使每个请求都真正访问上游。
+
+用法（在backend目录下）：
+    python -m benchmarks.ai_load [--requests 40] [--concurrency 1 8 32]
+        [--latency 0.2] [--token-delay 0.02] [--error-rate 0] [--document typical]
+        [--output reports/ai.json]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from benchmarks.corpus import DOCUMENT_NAMES, build_corpus
+from benchmarks.fake_zhipu import FakeZhipuServer
+from benchmarks.report import Report
+
+ENDPOINTS = (
+    ("template-recommend", "/api/ai/template-recommend", False),
+    ("content-suggestions", "/api/ai/content-suggestions", False),
+    ("beautify", "/api/ai/beautify", False),
+    ("content-suggestions-stream", "/api/ai/content-suggestions/stream", True),
+    ("beautify-stream", "/api/ai/beautify/stream", True),
+)
+
+
+async def _call(client: httpx.AsyncClient, path: str, payload: dict, stream: bool) -> float:
+    """发送一个请求，返回首个响应数据到达的耗时（流式接口）或0"""
+    start = time.perf_counter()
+    if not stream:
+        response = await client.post(path, json=payload)
+        response.raise_for_status()
+        return 0.0
+    first = 0.0
+    async with client.stream("POST", path, json=payload) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_bytes():
+            if not first:
+                first = time.perf_counter() - start
+    return first
+
+
+async def run_load(client: httpx.AsyncClient, report: Report, name: str, path: str,
+                   payload: dict, stream: bool, requests: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_bytes = [], []
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            first = await _call(client, path, payload, stream)
+            latencies.append(time.perf_counter() - start)
+            if stream:
+                first_bytes.append(first)
+
+    await _call(client, path, payload, stream)  # 预热连接池
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    extra = {"concurrency": concurrency}
+    if first_bytes:
+        ordered = sorted(first_bytes)
+        extra["ttfb_p50_ms"] = ordered[len(ordered) // 2] * 1000
+        extra["ttfb_p95_ms"] = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000
+    report.add(f"{name}/c{concurrency}", latencies, elapsed, **extra)
+
+
+async def run_suite(args, app) -> Report:
+    content = build_corpus([args.document])[args.document]
+    report = Report("ai", {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "latency": args.latency,
+        "token_delay": args.token_delay,
+        "error_rate": args.error_rate,
+        "document": args.document,
+        "document_chars": len(content),
+        "cache": args.with_cache,
+    })
+    Report.print_header()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, path, stream in ENDPOINTS:
+            if args.endpoints and name not in args.endpoints:
+                continue
+            payload = {"content": content}
+            if "beautify" in name:
+                payload["template"] = "default"
+            for concurrency in args.concurrency:
+                await run_load(client, report, name, path, payload, stream, args.requests, concurrency)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40, help="每个并发级别发送的请求数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--document", default="typical", choices=DOCUMENT_NAMES)
+    parser.add_argument("--endpoints", nargs="+", choices=[name for name, _, _ in ENDPOINTS])
+    parser.add_argument("--with-cache", action="store_true", help="保留AI响应缓存")
+    parser.add_argument("--output", help="JSON报告路径")
+    args = parser.parse_args()
+
+    server = FakeZhipuServer(latency=args.latency, token_delay=args.token_delay,
+                             error_rate=args.error_rate).start()
+    # AI服务在导入时读取配置，必须先设置好环境变量
+    os.environ["ZHIPU_API_KEY"] = "benchmark"
+    os.environ["ZHIPU_BASE_URL"] = server.base_url
+    if not args.with_cache:
+        os.environ["AI_CACHE_ENABLED"] = "false"
+
+    from app.core.ai_service import ai_service
+    from app.main import app
+
+    async def run() -> Report:
+        try:
+            return await run_suite(args, app)
+        finally:
+            await ai_service.aclose()
+
+    try:
+        report = asyncio.run(run())
+    finally:
+        server.stop()
+    report.write(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""对比两份基准报告
+
+按测量项对比基线报告和新报告的p50、p95延迟和吞吐量，超过阈值的变慢标记为回归。
+存在回归时以非零状态退出，便于在CI中使用。
+
+用法（在backend目录下）：
+    python -m benchmarks.compare reports/base.json reports/head.json [--threshold 10]
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict
+
+METRICS = ("p50_ms", "p95_ms")
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float) -> int:
+    """打印对比表格，返回回归的测量项数量"""
+    print(f"base: {base.get('revision')} ({base.get('created_at')})")
+    print(f"head: {head.get('revision')} ({head.get('created_at')})")
+    if base.get("parameters") != head.get("parameters"):
+        print("warning: reports were produced with different parameters")
+    print(f"{'case':<44}{'p50 base':>11}{'p50 head':>11}{'p50 Δ%':>9}{'p95 Δ%':>9}{'ops Δ%':>9}")
+
+    regressions = 0
+    for name in sorted(set(base["cases"]) | set(head["cases"])):
+        before, after = base["cases"].get(name), head["cases"].get(name)
+        if before is None or after is None:
+            print(f"{name:<44}{'only in ' + ('head' if before is None else 'base'):>22}")
+            continue
+        changes = {metric: _change(before[metric], after[metric]) for metric in METRICS}
+        throughput = _change(before["ops_per_sec"], after["ops_per_sec"])
+        regressed = any(change > threshold for change in changes.values())
+        regressions += regressed
+        print(f"{name:<44}{before['p50_ms']:>11.2f}{after['p50_ms']:>11.2f}"
+              f"{changes['p50_ms']:>+9.1f}{changes['p95_ms']:>+9.1f}{throughput:>+9.1f}"
+              f"{'  REGRESSION' if regressed else ''}")
+
+    rss_change = _change(base.get("max_rss_mib", 0), head.get("max_rss_mib", 0))
+    print(f"max rss: {base.get('max_rss_mib', 0):.1f} -> {head.get('max_rss_mib', 0):.1f} MiB ({rss_change:+.1f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="延迟增加超过该百分比视为回归")
+    args = parser.parse_args()
+
+    regressions = compare(load(args.base), load(args.head), args.threshold)
+    if regressions:
+        print(f"{regressions} case(s) regressed by more than {args.threshold:.0f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
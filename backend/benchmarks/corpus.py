@@ -0,0 +1,117 @@
+"""基准测试使用的合成文档语料
+
+所有文档都由固定的片段按确定的方式拼接而成，保证不同提交之间测量的是同一份输入。
+
+- tiny: 一个标题加一句话
+- typical: 标题、段落、列表、少量代码和表格组成的常见文档（约4KB）
+- code_heavy: 以多种语言的围栏代码块为主（约64KB）
+- table_heavy: 以较宽的表格为主（约64KB）
+- large: 由典型小节重复而成的大文档（默认10MB）
+"""
+from typing import Dict, Iterable, Optional
+
+TINY_DOC = "# 标题\n\n一段简短的文字。\n"
+
+TYPICAL_SECTION = """## 小节 {index}
+
+这是一段普通的正文，包含**加粗**、*斜体*、[链接](https://example.com/{index})和`行内代码`。
+第二句话稍长一些，用来模拟真实文档中的段落长度，使转换器需要处理多行文本。
+
+- 第一项
+- 第二项，包含`代码`
+- 第三项
+
+> 引用的内容 {index}
+
+```python
+def section_{index}(value):
+    return value * {index}
+```
+
+| 名称 | 数值 | 说明 |
+| ---- | ---- | ---- |
+| a{index} | {index} | 第一行 |
+| b{index} | {index}0 | 第二行 |
+
+"""
+
+CODE_BLOCKS = (
+    ("python", "def handler_{index}(request):\n    data = request.json()\n    for key, value in data.items():\n        print(key, value)\n    return {{\"status\": \"ok\", \"id\": {index}}}\n"),
+    ("javascript", "export async function fetch{index}(url) {{\n  const response = await fetch(url);\n  if (!response.ok) throw new Error(response.statusText);\n  return response.json();\n}}\n"),
+    ("go", "func Worker{index}(jobs <-chan int, results chan<- int) {{\n\tfor j := range jobs {{\n\t\tresults <- j * {index}\n\t}}\n}}\n"),
+    ("sql", "SELECT u.id, u.name, COUNT(o.id) AS orders\nFROM users u\nLEFT JOIN orders o ON o.user_id = u.id\nWHERE u.created_at > '2024-01-{day:02d}'\nGROUP BY u.id, u.name;\n"),
+    ("bash", "for file in *.md; do\n  echo \"processing $file ({index})\"\n  pandoc \"$file\" -o \"${{file%.md}}.html\"\ndone\n"),
+)
+
+TABLE_COLUMNS = 8
+
+
+def _repeat_until(make_section, target_chars: int, header: str) -> str:
+    parts = [header]
+    size = len(header)
+    index = 0
+    while size < target_chars:
+        section = make_section(index)
+        parts.append(section)
+        size += len(section)
+        index += 1
+    return "".join(parts)
+
+
+def typical_document(target_chars: int = 4 * 1024) -> str:
+    return _repeat_until(lambda index: TYPICAL_SECTION.format(index=index),
+                         target_chars, "# 典型文档\n\n")
+
+
+def code_heavy_document(target_chars: int = 64 * 1024) -> str:
+    def section(index: int) -> str:
+        language, code = CODE_BLOCKS[index % len(CODE_BLOCKS)]
+        body = code.format(index=index, day=index % 28 + 1)
+        return f"### 示例 {index}\n\n```{language}\n{body}```\n\n"
+
+    return _repeat_until(section, target_chars, "# 代码示例集\n\n")
+
+
+def table_heavy_document(target_chars: int = 64 * 1024) -> str:
+    header = "| " + " | ".join(f"列{column}" for column in range(TABLE_COLUMNS)) + " |\n"
+    divider = "|" + " --- |" * TABLE_COLUMNS + "\n"
+
+    def section(index: int) -> str:
+        rows = "".join(
+            "| " + " | ".join(f"r{row}c{column}-{index}" for column in range(TABLE_COLUMNS)) + " |\n"
+            for row in range(20)
+        )
+        return f"## 表格 {index}\n\n{header}{divider}{rows}\n"
+
+    return _repeat_until(section, target_chars, "# 数据表格\n\n")
+
+
+def large_document(megabytes: float = 10) -> str:
+    return typical_document(int(megabytes * 1024 * 1024))
+
+
+DOCUMENT_NAMES = ("tiny", "typical", "code_heavy", "table_heavy", "large")
+
+
+def build_corpus(names: Optional[Iterable[str]] = None, large_megabytes: float = 10) -> Dict[str, str]:
+    """生成指定名称的文档
+
+    Args:
+        names: 文档名称列表，默认生成全部
+        large_megabytes: large文档的大小（MB）
+
+    Returns:
+        文档名称到Markdown文本的映射
+    """
+    builders = {
+        "tiny": lambda: TINY_DOC,
+        "typical": typical_document,
+        "code_heavy": code_heavy_document,
+        "table_heavy": table_heavy_document,
+        "large": lambda: large_document(large_megabytes),
+    }
+    selected = DOCUMENT_NAMES if names is None else tuple(names)
+    unknown = set(selected) - set(builders)
+    if unknown:
+        raise ValueError(f"Unknown documents: {', '.join(sorted(unknown))}")
+    return {name: builders[name]() for name in selected}
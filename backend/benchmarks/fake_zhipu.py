@@ -0,0 +1,153 @@
+"""本地模拟的智谱AI接口
+
+实现/chat/completions的普通和流式（SSE）两种响应，可配置响应延迟、逐token间隔和
+429错误比例（均可按模型单独设置），供AI路径的负载测试和模型路由测试使用，不消耗真实额度。
+
+作为独立服务运行（在backend目录下）：
+    python -m benchmarks.fake_zhipu [--port 8765] [--latency 0.2] [--token-delay 0.02]
+        [--model-latency glm-4-0520=3] [--model-error-rate glm-4-air=0.5]
+然后将ZHIPU_BASE_URL设置为 http://127.0.0.1:8765/api/paas/v4 。
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+RECOMMENDATION = json.dumps([
+    {"template": "technical", "reason": "文档包含较多代码示例"},
+    {"template": "default", "reason": "通用排版"},
+], ensure_ascii=False)
+
+STREAM_TOKENS = ("## 优化后的", "文档\n\n", "这是模拟", "返回的", "内容。\n")
+
+
+class FakeZhipuHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # 由FakeZhipuServer设置
+    latency = 0.0
+    token_delay = 0.0
+    error_rate = 0.0
+    model_latency: Dict[str, float] = {}
+    model_error_rate: Dict[str, float] = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端取消了请求（例如对冲请求中落后的一方）
+            pass
+
+    def _send_json(self, status: int, payload: Optional[dict]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        model = body.get("model", "")
+        time.sleep(self.model_latency.get(model, self.latency))
+        error_rate = self.model_error_rate.get(model, self.error_rate)
+        if error_rate and random.random() < error_rate:
+            self._send_json(429, {"error": {"message": "rate limited"}})
+            return
+
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        # 模板推荐的提示词要求返回JSON
+        content = RECOMMENDATION if "JSON" in prompt else "".join(STREAM_TOKENS)
+
+        if not body.get("stream"):
+            self._send_json(200, {
+                "model": model,
+                "choices": [{"message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(prompt) // 2, "completion_tokens": len(content) // 2,
+                          "total_tokens": (len(prompt) + len(content)) // 2},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in STREAM_TOKENS:
+            event = {"choices": [{"delta": {"content": token}}]}
+            self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            time.sleep(self.token_delay)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeZhipuServer:
+    """在后台线程中运行的模拟服务"""
+
+    def __init__(self, port: int = 0, latency: float = 0.0, token_delay: float = 0.0,
+                 error_rate: float = 0.0, model_latency: Optional[Dict[str, float]] = None,
+                 model_error_rate: Optional[Dict[str, float]] = None):
+        handler = type("ConfiguredHandler", (FakeZhipuHandler,), {
+            "latency": latency, "token_delay": token_delay, "error_rate": error_rate,
+            "model_latency": model_latency or {}, "model_error_rate": model_error_rate or {},
+        })
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/paas/v4"
+
+    def start(self) -> "FakeZhipuServer":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _per_model(values: Optional[List[str]]) -> Dict[str, float]:
+    """解析model=value形式的参数"""
+    result = {}
+    for item in values or []:
+        model, _, value = item.partition("=")
+        result[model] = float(value)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="每个请求的响应延迟（秒）")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="流式响应中每个token的间隔（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回429的请求比例")
+    parser.add_argument("--model-latency", nargs="+", metavar="MODEL=SECONDS", help="按模型设置响应延迟")
+    parser.add_argument("--model-error-rate", nargs="+", metavar="MODEL=RATE", help="按模型设置429比例")
+    args = parser.parse_args()
+
+    server = FakeZhipuServer(args.port, args.latency, args.token_delay, args.error_rate,
+                             _per_model(args.model_latency), _per_model(args.model_error_rate))
+    print(f"fake Zhipu API listening on {server.base_url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
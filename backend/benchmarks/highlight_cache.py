@@ -0,0 +1,49 @@
+"""代码高亮缓存基准
+
+对代码较多的文档分别测量：不使用高亮缓存、缓存为空（首次渲染）和缓存已填充
+（内容被编辑后重新渲染，大部分代码块未变）三种情况下process_markdown的耗时。
+
+用法（在backend目录下）：
+    python -m benchmarks.highlight_cache [--kilobytes 64] [--iterations 5]
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.corpus import code_heavy_document
+
+from app.utils.highlight_cache import highlight_cache
+from app.utils.markdown_processor import DEFAULT_EXTENSIONS, process_markdown
+
+
+def measure(label: str, iterations: int, render) -> None:
+    samples = []
+    for index in range(iterations):
+        start = time.perf_counter()
+        render(index)
+        samples.append(time.perf_counter() - start)
+    print(f"{label:<12}{statistics.mean(samples) * 1000:>12.1f}{min(samples) * 1000:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kilobytes", type=int, default=64)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    text = code_heavy_document(args.kilobytes * 1024)
+    print(f"{'mode':<12}{'mean(ms)':>12}{'min(ms)':>12}")
+
+    measure("uncached", args.iterations,
+            lambda index: process_markdown(f"{text}\n{index}\n", extensions=DEFAULT_EXTENSIONS))
+
+    def cold(index: int) -> None:
+        highlight_cache.clear()
+        process_markdown(f"{text}\n{index}\n")
+
+    measure("cold", args.iterations, cold)
+    measure("warm", args.iterations, lambda index: process_markdown(f"{text}\n{index}\n"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""HTML后处理方式对比
+
+比较三种后处理方式转换同一文档的耗时：
+- none: 只做Markdown转换
+- treeprocessor: 在元素树上单次完成清理、标题锚点和CSS类注入
+- bs4: 旧的BeautifulSoup解析再序列化
+
+用法（在backend目录下）：
+    python -m benchmarks.html_postprocess [--sections 200] [--iterations 10]
+"""
+import argparse
+import statistics
+import time
+
+from app.utils.markdown_processor import DEFAULT_EXTENSIONS, POSTPROCESS_EXTENSION, process_markdown
+
+SECTION = """## 小节标题
+
+这是一段普通的正文，包含**加粗**、*斜体*、[链接](https://example.com)和`行内代码`。
+
+- 列表项一
+- 列表项二
+
+| 列 | 值 |
+| -- | -- |
+| a  | 1  |
+
+"""
+
+MODES = {
+    "none": dict(extensions=DEFAULT_EXTENSIONS, postprocessor="none"),
+    "treeprocessor": dict(
+        extensions=DEFAULT_EXTENSIONS + (POSTPROCESS_EXTENSION,),
+        extension_configs={POSTPROCESS_EXTENSION: {
+            "sanitize": True,
+            "heading_anchors": True,
+            "class_map": {"table": "md-table", "pre": "md-code"},
+        }},
+        postprocessor="treeprocessor",
+    ),
+    "bs4": dict(extensions=DEFAULT_EXTENSIONS, postprocessor="bs4"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    text = "# 文档\n\n" + SECTION * args.sections
+    print(f"document: {len(text)} chars")
+    print(f"{'mode':<16}{'mean(ms)':>12}{'min(ms)':>12}")
+    for mode, options in MODES.items():
+        process_markdown(text, **options)  # 预热
+        samples = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            process_markdown(text, **options)
+            samples.append(time.perf_counter() - start)
+        print(f"{mode:<16}{statistics.mean(samples) * 1000:>12.1f}{min(samples) * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""双向链接索引基准
+
+生成一个笔记库（每篇笔记带若干[[链接]]，部分链接指向热门笔记），在临时数据库中
+批量建立索引，再随机查询反向链接和链接图邻域，统计查询延迟分位数；最后修改少量
+笔记测量增量更新的耗时。
+
+用法（在backend目录下）：
+    python -m benchmarks.link_index [--notes 20000] [--links 8] [--queries 500] [--depth 2]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.core.link_index import LinkIndex
+from benchmarks.report import summarize
+
+
+def build_notes(count: int, links: int, seed: int = 0):
+    """生成(文档ID, Markdown文本)；约五分之一的链接指向前1%的热门笔记"""
+    rng = random.Random(seed)
+    hubs = max(1, count // 100)
+    for index in range(count):
+        targets = []
+        for _ in range(links):
+            target = rng.randrange(hubs) if rng.random() < 0.2 else rng.randrange(count)
+            targets.append(f"Note {target}")
+        body = "\n\n".join(
+            f"## Section {n}\n\nSee [[{target}]] and [[{target}#Section 1|details]] for context."
+            for n, target in enumerate(targets)
+        )
+        yield f"Note {index}", f"# Note {index}\n\n{body}\n\n```\n[[not a link]]\n```\n"
+
+
+def measure(label: str, samples) -> None:
+    stats = summarize(samples)
+    print(f"{label:<12}{stats['count']:>8}{stats['p50_ms']:>12.3f}{stats['p95_ms']:>12.3f}{stats['max_ms']:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=20000)
+    parser.add_argument("--links", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["LINK_INDEX_PATH"] = os.path.join(directory, "links.sqlite3")
+        index = LinkIndex()
+
+        notes = list(build_notes(args.notes, args.links))
+        start = time.perf_counter()
+        for offset in range(0, len(notes), 1000):
+            index.update_many((doc_id, text, None) for doc_id, text in notes[offset:offset + 1000])
+        elapsed = time.perf_counter() - start
+        print(f"indexed {len(notes)} notes in {elapsed:.1f}s ({len(notes) / elapsed:.0f} notes/s), {index.stats()}")
+
+        rng = random.Random(1)
+        print(f"{'query':<12}{'count':>8}{'p50(ms)':>12}{'p95(ms)':>12}{'max(ms)':>12}")
+        for label, query in (
+            ("backlinks", lambda doc_id: index.backlinks(doc_id)),
+            ("graph", lambda doc_id: index.neighborhood(doc_id, 1)),
+            (f"graph-d{args.depth}", lambda doc_id: index.neighborhood(doc_id, args.depth)),
+        ):
+            samples = []
+            for _ in range(args.queries):
+                doc_id = f"Note {rng.randrange(args.notes)}"
+                started = time.perf_counter()
+                query(doc_id)
+                samples.append(time.perf_counter() - started)
+            measure(label, samples)
+
+        samples = []
+        for doc_id, text in rng.sample(notes, min(args.queries, len(notes))):
+            started = time.perf_counter()
+            index.update(doc_id, f"{text}\nEdited, see [[Note 0]].\n")
+            samples.append(time.perf_counter() - started)
+        measure("update", samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Markdown转换器开销微基准
+
+对比每次新建markdown.Markdown与复用转换器池两种方式的单次调用耗时。
+
+用法（在backend目录下）：
+    python -m benchmarks.markdown_converter [--iterations 500]
+"""
+import argparse
+import statistics
+import time
+
+import markdown
+
+from app.utils.markdown_processor import DEFAULT_EXTENSIONS, converter_pool
+
+TINY_DOC = "# 标题\n\n一段简短的文字。"
+
+TYPICAL_DOC = """# 项目说明
+
+这是一个**典型**的文档，包含[链接](https://example.com)和`行内代码`。
+
+## 列表
+
+- 第一项
+- 第二项
+- 第三项
+
+## 代码
+
+```python
+def hello():
+    print("Hello, world!")
+```
+
+| 名称 | 数值 |
+| ---- | ---- |
+| a    | 1    |
+| b    | 2    |
+"""
+
+
+def fresh_convert(text: str) -> str:
+    md = markdown.Markdown(extensions=list(DEFAULT_EXTENSIONS))
+    return md.convert(text)
+
+
+def pooled_convert(text: str) -> str:
+    return converter_pool.convert(text)
+
+
+def measure(func, text: str, iterations: int) -> list:
+    func(text)  # 预热
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(text)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'document':<10}{'mode':<8}{'mean(us)':>12}{'p50(us)':>12}{'p99(us)':>12}")
+    for doc_name, text in (("tiny", TINY_DOC), ("typical", TYPICAL_DOC)):
+        for mode, func in (("fresh", fresh_convert), ("pooled", pooled_convert)):
+            samples = sorted(measure(func, text, args.iterations))
+            p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+            print(f"{doc_name:<10}{mode:<8}"
+                  f"{statistics.mean(samples) * 1e6:>12.1f}"
+                  f"{statistics.median(samples) * 1e6:>12.1f}"
+                  f"{p99 * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""PDF导出吞吐量基准
+
+以不同并发数通过PdfExporter导出同一批文档，统计每秒导出的文档数和单个文档
+的延迟。第一轮包含工作进程启动和样式表解析，之后各轮复用缓存的样式表和字体配置。
+需要安装weasyprint所依赖的pango等系统库。
+
+用法（在backend目录下）：
+    python -m benchmarks.pdf_export [--documents 20] [--concurrency 1 2 4]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.core.pdf_exporter import pdf_exporter
+from app.core.render_executor import render_executor
+
+SECTION = """## 小节标题
+
+这是一段普通的正文，包含**加粗**、*斜体*和`行内代码`。
+
+```python
+def example(value):
+    return value * 2
+```
+
+"""
+
+
+async def run_round(documents: int, concurrency: int, template: str) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def export(index: int) -> None:
+        text = f"# 文档 {index}\n\n" + SECTION * 20
+        async with semaphore:
+            start = time.perf_counter()
+            await pdf_exporter.export(text, template)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(export(index) for index in range(documents)))
+    elapsed = time.perf_counter() - start
+    print(f"{template:<12}{concurrency:>12}{documents / elapsed:>12.2f}"
+          f"{statistics.mean(latencies) * 1000:>12.1f}{max(latencies) * 1000:>12.1f}")
+
+
+async def main_async(args) -> None:
+    print(f"{'template':<12}{'concurrency':>12}{'docs/s':>12}{'mean(ms)':>12}{'max(ms)':>12}")
+    for template in args.templates:
+        await run_round(args.workers, args.workers, template)  # 预热工作进程和样式表缓存
+        for concurrency in args.concurrency:
+            await run_round(args.documents, concurrency, template)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--templates", nargs="+", default=["default", "technical"])
+    args = parser.parse_args()
+    args.workers = pdf_exporter.workers
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        pdf_exporter.shutdown()
+        render_executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
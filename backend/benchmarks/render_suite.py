@@ -0,0 +1,158 @@
+"""渲染路径基准套件
+
+在同一进程内对合成语料（benchmarks.corpus）测量：
+- process_markdown：Markdown转换和HTML后处理
+- apply_template：每个已安装模板渲染同一段HTML
+- 路由：通过ASGITransport调用/api/markdown/process、/process/raw和/process/stream，
+  每次请求的内容都不同（冷缓存），另外单独测一次相同内容的重复请求（热缓存）
+
+结果写入JSON报告，可用benchmarks.compare与其他提交的报告对比。
+
+用法（在backend目录下）：
+    python -m benchmarks.render_suite [--iterations 30] [--documents tiny typical ...]
+        [--large-megabytes 10] [--memory] [--output reports/render.json]
+"""
+import argparse
+import asyncio
+import itertools
+import time
+import tracemalloc
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.corpus import DOCUMENT_NAMES, build_corpus
+from benchmarks.report import Report
+
+from app.core.render_cache import render_cache
+from app.core.render_executor import render_executor
+from app.core.template_manager import template_manager
+from app.main import app
+from app.utils.markdown_processor import apply_template, process_markdown
+
+
+_variant_counter = itertools.count()
+
+
+def _variant(text: str) -> str:
+    """在文末追加一段全局递增的序号，使每次请求的内容哈希都不同，避免命中渲染缓存"""
+    return f"{text}\n\n基准序号 {next(_variant_counter)}\n"
+
+
+async def _measure(iterations: int, operation: Callable[[int], Awaitable[None]],
+                   memory: bool) -> Tuple[List[float], float, Optional[int]]:
+    await operation(-1)  # 预热：初始化转换器、线程池或进程池
+    if memory:
+        tracemalloc.start()
+    samples = []
+    start = time.perf_counter()
+    for index in range(iterations):
+        begin = time.perf_counter()
+        await operation(index)
+        samples.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return samples, elapsed, peak
+
+
+async def run_suite(args) -> Report:
+    corpus = build_corpus(args.documents, args.large_megabytes)
+    report = Report("render", {
+        "iterations": args.iterations,
+        "large_iterations": args.large_iterations,
+        "large_megabytes": args.large_megabytes,
+        "documents": {name: len(text) for name, text in corpus.items()},
+    })
+    Report.print_header()
+
+    def iterations_for(name: str) -> int:
+        return args.large_iterations if name == "large" else args.iterations
+
+    # Markdown转换
+    for name, text in corpus.items():
+        async def convert(index: int, text=text) -> None:
+            process_markdown(text)
+
+        samples, elapsed, peak = await _measure(iterations_for(name), convert, args.memory)
+        report.add(f"process_markdown/{name}", samples, elapsed, peak, chars=len(text))
+
+    # 模板渲染（使用typical文档的HTML）
+    html = process_markdown(build_corpus(["typical"])["typical"])
+    for template in template_manager.get_template_names():
+        async def render(index: int, template=template) -> None:
+            apply_template(html, template)
+
+        samples, elapsed, peak = await _measure(args.iterations, render, args.memory)
+        report.add(f"apply_template/{template}", samples, elapsed, peak)
+
+    if args.skip_routes:
+        return report
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, text in corpus.items():
+            async def process_route(index: int, text=text) -> None:
+                files = {"file": ("bench.md", _variant(text).encode("utf-8"), "text/markdown")}
+                response = await client.post("/api/markdown/process", files=files,
+                                             data={"template": "default"})
+                response.raise_for_status()
+
+            async def raw_route(index: int, text=text) -> None:
+                response = await client.post("/api/markdown/process/raw",
+                                             json={"content": _variant(text), "template": "default"})
+                response.raise_for_status()
+
+            async def stream_route(index: int, text=text) -> None:
+                files = {"file": ("bench.md", _variant(text).encode("utf-8"), "text/markdown")}
+                async with client.stream("POST", "/api/markdown/process/stream", files=files,
+                                         data={"template": "default"}) as response:
+                    response.raise_for_status()
+                    async for _ in response.aiter_bytes():
+                        pass
+
+            for route, operation in (("process", process_route), ("raw", raw_route),
+                                     ("stream", stream_route)):
+                samples, elapsed, peak = await _measure(iterations_for(name), operation, args.memory)
+                report.add(f"route/{route}/{name}", samples, elapsed, peak)
+
+        # 热缓存：相同内容重复请求，只走缓存查找和响应序列化
+        if "typical" in corpus:
+            payload = {"content": corpus["typical"], "template": "default"}
+
+            async def cached_route(index: int) -> None:
+                response = await client.post("/api/markdown/process/raw", json=payload)
+                response.raise_for_status()
+
+            render_cache.clear()
+            samples, elapsed, peak = await _measure(args.iterations, cached_route, args.memory)
+            report.add("route/raw/typical_cached", samples, elapsed, peak)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--large-iterations", type=int, default=2,
+                        help="large文档的测量次数")
+    parser.add_argument("--documents", nargs="+", default=list(DOCUMENT_NAMES),
+                        choices=DOCUMENT_NAMES)
+    parser.add_argument("--large-megabytes", type=float, default=10)
+    parser.add_argument("--memory", action="store_true",
+                        help="使用tracemalloc统计每个测量项的Python堆峰值（会明显变慢，不含子进程）")
+    parser.add_argument("--skip-routes", action="store_true")
+    parser.add_argument("--output", help="JSON报告路径")
+    args = parser.parse_args()
+
+    try:
+        report = asyncio.run(run_suite(args))
+    finally:
+        render_executor.shutdown()
+    report.write(args.output)
+
+
+if __name__ == "__main__":
+    main()
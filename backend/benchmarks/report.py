@@ -0,0 +1,112 @@
+"""基准结果的统计与JSON报告
+
+每个测量项（case）记录样本的延迟分位数、吞吐量和可选的峰值内存，连同当前提交、
+Python版本和平台信息一起写入JSON文件，供benchmarks.compare在不同提交之间对比。
+"""
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples: List[float], elapsed: Optional[float] = None) -> Dict[str, float]:
+    """计算一组耗时样本（秒）的统计信息
+
+    Args:
+        samples: 每次操作的耗时
+        elapsed: 整轮的墙钟时间；并发测量时用于计算吞吐量，默认取样本之和
+
+    Returns:
+        包含count、mean_ms、p50_ms、p95_ms、p99_ms、max_ms和ops_per_sec的字典
+    """
+    ordered = sorted(samples)
+    total = elapsed if elapsed is not None else sum(ordered)
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": _percentile(ordered, 0.50) * 1000,
+        "p95_ms": _percentile(ordered, 0.95) * 1000,
+        "p99_ms": _percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "ops_per_sec": len(ordered) / total if total > 0 else 0.0,
+    }
+
+
+def max_rss_mib() -> float:
+    """当前进程的峰值常驻内存（MiB）"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS上单位是字节，Linux上是KB
+    return usage / 1024 / 1024 if sys.platform == "darwin" else usage / 1024
+
+
+class Report:
+    """收集测量结果并写入JSON"""
+
+    def __init__(self, suite: str, parameters: Optional[Dict[str, Any]] = None):
+        self.suite = suite
+        self.parameters = parameters or {}
+        self.cases: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, samples: List[float], elapsed: Optional[float] = None,
+            peak_heap_bytes: Optional[int] = None, **extra: Any) -> Dict[str, Any]:
+        case = summarize(samples, elapsed)
+        if peak_heap_bytes is not None:
+            case["peak_heap_mib"] = peak_heap_bytes / 1024 / 1024
+        case.update(extra)
+        self.cases[name] = case
+        self.print_case(name, case)
+        return case
+
+    @staticmethod
+    def print_header() -> None:
+        print(f"{'case':<44}{'n':>6}{'p50(ms)':>11}{'p95(ms)':>11}{'ops/s':>11}{'heap(MiB)':>11}")
+
+    @staticmethod
+    def print_case(name: str, case: Dict[str, Any]) -> None:
+        heap = case.get("peak_heap_mib")
+        print(f"{name:<44}{case['count']:>6}{case['p50_ms']:>11.2f}{case['p95_ms']:>11.2f}"
+              f"{case['ops_per_sec']:>11.1f}{'' if heap is None else f'{heap:.1f}':>11}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "suite": self.suite,
+            "revision": _git_revision(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": self.parameters,
+            "max_rss_mib": max_rss_mib(),
+            "cases": self.cases,
+        }
+
+    def write(self, path: Optional[str]) -> None:
+        """写入JSON报告；path为空时只打印进程峰值内存"""
+        data = self.to_dict()
+        print(f"max rss: {data['max_rss_mib']:.1f} MiB")
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"report written to {path}")
@@ -0,0 +1,125 @@
+"""启动耗时预算检查
+
+在全新的子进程中分别测量：
+- import：导入app.main的耗时
+- first_request：导入之后执行lifespan启动并完成第一个/api/markdown/process/raw请求的耗时
+- process：从启动解释器到子进程退出的总耗时
+
+同时检查导入app.main之后是否已经加载了应当延迟导入的重量级模块。
+任何一项的中位数超过预算或有模块被提前导入时以非零状态退出，可在CI中使用；
+tests/test_startup_budget.py只检查延迟导入，耗时受机器负载影响，不在测试中断言。
+
+用法（在backend目录下）：
+    python -m benchmarks.startup [--runs 5] [--import-budget-ms 1200]
+        [--first-request-budget-ms 1500] [--warmup background|blocking|off] [--output reports/startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from typing import List
+
+from benchmarks.corpus import build_corpus
+from benchmarks.report import Report
+
+# 默认预算（毫秒）：导入app.main、导入之后完成第一个请求
+IMPORT_BUDGET_MS = 1200
+FIRST_REQUEST_BUDGET_MS = 1500
+
+# 导入app.main时不应加载的模块，它们只在第一次使用相应功能时导入
+LAZY_MODULES = ("requests", "httpx", "dotenv", "jinja2", "markdown", "pygments", "bs4", "weasyprint", "PIL")
+
+CHILD = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+eager = [name for name in {lazy_modules!r} if name in sys.modules]
+
+import httpx
+
+async def first_request():
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            response = await client.post("/api/markdown/process/raw", json={{"content": {content!r}}})
+            response.raise_for_status()
+            return time.perf_counter()
+
+responded = asyncio.run(first_request())
+print(json.dumps({{"import": imported - start, "first_request": responded - imported, "eager": eager}}))
+"""
+
+
+def run_child(content: str, warmup: str) -> dict:
+    code = CHILD.format(lazy_modules=LAZY_MODULES, content=content)
+    env = dict(os.environ, STARTUP_WARMUP=warmup)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"startup child failed:\n{result.stderr}")
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    data["process"] = elapsed
+    return data
+
+
+def run_startup(runs: int, warmup: str = "background") -> List[dict]:
+    """在全新的子进程中测量runs次启动耗时"""
+    content = build_corpus(["typical"])["typical"]
+    return [run_child(content, warmup) for _ in range(runs)]
+
+
+def check_budgets(runs: List[dict], import_budget_ms: float = IMPORT_BUDGET_MS,
+                  first_request_budget_ms: float = FIRST_REQUEST_BUDGET_MS) -> List[str]:
+    """返回超出预算的阶段和被提前导入的模块，全部通过时返回空列表"""
+    failures = []
+    budgets = (("import", import_budget_ms), ("first_request", first_request_budget_ms))
+    for stage, budget in budgets:
+        median_ms = statistics.median(run[stage] for run in runs) * 1000
+        if median_ms > budget:
+            failures.append(f"{stage} median {median_ms:.0f} ms exceeds budget {budget:.0f} ms")
+    return failures + check_lazy_imports(runs)
+
+
+def check_lazy_imports(runs: List[dict]) -> List[str]:
+    """返回导入app.main时被提前导入的模块，没有时返回空列表"""
+    eager = sorted({name for run in runs for name in run["eager"]})
+    if eager:
+        return [f"modules imported eagerly by app.main: {', '.join(eager)}"]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--first-request-budget-ms", type=float, default=FIRST_REQUEST_BUDGET_MS)
+    parser.add_argument("--warmup", default="background", choices=("background", "blocking", "off"),
+                        help="子进程使用的STARTUP_WARMUP")
+    parser.add_argument("--output", help="JSON报告路径")
+    args = parser.parse_args()
+
+    runs = run_startup(args.runs, args.warmup)
+
+    report = Report("startup", {"runs": args.runs, "warmup": args.warmup})
+    Report.print_header()
+    for stage in ("import", "first_request", "process"):
+        report.add(stage, [run[stage] for run in runs])
+    report.write(args.output)
+
+    failures = check_budgets(runs, args.import_budget_ms, args.first_request_budget_ms)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("startup budgets OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""大文件渲染的峰值内存对比
+
+分别用一次性处理（与/markdown/process相同）和流式处理（/markdown/process/stream）
+渲染同一个合成的大文档，使用tracemalloc统计Python堆的峰值内存。
+
+用法（在backend目录下）：
+    python -m benchmarks.streaming_memory [--megabytes 10]
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+
+from fastapi import UploadFile
+
+from app.core.render_executor import render_executor
+from app.core.stream_renderer import stream_renderer
+from app.utils.markdown_processor import apply_template, process_markdown
+
+SECTION = """## 小节标题
+
+这是一段普通的正文，包含**加粗**、*斜体*和`行内代码`。
+
+- 列表项一
+- 列表项二
+
+```python
+def example(value):
+    return value * 2
+```
+
+| 列 | 值 |
+| -- | -- |
+| a  | 1  |
+
+"""
+
+
+def make_document(megabytes: float) -> bytes:
+    section = SECTION.encode("utf-8")
+    return b"# Large document\n\n" + section * int(megabytes * 1024 * 1024 / len(section))
+
+
+def full_render(data: bytes) -> int:
+    markdown_text = data.decode("utf-8")
+    html = process_markdown(markdown_text)
+    return len(apply_template(html, "default"))
+
+
+async def stream_render(data: bytes) -> int:
+    with tempfile.SpooledTemporaryFile() as spooled:
+        spooled.write(data)
+        spooled.seek(0)
+        upload = UploadFile(file=spooled, filename="large.md")
+        total = 0
+        async for piece in stream_renderer.render(upload, "default"):
+            total += len(piece)
+        return total
+
+
+def measure(label: str, func) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<8}{elapsed:>10.2f}s{peak / 1024 / 1024:>12.1f} MiB{size / 1024 / 1024:>12.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=float, default=10)
+    args = parser.parse_args()
+
+    data = make_document(args.megabytes)
+    print(f"input: {len(data) / 1024 / 1024:.1f} MiB")
+    print(f"{'mode':<8}{'time':>11}{'peak heap':>16}{'output':>16}")
+    measure("full", lambda: full_render(data))
+    measure("stream", lambda: asyncio.run(stream_render(data)))
+    render_executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
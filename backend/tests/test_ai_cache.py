@@ -0,0 +1,21 @@
+from app.core.ai_cache import AIResponseCache
+
+
+def key(content: str) -> str:
+    return AIResponseCache.make_key([{"role": "user", "content": content}], "glm-4", 0.4)
+
+
+def test_key_keeps_code_indentation():
+    flat = "```python\nif x:\nreturn 1\n```\n"
+    indented = "```python\nif x:\n    return 1\n```\n"
+    assert key(flat) != key(indented)
+
+
+def test_key_keeps_layout_sensitive_whitespace():
+    # 硬换行和列表嵌套只在空白上不同
+    assert key("line one  \nline two\n") != key("line one\nline two\n")
+    assert key("- a\n  - b\n") != key("- a\n- b\n")
+
+
+def test_key_ignores_line_ending_style():
+    assert key("# Title\r\n\r\nbody\r\n") == key("# Title\n\nbody\n")
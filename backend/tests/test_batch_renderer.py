@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from app.core.batch_renderer import BatchRenderer
+from app.core.render_cache import render_cache
+from app.core.render_executor import render_executor
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    render_cache.clear()
+    monkeypatch.setattr(render_executor, "process_workers", 2)
+    yield render_executor
+    render_executor.shutdown()
+
+
+def test_batch_renders_in_worker_processes(executor, monkeypatch):
+    kinds = []
+    submit = executor.submit
+
+    async def spy(func, *args, **kwargs):
+        kinds.append(kwargs.get("kind"))
+        return await submit(func, *args, **kwargs)
+
+    monkeypatch.setattr(executor, "submit", spy)
+    # 每个文档都远小于大文档阈值，但渲染耗时足以让进程池启动多个工作进程
+    body = "".join(f"- item **{line}** with `code`\n" for line in range(2000))
+    documents = [(f"doc{index}.md", f"# Doc {index}\n\n{body}".encode()) for index in range(8)]
+
+    async def run():
+        return [result async for result in BatchRenderer().render(documents, "default")]
+
+    results = asyncio.run(run())
+
+    assert sorted(result["index"] for result in results) == list(range(8))
+    assert all(result["status"] == "ok" for result in results)
+    assert all(f"Doc {result['index']}" in result["html_content"] for result in results)
+    # 小文档也交给进程池，并由多个工作进程并行渲染
+    assert all(len(data) < executor.large_document_threshold for _, data in documents)
+    assert kinds == ["large"] * 8
+    assert len(executor.process_pool._processes) == 2
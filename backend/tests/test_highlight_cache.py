@@ -0,0 +1,24 @@
+import markdown
+from markdown.extensions import codehilite, fenced_code
+
+from app.utils.highlight_cache import highlight_cache
+from app.utils.markdown_processor import process_markdown
+
+DOCUMENT = "```python\nprint('cached')\n```\n\n    indented = True\n"
+
+
+def test_pipeline_uses_cache_without_patching_markdown():
+    highlight_cache.clear()
+    first = process_markdown(DOCUMENT)
+    before = highlight_cache.memory.stats()["hits"]
+    assert process_markdown(DOCUMENT) == first
+    # 两个代码块（围栏和缩进）都从缓存读取
+    assert highlight_cache.memory.stats()["hits"] - before == 2
+
+    # Markdown模块本身未被修改，其他实例使用原始的高亮器
+    assert fenced_code.CodeHilite is codehilite.CodeHilite
+    assert codehilite.CodeHilite.__module__ == "markdown.extensions.codehilite"
+    before = highlight_cache.memory.stats()["hits"]
+    other = markdown.markdown(DOCUMENT, extensions=["fenced_code", "codehilite"])
+    assert highlight_cache.memory.stats()["hits"] == before
+    assert other == first
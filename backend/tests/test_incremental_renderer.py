@@ -0,0 +1,53 @@
+import asyncio
+import re
+
+import pytest
+
+from app.core.incremental_renderer import incremental_renderer
+from app.core.render_executor import render_executor
+from app.utils.markdown_processor import process_markdown
+
+# 逐块转换容易与整篇转换不一致的写法
+CORPUS = {
+    "blockquotes": "> a\n\n> b\n\nafter\n",
+    "nested_quote": "> a\n\n>> nested\n\nafter\n",
+    "abbreviation": "The HTML spec.\n\n*[HTML]: Hyper Text Markup Language\n",
+    "footnote": "see[^1]\n\nmore\n\n[^1]: note\n",
+    "toc": "[TOC]\n\n# A\n\n## B\n",
+    "duplicate_headings": "# Intro\n\nx\n\n# Intro\n\ny\n",
+    "html_block": "<div>\n\nhello\n\n</div>\n\npara\n",
+    "comment": "<!--\n\nhidden\n\n-->\n\npara\n",
+    "reference": "a [ref][1]\n\nb [ref][1]\n\n[1]: http://example.com\n",
+    "loose_list": "1. a\n\n2. b\n\n    indented\n\npara\n",
+    "fenced_code": "# A\n\n```\ncode\n\nmore\n```\n\n> q\n> r\n\ntext\n",
+    "table": "| a | b |\n|---|---|\n| 1 | 2 |\n\npara\n",
+}
+
+
+def normalize(html: str) -> str:
+    # 只忽略元素之间的空白，不影响页面显示
+    return re.sub(r">\s+<", "><", html).strip()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def shutdown_executor():
+    yield
+    render_executor.shutdown()
+
+
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_incremental_matches_full_render(name):
+    text = CORPUS[name]
+
+    async def run():
+        session = await incremental_renderer.open(text)
+        opened = "\n".join(session.html)
+        # 在末尾和开头各编辑一次，检查增量更新后的结果
+        await incremental_renderer.apply_patch(session.doc_id, session.version,
+                                               [(len(text), len(text), "\n> tail\n")])
+        await incremental_renderer.apply_patch(session.doc_id, session.version, [(0, 0, "lead\n\n")])
+        return opened, "\n".join(session.html), session.text
+
+    opened, patched, patched_text = asyncio.run(run())
+    assert normalize(opened) == normalize(process_markdown(text))
+    assert normalize(patched) == normalize(process_markdown(patched_text))
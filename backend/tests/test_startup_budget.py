@@ -0,0 +1,7 @@
+from benchmarks.startup import check_lazy_imports, run_startup
+
+
+def test_app_main_defers_heavy_imports():
+    # 与python -m benchmarks.startup相同的延迟导入检查；耗时预算只在基准脚本中检查
+    failures = check_lazy_imports(run_startup(runs=1))
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,45 @@
+import asyncio
+import tracemalloc
+
+import pytest
+
+from app.core.render_executor import render_executor
+from app.core.stream_renderer import stream_renderer
+from benchmarks.streaming_memory import make_document, stream_render
+
+# 除输入本身外，流式渲染的峰值内存允许随文件大小增加的上限
+GROWTH_SLACK_BYTES = 512 * 1024
+# 较小读取块和分组下的峰值内存上限
+MAX_PEAK_BYTES = 4 * 1024 * 1024
+
+
+@pytest.fixture
+def small_groups(monkeypatch):
+    # 用较小的读取块和分组，使测试文档较小时也能体现峰值与文件大小无关
+    monkeypatch.setattr(stream_renderer, "read_chunk_bytes", 8 * 1024)
+    monkeypatch.setattr(stream_renderer, "group_chars", 8 * 1024)
+    # 预热：导入扩展、初始化转换器和高亮缓存，不计入测量
+    asyncio.run(stream_render(make_document(64 / 1024)))
+    yield
+    render_executor.shutdown()
+
+
+def peak_bytes(data: bytes) -> int:
+    tracemalloc.start()
+    try:
+        asyncio.run(stream_render(data))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_stream_peak_memory_does_not_grow_with_file_size(small_groups):
+    small = make_document(32 / 1024)
+    large = make_document(128 / 1024)
+
+    small_peak = peak_bytes(small)
+    large_peak = peak_bytes(large)
+
+    # 上传内容本身会完整保存在临时文件中，其余部分应与文件大小无关
+    assert large_peak - small_peak < len(large) - len(small) + GROWTH_SLACK_BYTES
+    assert large_peak < MAX_PEAK_BYTES
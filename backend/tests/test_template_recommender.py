@@ -0,0 +1,16 @@
+from app.core.template_recommender import extract_features
+
+
+def terms(text: str, category: str) -> float:
+    return round(extract_features(text)[f"{category}_terms_per_kilo"] * len(text) / 1000)
+
+
+def test_ascii_terms_count_whole_words_only():
+    assert terms("The capital of android apps", "technical") == 0
+    assert terms("The capital of android apps", "business") == 0
+    assert terms("See https://example.com/api/http for details", "technical") == 0
+    assert terms("The API returns JSON responses", "technical") == 3
+
+
+def test_cjk_terms_and_mixed_text():
+    assert terms("市场营收增长，客户KPI和ROI", "business") == 6